@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import *
 
 admin.site.register(Branch)
+admin.site.register(BranchSalesShard)
 @admin.register(Employees)
 class EmployeesAdmin(admin.ModelAdmin):
     list_display = ('username', 'role', 'Eid', 'branch', 'is_active')
@@ -9,15 +10,24 @@ admin.site.register(Godown)
 admin.site.register(Item)
 admin.site.register(BranchStock)
 admin.site.register(GodownStock)
+admin.site.register(GodownLot)
 admin.site.register(StockRequest)
+admin.site.register(StockTransfer)
+admin.site.register(StockMovement)
+admin.site.register(LowStockAlert)
+admin.site.register(StockSnapshot)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(Billing)
 admin.site.register(KitchenOrderTicket)
 admin.site.register(Expense)
 admin.site.register(DailyAnalytics)
+admin.site.register(MenuItemDailySales)
+admin.site.register(RollupWatermark)
+admin.site.register(TableRowCount)
 admin.site.register(MenuItem)
 admin.site.register(BranchMenuItem)
+admin.site.register(RecipeIngredient)
 admin.site.register(Offer)
 admin.site.register(Cart)
 admin.site.register(CartItem)
@@ -26,4 +36,6 @@ class CustomerAdmin(admin.ModelAdmin):
 
 admin.site.register(Customer, CustomerAdmin)
 admin.site.register(TiexCollect)
+admin.site.register(ReorderSuggestion)
+admin.site.register(StockReservation)
 
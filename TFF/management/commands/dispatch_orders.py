@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from TFF.models import Branch
+from TFF.services.kitchen_dispatcher import DISPATCH_POLICIES, dispatch_pending_orders
+
+class Command(BaseCommand):
+    help = 'Assign pending orders to idle chefs'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", help="Branch code, defaults to every branch")
+        parser.add_argument("--policy", choices=sorted(DISPATCH_POLICIES), help="Defaults to DISPATCH_POLICY")
+        parser.add_argument("--loop", action="store_true", help="Keep dispatching until stopped")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between passes")
+
+    def handle(self, *args, **options):
+        branches = None
+        if options["branch"]:
+            branches = Branch.objects.filter(branch_code=options["branch"])
+            if not branches.exists():
+                raise CommandError("Branch not found")
+
+        while True:
+            close_old_connections()
+            assigned = dispatch_pending_orders(options["policy"], branches)
+
+            for order, chef in assigned:
+                self.stdout.write(f"{order.order_code} -> {chef.Eid}")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,51 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from TFF.models import Branch
+from TFF.services.export_service import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from TFF.services.reporting_periods import reporting_period
+
+class Command(BaseCommand):
+    help = 'Stream orders, order items, GST or ingredient usage to CSV / Parquet for BI'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dataset", choices=list(EXPORT_DATASETS), default="orders")
+        parser.add_argument(
+            "--format", choices=list(EXPORT_FORMATS), default="csv",
+            help="parquet is only offered when pyarrow is installed",
+        )
+        parser.add_argument("--from", dest="first", help="First day (YYYY-MM-DD), default start of month")
+        parser.add_argument("--to", dest="last", help="Last day (YYYY-MM-DD), default today")
+        parser.add_argument("--branch", help="Branch code")
+        parser.add_argument("--output", help="File to write, default stdout")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            first = parse_date(options["first"]) if options["first"] else today.replace(day=1)
+            last = parse_date(options["last"]) if options["last"] else today
+        except ValueError:
+            raise CommandError("Dates must be valid YYYY-MM-DD dates")
+        if first is None or last is None:
+            raise CommandError("Dates must be YYYY-MM-DD")
+
+        branch = None
+        if options["branch"]:
+            try:
+                branch = Branch.objects.get(branch_code=options["branch"])
+            except Branch.DoesNotExist:
+                raise CommandError(f"Branch {options['branch']} not found")
+
+        period = reporting_period("custom", first=first, last=last)
+        chunks = stream_export(options["dataset"], period, options["format"], branch)
+
+        if options["output"]:
+            with open(options["output"], "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"{options['dataset']} written to {options['output']}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from TFF.services.forecast_service import generate_reorder_suggestions
+
+class Command(BaseCommand):
+    help = 'Recompute ingredient reorder suggestions from recent consumption'
+
+    def handle(self, *args, **kwargs):
+        count = generate_reorder_suggestions()
+        self.stdout.write(self.style.SUCCESS(f"{count} reorder suggestion(s) written"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from TFF.models import Branch, Item
+from TFF.services.rebalance_service import rebalance_stock
+
+class Command(BaseCommand):
+    help = 'Propose (and create) inter-branch transfers that cover every shortage'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nearest", action="store_true", help="Weight transfers by branch distance")
+        parser.add_argument("--dry-run", action="store_true", help="Print the plan without creating requests")
+
+    def handle(self, *args, **options):
+        plan, transfers = rebalance_stock(options["nearest"], options["dry_run"])
+
+        branches = Branch.objects.in_bulk({p[0] for p in plan} | {p[1] for p in plan})
+        items = Item.objects.in_bulk({p[2] for p in plan})
+        for receiver_id, donor_id, item_id, qty in plan:
+            self.stdout.write(
+                f"{branches[donor_id].branch_code} -> {branches[receiver_id].branch_code}: "
+                f"{qty} {items[item_id].item_name}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"{len(plan)} move(s), {len(transfers)} transfer(s) created"))
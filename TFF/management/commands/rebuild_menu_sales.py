@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from TFF.services.popularity_service import rebuild_menu_sales
+
+class Command(BaseCommand):
+    help = 'Recompute every MenuItemDailySales counter from OrderItem'
+
+    def handle(self, *args, **options):
+        count = rebuild_menu_sales()
+        self.stdout.write(self.style.SUCCESS(f"{count} branch/item/day counter(s) rebuilt"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from TFF.models import Branch
+from TFF.services.branch_sales import reconcile_branch_sales
+
+class Command(BaseCommand):
+    help = 'Correct every branch\'s sales shards against its orders'
+
+    def handle(self, *args, **options):
+        corrections = reconcile_branch_sales()
+
+        branches = Branch.objects.in_bulk(corrections.keys())
+        for branch_id, diff in corrections.items():
+            self.stdout.write(f"{branches[branch_id].branch_code}: {diff:+}")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(corrections)} branch(es) corrected"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from TFF.services.row_counts import refresh_row_counts
+
+class Command(BaseCommand):
+    help = 'Reconcile the dashboard row counts with the real tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estimate", action="store_true", help="Use Postgres planner estimates where available")
+
+    def handle(self, *args, **options):
+        counts = refresh_row_counts(estimate=options["estimate"] or None)
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"{len(counts)} table count(s) refreshed"))
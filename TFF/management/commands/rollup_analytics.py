@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from TFF.models import RollupWatermark
+from TFF.services.rollup_service import DAILY_ANALYTICS, rollup_daily_analytics
+
+class Command(BaseCommand):
+    help = 'Upsert DailyAnalytics for every day touched since the last rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Forget the watermark and rebuild every day")
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            RollupWatermark.objects.filter(name=DAILY_ANALYTICS).delete()
+
+        count = rollup_daily_analytics()
+        self.stdout.write(self.style.SUCCESS(f"{count} branch-day(s) rolled up"))
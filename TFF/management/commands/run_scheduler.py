@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+from TFF import scheduler
+
+class Command(BaseCommand):
+    help = 'Run the background job scheduler in the foreground'
+
+    def handle(self, *args, **kwargs):
+        scheduler.start()
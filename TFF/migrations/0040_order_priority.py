@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0039_orderitem_discount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0040_order_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='ready_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PrepTimeStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_seconds', models.FloatField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.branch')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.menuitem')),
+            ],
+            options={
+                'unique_together': {('branch', 'menu_item')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0042_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='branchstock',
+            index=models.Index(fields=['item', 'quantity'], name='branchstock_item_qty_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0043_branchstock_item_qty_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(choices=[('receipt', 'Receipt'), ('transfer_in', 'Transfer In'), ('transfer_out', 'Transfer Out'), ('consumption', 'Consumption'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='TFF.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.item')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='TFF.order')),
+                ('stock_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='TFF.stockrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'created_at'], name='stockmove_branch_time_idx'), models.Index(fields=['branch', 'item', 'created_at'], name='stockmove_branch_item_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('taken_at', models.DateTimeField()),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='TFF.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'taken_at'], name='stocksnap_branch_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0044_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_level', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='branchstock',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('min_level'))), fields=['branch'], name='branchstock_below_min_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.branch'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.item'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='stock_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='TFF.stockrequest'),
+        ),
+        migrations.AddConstraint(
+            model_name='lowstockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('branch', 'item'), name='one_open_low_stock_alert'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_lots(apps, schema_editor):
+    # Existing godown stock becomes one lot per item
+    GodownStock = apps.get_model('TFF', 'GodownStock')
+    GodownLot = apps.get_model('TFF', 'GodownLot')
+    GodownLot.objects.bulk_create([
+        GodownLot(item_id=g.item_id, quantity=g.quantity, expiry_date=g.expiry_date)
+        for g in GodownStock.objects.filter(quantity__gt=0)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0046_stock_transfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GodownLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='godown_lots', to='TFF.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'expiry_date'], name='godownlot_item_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(seed_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0047_godown_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_daily_usage', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('ema_daily_usage', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_level', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('suggested_quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('godown_available', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('generated_at', models.DateTimeField()),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.item')),
+            ],
+            options={
+                'unique_together': {('branch', 'item')},
+            },
+        ),
+    ]
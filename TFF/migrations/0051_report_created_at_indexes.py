@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0050_daily_analytics_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['created_at'], name='expense_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'created_at'], name='order_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiexcollect',
+            index=models.Index(fields=['created_at'], name='tiexcollect_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0051_report_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.branch')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TFF.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'date'], name='menu_sales_branch_date_idx')],
+                'unique_together': {('branch', 'menu_item', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0052_menu_item_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableRowCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('estimated', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
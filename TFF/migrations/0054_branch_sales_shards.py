@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:59
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_shards(apps, schema_editor):
+    # Start every branch from its order total (the old column double counted)
+    Branch = apps.get_model('TFF', 'Branch')
+    Order = apps.get_model('TFF', 'Order')
+    BranchSalesShard = apps.get_model('TFF', 'BranchSalesShard')
+    totals = dict(
+        Order.objects.order_by().values('branch_id')
+        .annotate(total=Sum('total_amount')).values_list('branch_id', 'total')
+    )
+    BranchSalesShard.objects.bulk_create([
+        BranchSalesShard(
+            branch_id=branch_id,
+            slot=slot,
+            amount=(totals.get(branch_id) or Decimal('0.00')) if slot == 0 else Decimal('0.00'),
+        )
+        for branch_id in Branch.objects.values_list('id', flat=True)
+        for slot in range(8)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0053_table_row_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchSalesShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_shards', to='TFF.branch')),
+            ],
+            options={
+                'unique_together': {('branch', 'slot')},
+            },
+        ),
+        migrations.RunPython(seed_shards, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='branch',
+            name='sales',
+        ),
+    ]
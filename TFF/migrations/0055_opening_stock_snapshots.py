@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def seed_opening_snapshots(apps, schema_editor):
+    # Stock that existed before the ledger has no movements; without an
+    # opening snapshot stock_at / reconcile would read it as zero until
+    # the first nightly snapshot. Places that already have one are left alone.
+    BranchStock = apps.get_model('TFF', 'BranchStock')
+    GodownStock = apps.get_model('TFF', 'GodownStock')
+    StockSnapshot = apps.get_model('TFF', 'StockSnapshot')
+
+    snapshotted = set(StockSnapshot.objects.values_list('branch_id', flat=True).distinct())
+    taken_at = timezone.now()
+
+    rows = [
+        StockSnapshot(branch_id=branch_id, item_id=item_id, quantity=qty, taken_at=taken_at)
+        for branch_id, item_id, qty in BranchStock.objects.values_list('branch_id', 'item_id', 'quantity')
+        if branch_id not in snapshotted
+    ]
+    if None not in snapshotted:
+        rows += [
+            StockSnapshot(branch_id=None, item_id=item_id, quantity=qty, taken_at=taken_at)
+            for item_id, qty in GodownStock.objects.values_list('item_id', 'quantity')
+        ]
+    StockSnapshot.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0054_branch_sales_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_opening_snapshots, migrations.RunPython.noop),
+    ]
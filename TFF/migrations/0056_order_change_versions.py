@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0055_opening_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderChangeVersion',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_version', serialize=False, to='TFF.customer')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:12
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0056_order_change_versions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='branchstock',
+            name='branchstock_below_min_idx',
+        ),
+        migrations.AddIndex(
+            model_name='branchstock',
+            index=models.Index(condition=models.Q(('quantity__lt', django.db.models.expressions.CombinedExpression(models.F('min_level'), '+', models.F('reserved')))), fields=['branch'], name='branchstock_below_min_idx'),
+        ),
+    ]
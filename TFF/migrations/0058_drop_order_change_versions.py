@@ -0,0 +1,16 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0057_below_min_counts_reserved'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OrderChangeVersion',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:05
+
+from django.db import migrations
+
+
+def mark_rolled_days_dirty(apps, schema_editor):
+    # net_profit used to include GST; the next rollup recomputes every day
+    DailyAnalytics = apps.get_model('TFF', 'DailyAnalytics')
+    RollupDirtyDay = apps.get_model('TFF', 'RollupDirtyDay')
+    RollupDirtyDay.objects.bulk_create(
+        [
+            RollupDirtyDay(branch_id=branch_id, date=date)
+            for branch_id, date in DailyAnalytics.objects.values_list('branch_id', 'date').iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TFF', '0059_rollup_dirty_days'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_rolled_days_dirty, migrations.RunPython.noop),
+    ]
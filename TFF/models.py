@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.auth.hashers import make_password, check_password, identify_hasher
 from django.utils.timezone import now
 from decimal import Decimal
-from django.db.models import Q
+from django.db.models import F, Q, Sum
 
 class Employees(models.Model):
     ROLE_CHOICES = (
@@ -108,7 +108,6 @@ class Branch(models.Model):
     branch_code = models.CharField(max_length=10, unique=True, editable=False)
     branch_name = models.CharField(max_length=150)
     address = models.TextField()
-    sales = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     city = models.CharField(max_length=100)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
@@ -142,9 +141,34 @@ class Branch(models.Model):
     def shortage_staff(self):
         return max(self.required_staff - self.total_staff, 0)
 
+    @property
+    def sales_total(self):
+        """Running sales: the sum of the branch's BranchSalesShard rows."""
+        if getattr(self, "shard_sales", None) is None:
+            self.shard_sales = (
+                self.sales_shards.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+            )
+        return self.shard_sales
+
     def __str__(self):
         return f"{self.branch_code} - {self.branch_name}"
 
+class BranchSalesShard(models.Model):
+    """
+    One of a few slots a branch's running sales are spread over, so
+    concurrent checkouts increment different rows instead of queueing
+    on the Branch row. The branch total is the sum of its slots.
+    """
+    branch = models.ForeignKey(Branch, related_name="sales_shards", on_delete=models.CASCADE)
+    slot = models.PositiveSmallIntegerField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        unique_together = ("branch", "slot")
+
+    def __str__(self):
+        return f"{self.branch} #{self.slot}: {self.amount}"
+
 class MenuItem(models.Model):
     ROLE_CATEGORY = (
         ('starter', 'Staeter'),
@@ -184,6 +208,19 @@ class BranchMenuItem(models.Model):
     def __str__(self):
         return f"{self.branch.branch_name} - {self.menu_item.name}"
 
+class RecipeIngredient(models.Model):
+    menu_item = models.ForeignKey(
+        MenuItem, related_name="recipe", on_delete=models.CASCADE
+    )
+    item = models.ForeignKey("Item", on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)  # per plate
+
+    class Meta:
+        unique_together = ("menu_item", "item")
+
+    def __str__(self):
+        return f"{self.menu_item.name} - {self.item.item_name}"
+
 class Offer(models.Model):
     OFFER_TYPE_CHOICES = (
         ('upto', 'Upto Percentage'),
@@ -253,11 +290,20 @@ class BranchStock(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    reserved = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # held for accepted orders
     min_level = models.DecimalField(max_digits=10, decimal_places=2)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('branch', 'item')
+        indexes = [
+            models.Index(fields=['item', 'quantity'], name='branchstock_item_qty_idx'),
+            models.Index(
+                fields=['branch'],
+                condition=Q(quantity__lt=F('min_level') + F('reserved')),
+                name='branchstock_below_min_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.branch} - {self.item}"
@@ -275,6 +321,56 @@ class GodownStock(models.Model):
     def __str__(self):
         return f"Godown - {self.item}"
 
+class GodownLot(models.Model):
+    """
+    One delivery of an item into the godown. GodownStock keeps the
+    per-item total of these lots.
+    """
+    item = models.ForeignKey(Item, related_name='godown_lots', on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    expiry_date = models.DateField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'expiry_date'], name='godownlot_item_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lot #{self.id} - {self.item} ({self.quantity}, exp {self.expiry_date})"
+
+class StockTransfer(models.Model):
+    """
+    A multi-item stock request to one donor (or the godown). Its lines
+    are ordinary StockRequest rows.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+        ('timeout', 'Timeout'),
+    )
+
+    from_branch = models.ForeignKey(
+        Branch, related_name='stock_transfers_from', on_delete=models.CASCADE
+    )
+    to_branch = models.ForeignKey(
+        Branch,
+        related_name='stock_transfers_to',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE
+    )
+    from_godown = models.BooleanField(default=False)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='pending'
+    )
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Transfer #{self.id} ({self.from_branch} <- {self.to_branch or 'Godown'})"
+
 class StockRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -295,6 +391,13 @@ class StockRequest(models.Model):
     )
 
     from_godown = models.BooleanField(default=False)
+    transfer = models.ForeignKey(
+        StockTransfer,
+        related_name='lines',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE
+    )
 
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
@@ -306,6 +409,74 @@ class StockRequest(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)  # 🔥 15 min logic
     created_at = models.DateTimeField(auto_now_add=True)
 
+class LowStockAlert(models.Model):
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    min_level = models.DecimalField(max_digits=10, decimal_places=2)
+    stock_request = models.ForeignKey(
+        StockRequest, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['branch', 'item'],
+                condition=Q(resolved_at__isnull=True),
+                name='one_open_low_stock_alert'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.branch} - {self.item} ({self.quantity}/{self.min_level})"
+
+class StockMovement(models.Model):
+    """
+    Append-only record of every change to branch or godown stock.
+    `branch` is empty for godown movements.
+    """
+    REASON_CHOICES = (
+        ('receipt', 'Receipt'),
+        ('transfer_in', 'Transfer In'),
+        ('transfer_out', 'Transfer Out'),
+        ('consumption', 'Consumption'),
+        ('adjustment', 'Adjustment'),
+    )
+
+    branch = models.ForeignKey(Branch, null=True, blank=True, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    delta = models.DecimalField(max_digits=10, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    order = models.ForeignKey("Order", null=True, blank=True, on_delete=models.SET_NULL)
+    stock_request = models.ForeignKey(StockRequest, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'created_at'], name='stockmove_branch_time_idx'),
+            models.Index(fields=['branch', 'item', 'created_at'], name='stockmove_branch_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch or 'Godown'} - {self.item} ({self.delta})"
+
+class StockSnapshot(models.Model):
+    branch = models.ForeignKey(Branch, null=True, blank=True, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'taken_at'], name='stocksnap_branch_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch or 'Godown'} - {self.item} @ {self.taken_at}"
+
 class Order(models.Model):
     ORDER_STATUS = (
         ("pending", "Pending"),
@@ -338,7 +509,17 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     status = models.CharField(max_length=20, choices=ORDER_STATUS, default="pending")
+    priority = models.PositiveSmallIntegerField(default=0)  # higher goes first
     created_at = models.DateTimeField(auto_now_add=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="order_created_at_idx"),
+            models.Index(fields=["branch", "created_at"], name="order_branch_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_code:
@@ -365,6 +546,43 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+class PrepTimeStat(models.Model):
+    """
+    Rolling (exponentially weighted) preparation time of a menu item at a
+    branch, folded in one completed order at a time.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    avg_seconds = models.FloatField()
+    samples = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("branch", "menu_item")
+
+    def __str__(self):
+        return f"{self.branch} - {self.menu_item} ({self.avg_seconds:.0f}s)"
+
+class MenuItemDailySales(models.Model):
+    """
+    Plates of a menu item sold at a branch on one (local) day, bumped as
+    orders are placed and taken back when they are cancelled.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("branch", "menu_item", "date")
+        indexes = [
+            models.Index(fields=["branch", "date"], name="menu_sales_branch_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.branch} - {self.menu_item} - {self.date}: {self.quantity}"
+
 class Billing(models.Model):
     PAYMENT_MODE_CHOICES = (
         ('cash', 'Cash'),
@@ -405,16 +623,51 @@ class Expense(models.Model):
     expense_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="expense_created_at_idx"),
+        ]
+
     def __str__(self):
         return self.description
 
 class DailyAnalytics(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
     date = models.DateField()
+    total_orders = models.PositiveIntegerField(default=0)
     total_sales = models.DecimalField(max_digits=10, decimal_places=2)
+    completed_orders = models.PositiveIntegerField(default=0)
+    completed_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_gst = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_expense = models.DecimalField(max_digits=10, decimal_places=2)
     net_profit = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('branch', 'date')
+
+    def __str__(self):
+        return f"{self.branch} - {self.date}"
+
+class RollupWatermark(models.Model):
+    """
+    How far a rollup job has read its source tables; rows changed after
+    `value` are picked up on the next run.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+class RollupDirtyDay(models.Model):
+    """
+    A (branch, day) a rollup must recompute even though no source row
+    for it changed, e.g. because an order was deleted.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    date = models.DateField()
 
     class Meta:
         unique_together = ('branch', 'date')
@@ -422,6 +675,19 @@ class DailyAnalytics(models.Model):
     def __str__(self):
         return f"{self.branch} - {self.date}"
 
+class TableRowCount(models.Model):
+    """
+    Row count of a table as of `updated_at`, refreshed periodically so
+    dashboards don't COUNT(*) large tables on every load.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    count = models.BigIntegerField(default=0)
+    estimated = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
 class Cart(models.Model):
     customer = models.ForeignKey("Customer", on_delete=models.CASCADE)
     branch = models.ForeignKey("Branch", on_delete=models.SET_NULL, blank=True, null=True)
@@ -459,10 +725,69 @@ class OrderIngredientUsage(models.Model):
     def __str__(self):
         return f"{self.order.order_code} - {self.item.item_name}"
 
+class StockReservation(models.Model):
+    """
+    Ingredients an accepted order holds in BranchStock.reserved until it
+    is cooked (consumed), cancelled or left too long (released).
+    """
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('consumed', 'Consumed'),
+        ('released', 'Released'),
+    )
+
+    order = models.ForeignKey(Order, related_name="reservations", on_delete=models.CASCADE)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("order", "item")
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                condition=Q(status='active'),
+                name='stockreservation_active_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order.order_code} - {self.item.item_name} ({self.status})"
+
+class ReorderSuggestion(models.Model):
+    """
+    Output of the nightly consumption forecast; only items that need
+    restocking get a row.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    avg_daily_usage = models.DecimalField(max_digits=10, decimal_places=2)
+    ema_daily_usage = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    min_level = models.DecimalField(max_digits=10, decimal_places=2)
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    suggested_quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    godown_available = models.DecimalField(max_digits=10, decimal_places=2)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("branch", "item")
+
+    def __str__(self):
+        return f"{self.branch} - {self.item} (+{self.suggested_quantity})"
+
 class TiexCollect(models.Model):
     gst = models.DecimalField(max_digits=10, decimal_places=2)
     branch = models.ForeignKey("Branch", on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="tiexcollect_created_at_idx"),
+        ]
+
     def __str__(self):
         return f"{self.branch}"
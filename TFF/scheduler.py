@@ -0,0 +1,120 @@
+import logging
+import zlib
+from contextlib import contextmanager
+from apscheduler.schedulers.blocking import BlockingScheduler
+from django.conf import settings
+from django.db import close_old_connections, connection
+from TFF.services.stock_service import handle_stock_request_timeouts
+from TFF.services.stock_ledger import take_snapshots
+from TFF.services.forecast_service import generate_reorder_suggestions
+from TFF.services.reservation_service import release_expired_reservations
+from TFF.services.rollup_service import rollup_daily_analytics
+from TFF.services.row_counts import refresh_row_counts
+from TFF.services.branch_sales import reconcile_branch_sales
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+
+# -----------------------------
+# Leader lock
+# -----------------------------
+@contextmanager
+def leader_lock(name):
+    """
+    Only the run_scheduler process schedules jobs, but two of them can
+    overlap (a deploy, a second dyno); a Postgres advisory lock makes
+    sure only one does the work on each tick. Other backends are
+    single-process setups, so the caller always leads.
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    key = zlib.crc32(name.encode())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        acquired = cursor.fetchone()[0]
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+def run_job(name, func):
+    close_old_connections()
+    try:
+        with leader_lock(name) as leader:
+            if leader:
+                func()
+    except Exception:
+        logger.exception("Scheduled job %s failed", name)
+    finally:
+        close_old_connections()
+
+# -----------------------------
+# Jobs
+# -----------------------------
+def scheduled_jobs():
+    return [
+        (
+            "stock_request_timeouts",
+            handle_stock_request_timeouts,
+            {"trigger": "interval", "seconds": getattr(settings, "STOCK_TIMEOUT_INTERVAL_SECONDS", 60)},
+        ),
+        (
+            "stock_reservation_timeouts",
+            release_expired_reservations,
+            {"trigger": "interval", "seconds": getattr(settings, "STOCK_TIMEOUT_INTERVAL_SECONDS", 60)},
+        ),
+        (
+            "daily_analytics_rollup",
+            rollup_daily_analytics,
+            {"trigger": "interval", "minutes": getattr(settings, "ANALYTICS_ROLLUP_MINUTES", 10)},
+        ),
+        (
+            "row_counts",
+            refresh_row_counts,
+            {"trigger": "interval", "minutes": getattr(settings, "ROW_COUNT_REFRESH_MINUTES", 15)},
+        ),
+        (
+            "branch_sales_reconcile",
+            reconcile_branch_sales,
+            {"trigger": "interval", "minutes": getattr(settings, "BRANCH_SALES_RECONCILE_MINUTES", 60)},
+        ),
+        (
+            "stock_snapshots",
+            take_snapshots,
+            {"trigger": "cron", "hour": getattr(settings, "STOCK_SNAPSHOT_HOUR", 3)},
+        ),
+        (
+            "reorder_forecast",
+            generate_reorder_suggestions,
+            {"trigger": "cron", "hour": getattr(settings, "REORDER_FORECAST_HOUR", 4)},
+        ),
+    ]
+
+def start():
+    """Run the jobs in the foreground until interrupted."""
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    _scheduler = BlockingScheduler(timezone=settings.TIME_ZONE)
+
+    for name, func, trigger in scheduled_jobs():
+        _scheduler.add_job(
+            run_job,
+            args=[name, func],
+            id=name,
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+            **trigger,
+        )
+
+    logger.info("Scheduler starting with %d jobs", len(_scheduler.get_jobs()))
+    _scheduler.start()
+    return _scheduler
@@ -3,6 +3,10 @@ from django.utils import timezone
 from .models import *
 
 class BranchSerializer(serializers.ModelSerializer):
+    sales = serializers.DecimalField(
+        max_digits=14, decimal_places=2, source="sales_total", read_only=True
+    )
+
     class Meta:
         model = Branch
         fields = "__all__"
@@ -0,0 +1,74 @@
+import random
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from ..models import Branch, BranchSalesShard, Order
+
+# Slots per branch; enough that simultaneous checkouts rarely share one
+SALES_SHARDS = 8
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Decimal("0.00")
+
+def _ensure_shards(branch_id):
+    BranchSalesShard.objects.bulk_create(
+        [BranchSalesShard(branch_id=branch_id, slot=slot) for slot in range(SALES_SHARDS)],
+        ignore_conflicts=True,
+    )
+
+# ✅ Add to (or, negative, take from) a branch's running sales
+def add_branch_sale(branch_id, amount):
+    """
+    A single F() increment of one randomly picked slot; the Branch row
+    itself is never written, so checkouts at a busy branch only contend
+    when they happen to pick the same slot.
+    """
+    shard = BranchSalesShard.objects.filter(
+        branch_id=branch_id, slot=random.randrange(SALES_SHARDS)
+    )
+    if not shard.update(amount=F("amount") + amount):
+        _ensure_shards(branch_id)
+        shard.update(amount=F("amount") + amount)
+
+def with_sales_total(branches):
+    """Annotate `shard_sales` so Branch.sales_total needs no query per branch."""
+    return branches.annotate(shard_sales=Coalesce(
+        Subquery(
+            BranchSalesShard.objects.filter(branch=OuterRef("pk"))
+            .order_by().values("branch")
+            .annotate(total=Sum("amount")).values("total"),
+            output_field=MONEY,
+        ),
+        Value(ZERO, output_field=MONEY),
+    ))
+
+# ✅ Periodic: make every branch's shards add up to its orders
+def reconcile_branch_sales():
+    """
+    Sales are the total of every order placed at the branch (cancelled
+    orders are deleted). Each branch is fixed in its own short
+    transaction: its slots are locked first, so an order committing
+    meanwhile is either in both sums or in neither, and the difference
+    is folded into slot 0. Returns {branch_id: correction} for branches
+    that were off.
+    """
+    corrections = {}
+    for branch_id in Branch.objects.values_list("id", flat=True):
+        _ensure_shards(branch_id)
+        with transaction.atomic():
+            shards = list(
+                BranchSalesShard.objects.select_for_update()
+                .filter(branch_id=branch_id).values_list("amount", flat=True)
+            )
+            expected = (
+                Order.objects.filter(branch_id=branch_id)
+                .aggregate(total=Sum("total_amount"))["total"] or ZERO
+            )
+            diff = expected - sum(shards, ZERO)
+            if diff:
+                BranchSalesShard.objects.filter(branch_id=branch_id, slot=0).update(
+                    amount=F("amount") + diff
+                )
+                corrections[branch_id] = diff
+    return corrections
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from django.db.models import F
+from django.utils import timezone
+from ..models import PrepTimeStat
+
+PREP_TIME_ALPHA = 0.2               # weight of the newest sample
+DEFAULT_PREP_SECONDS = 15 * 60      # until a branch has history for an item
+
+# ✅ Fold one finished order into the branch's prep-time model
+def record_preparation(order):
+    started = order.accepted_at
+    finished = order.ready_at or order.completed_at
+    if not started or not finished:
+        return
+
+    seconds = max((finished - started).total_seconds(), 0)
+
+    # Items of an order are cooked together, so each one is credited
+    # with the time the whole order took.
+    menu_item_ids = set(order.items.values_list("menu_item_id", flat=True))
+    if not menu_item_ids:
+        return
+
+    stats = PrepTimeStat.objects.filter(
+        branch_id=order.branch_id, menu_item_id__in=menu_item_ids
+    )
+    known = set(stats.values_list("menu_item_id", flat=True))
+
+    stats.update(
+        avg_seconds=F("avg_seconds") + PREP_TIME_ALPHA * (seconds - F("avg_seconds")),
+        samples=F("samples") + 1,
+    )
+
+    PrepTimeStat.objects.bulk_create(
+        [
+            PrepTimeStat(
+                branch_id=order.branch_id,
+                menu_item_id=menu_item_id,
+                avg_seconds=seconds,
+            )
+            for menu_item_id in menu_item_ids - known
+        ],
+        ignore_conflicts=True,
+    )
+
+# ✅ Expected ready time for each active order, keyed by order id
+def estimate_ready_times(orders):
+    """
+    `orders` should have `items` prefetched; the model itself is read in
+    a single query for the whole batch.
+    """
+    orders = list(orders)
+    branch_ids = {o.branch_id for o in orders}
+    menu_item_ids = {i.menu_item_id for o in orders for i in o.items.all()}
+
+    averages = {
+        (s.branch_id, s.menu_item_id): s.avg_seconds
+        for s in PrepTimeStat.objects.filter(
+            branch_id__in=branch_ids, menu_item_id__in=menu_item_ids
+        )
+    }
+
+    current_time = timezone.now()
+    etas = {}
+    for order in orders:
+        if order.status in ("ready", "completed"):
+            etas[order.id] = order.ready_at or order.completed_at
+            continue
+
+        prep_seconds = max(
+            (
+                averages.get((order.branch_id, i.menu_item_id), DEFAULT_PREP_SECONDS)
+                for i in order.items.all()
+            ),
+            default=DEFAULT_PREP_SECONDS,
+        )
+        started = order.accepted_at or current_time
+        etas[order.id] = timezone.localtime(
+            max(started + timedelta(seconds=prep_seconds), current_time)
+        )
+
+    return etas
@@ -0,0 +1,136 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from ..models import Branch, Expense, Order
+
+EXPENSE_IMPORT_MAX_ROWS = 5000
+
+EXPENSE_COLUMNS = ("branch_id", "description", "amount", "expense_date")
+
+# Expense.amount is DecimalField(max_digits=10, decimal_places=2)
+MAX_AMOUNT = Decimal("99999999.99")
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Decimal("0.00")
+
+class ExpenseImportError(Exception):
+    def __init__(self, errors, message="Expense import rejected"):
+        super().__init__(message)
+        self.errors = errors
+
+def parse_expense_csv(upload):
+    """Rows of an uploaded CSV with a header line naming EXPENSE_COLUMNS."""
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    return list(csv.DictReader(text))
+
+# ✅ Validate every line in one pass, then insert them all at once
+def import_expenses(rows, branch=None):
+    """
+    `rows` are dicts with branch_id (branch code), description, amount
+    and expense_date (YYYY-MM-DD). With `branch`, every row belongs to
+    it and branch_id may be left out. Nothing is saved unless every row
+    is valid; otherwise ExpenseImportError lists each problem with its
+    1-based row number.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise ExpenseImportError([{"row": None, "error": "No expense rows given"}])
+    if len(rows) > EXPENSE_IMPORT_MAX_ROWS:
+        raise ExpenseImportError([
+            {"row": None, "error": f"At most {EXPENSE_IMPORT_MAX_ROWS} rows per import"}
+        ])
+
+    branch_ids = dict(Branch.objects.values_list("branch_code", "id"))
+    today = timezone.localdate()
+
+    expenses, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "error": "Expected an object"})
+            continue
+
+        def fail(field, error):
+            errors.append({"row": number, "field": field, "error": error})
+
+        code = str(row.get("branch_id") or "").strip()
+        if branch is not None:
+            branch_id = branch.id
+            if code and code != branch.branch_code:
+                fail("branch_id", f"Only {branch.branch_code} expenses can be imported here")
+        else:
+            branch_id = branch_ids.get(code)
+            if branch_id is None:
+                fail("branch_id", f"Unknown branch {code!r}" if code else "Required")
+
+        description = str(row.get("description") or "").strip()
+        if not description:
+            fail("description", "Required")
+
+        try:
+            amount = Decimal(str(row.get("amount", "")).strip()).quantize(Decimal("0.01"))
+        except (InvalidOperation, ValueError):
+            amount = None
+        if amount is None or not amount.is_finite():
+            fail("amount", "Not a number")
+        elif not ZERO < amount <= MAX_AMOUNT:
+            fail("amount", f"Must be between 0.01 and {MAX_AMOUNT}")
+
+        try:
+            expense_date = parse_date(str(row.get("expense_date") or "").strip())
+        except ValueError:
+            expense_date = None
+        if expense_date is None:
+            fail("expense_date", "Expected YYYY-MM-DD")
+        elif expense_date > today:
+            fail("expense_date", "Cannot be in the future")
+
+        if not errors:
+            expenses.append(Expense(
+                branch_id=branch_id,
+                description=description,
+                amount=amount,
+                expense_date=expense_date,
+            ))
+
+    if errors:
+        raise ExpenseImportError(errors)
+
+    with transaction.atomic():
+        return Expense.objects.bulk_create(expenses, batch_size=500)
+
+def _sum_per_branch(qs, field):
+    return Coalesce(
+        Subquery(
+            qs.filter(branch=OuterRef("pk"))
+            .order_by().values("branch")
+            .annotate(total=Sum(field)).values("total"),
+            output_field=MONEY,
+        ),
+        Value(ZERO, output_field=MONEY),
+    )
+
+# ✅ Completed sales, expenses and profit of every branch, in one query
+def branch_profit(period, branch=None):
+    completed = Order.objects.filter(period.filter(), status="completed")
+    expenses = Expense.objects.filter(expense_date__range=(period.first, period.last))
+
+    branches = Branch.objects.all() if branch is None else Branch.objects.filter(pk=branch.pk)
+    return list(
+        branches
+        .annotate(
+            completed_sales=_sum_per_branch(completed, "total_amount"),
+            completed_gst=_sum_per_branch(completed, "gst_amount"),
+            expense_total=_sum_per_branch(expenses, "amount"),
+        )
+        # GST is collected for the government, not earned
+        .annotate(profit=F("completed_sales") - F("completed_gst") - F("expense_total"))
+        .order_by("-profit", "branch_code")
+        .values(
+            "id", "branch_code", "branch_name",
+            "completed_sales", "completed_gst", "expense_total", "profit",
+        )
+    )
@@ -0,0 +1,145 @@
+import csv
+from datetime import datetime
+from itertools import islice
+from django.utils import timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..models import Order, OrderIngredientUsage, OrderItem, TiexCollect
+
+EXPORT_CHUNK_SIZE = 2000
+
+# dataset -> (model, period field, branch field, [(column, field lookup, type)])
+EXPORT_DATASETS = {
+    "orders": (Order, "created_at", "branch", [
+        ("order_id", "id", "int"),
+        ("order_code", "order_code", "str"),
+        ("branch_code", "branch__branch_code", "str"),
+        ("customer_id", "customer_id", "int"),
+        ("status", "status", "str"),
+        ("subtotal", "subtotal", "decimal"),
+        ("gst_amount", "gst_amount", "decimal"),
+        ("total_amount", "total_amount", "decimal"),
+        ("priority", "priority", "int"),
+        ("created_at", "created_at", "datetime"),
+        ("accepted_at", "accepted_at", "datetime"),
+        ("ready_at", "ready_at", "datetime"),
+        ("completed_at", "completed_at", "datetime"),
+    ]),
+    "order_items": (OrderItem, "order__created_at", "order__branch", [
+        ("order_id", "order_id", "int"),
+        ("order_code", "order__order_code", "str"),
+        ("branch_code", "order__branch__branch_code", "str"),
+        ("menu_item_id", "menu_item_id", "int"),
+        ("menu_item", "menu_item__name", "str"),
+        ("quantity", "quantity", "int"),
+        ("price", "price", "decimal"),
+        ("discount", "discount", "decimal"),
+        ("order_created_at", "order__created_at", "datetime"),
+    ]),
+    "gst": (TiexCollect, "created_at", "branch", [
+        ("id", "id", "int"),
+        ("branch_code", "branch__branch_code", "str"),
+        ("gst", "gst", "decimal"),
+        ("created_at", "created_at", "datetime"),
+    ]),
+    "ingredient_usage": (OrderIngredientUsage, "created_at", "order__branch", [
+        ("order_id", "order_id", "int"),
+        ("order_code", "order__order_code", "str"),
+        ("branch_code", "order__branch__branch_code", "str"),
+        ("item_id", "item_id", "int"),
+        ("item", "item__item_name", "str"),
+        ("quantity_used", "quantity_used", "decimal"),
+        ("created_at", "created_at", "datetime"),
+    ]),
+}
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def export_rows(dataset, period, branch=None):
+    """Rows of `dataset` for a ReportingPeriod, read in chunks."""
+    model, field, branch_field, columns = EXPORT_DATASETS[dataset]
+    rows = model.objects.filter(period.filter(field))
+    if branch is not None:
+        rows = rows.filter(**{branch_field: branch})
+    return (
+        rows.order_by(field, "pk")
+        .values_list(*[lookup for _, lookup, _ in columns])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+class _Echo:
+    """File-like object that hands back whatever csv.writer writes."""
+    def write(self, value):
+        return value
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return "" if value is None else value
+
+# ✅ CSV, one encoded line at a time
+def stream_csv(dataset, period, branch=None):
+    columns = EXPORT_DATASETS[dataset][3]
+    writer = csv.writer(_Echo())
+
+    yield writer.writerow([name for name, _, _ in columns]).encode()
+    for row in export_rows(dataset, period, branch):
+        yield writer.writerow([_csv_value(v) for v in row]).encode()
+
+class _ByteQueue:
+    """Write-only sink for ParquetWriter; the bytes are drained after each row group."""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def _arrow_schema(columns):
+    types = {
+        "int": pa.int64(),
+        "str": pa.string(),
+        "decimal": pa.decimal128(12, 2),
+        "datetime": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, _, kind in columns])
+
+# ✅ Parquet, one row group per chunk
+def stream_parquet(dataset, period, branch=None):
+    columns = EXPORT_DATASETS[dataset][3]
+    schema = _arrow_schema(columns)
+    sink = _ByteQueue()
+    rows = export_rows(dataset, period, branch)
+
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        while True:
+            chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=schema.field(i).type) for i, values in enumerate(zip(*chunk))],
+                schema=schema,
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+def stream_export(dataset, period, fmt="csv", branch=None):
+    if fmt == "parquet":
+        return stream_parquet(dataset, period, branch)
+    return stream_csv(dataset, period, branch)
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import BranchStock, GodownLot, OrderIngredientUsage, ReorderSuggestion
+from .reporting_periods import day_start
+
+FORECAST_WINDOW_DAYS = 28
+EMA_SPAN_DAYS = 7
+REORDER_COVER_DAYS = 3     # stock to hold above min level, in days of usage
+
+TWO_PLACES = Decimal("0.01")
+
+# ✅ Daily usage series per (branch, item) over the forecast window
+def daily_usage(days=FORECAST_WINDOW_DAYS, today=None):
+    """
+    {(branch_id, item_id): [qty per day, oldest first]} built from one
+    grouped query; days without usage are zero-filled. Only closed days
+    count: today's partial bucket would drag the EMA down.
+    """
+    today = today or timezone.localdate()
+    first_day = today - timedelta(days=days)
+
+    rows = (
+        OrderIngredientUsage.objects
+        .filter(created_at__gte=day_start(first_day), created_at__lt=day_start(today))
+        .annotate(day=TruncDate("created_at"))
+        .values("order__branch_id", "item_id", "day")
+        .annotate(total=Sum("quantity_used"))
+    )
+
+    series = defaultdict(lambda: [0.0] * days)
+    for row in rows:
+        index = (row["day"] - first_day).days
+        if 0 <= index < days:
+            series[(row["order__branch_id"], row["item_id"])][index] += float(row["total"])
+    return series
+
+# ✅ Mean and exponential moving average of a daily series
+def usage_rates(daily, span=EMA_SPAN_DAYS):
+    alpha = 2 / (span + 1)
+    ema = daily[0]
+    for value in daily[1:]:
+        ema += alpha * (value - ema)
+    return sum(daily) / len(daily), ema
+
+def _money(value):
+    return Decimal(str(value)).quantize(TWO_PLACES)
+
+# ✅ Nightly batch: rebuild the reorder suggestions table
+def generate_reorder_suggestions():
+    generated_at = timezone.now()
+    series = daily_usage()
+    if not series:
+        ReorderSuggestion.objects.all().delete()
+        return 0
+
+    stocks = {
+        (s.branch_id, s.item_id): s
+        for s in BranchStock.objects.filter(
+            branch_id__in={b for b, _ in series},
+            item_id__in={i for _, i in series},
+        )
+    }
+    # Expired lots can't be handed out, so they don't count as available
+    godown = dict(
+        GodownLot.objects.filter(quantity__gt=0)
+        .exclude(expiry_date__lt=timezone.localdate())
+        .order_by().values("item_id")
+        .annotate(total=Sum("quantity")).values_list("item_id", "total")
+    )
+
+    suggestions = []
+    for (branch_id, item_id), daily in series.items():
+        stock = stocks.get((branch_id, item_id))
+        if stock is None:
+            continue
+
+        mean, ema = usage_rates(daily)
+        target = stock.min_level + _money(ema * REORDER_COVER_DAYS)
+        suggested = target - stock.quantity
+        if suggested <= 0:
+            continue
+
+        suggestions.append(ReorderSuggestion(
+            branch_id=branch_id,
+            item_id=item_id,
+            avg_daily_usage=_money(mean),
+            ema_daily_usage=_money(ema),
+            quantity=stock.quantity,
+            min_level=stock.min_level,
+            days_of_cover=(stock.quantity / _money(ema)).quantize(Decimal("0.1")) if ema >= 0.01 else None,
+            suggested_quantity=suggested,
+            godown_available=godown.get(item_id, Decimal("0.00")),
+            generated_at=generated_at,
+        ))
+
+    with transaction.atomic():
+        ReorderSuggestion.objects.all().delete()
+        ReorderSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+    return len(suggestions)
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from ..models import Branch, Employees, Order
+from .order_notifier import notify_order_change
+from .reservation_service import reserve_order_stock
+from .stock_service import InsufficientStock
+
+DISPATCH_POLICIES = {
+    "fifo": ("created_at", "id"),
+    "priority": ("-priority", "created_at", "id"),
+}
+
+def dispatch_policy(policy=None):
+    return policy or getattr(settings, "DISPATCH_POLICY", "fifo")
+
+# ✅ A branch's unassigned pending orders, next to be cooked first
+def dispatch_queue(branch, policy=None):
+    return Order.objects.filter(
+        branch=branch, status="pending", assigned_chef__isnull=True
+    ).order_by(*DISPATCH_POLICIES[dispatch_policy(policy)])
+
+def active_orders(chefs):
+    return Order.objects.filter(assigned_chef__in=chefs).exclude(
+        status__in=["completed", "cancelled"]
+    )
+
+# ✅ Chefs on shift at the branch who have nothing on the stove
+def idle_chefs(branch):
+    busy = Order.objects.filter(
+        assigned_chef=OuterRef("pk")
+    ).exclude(status__in=["completed", "cancelled"])
+
+    return Employees.objects.filter(
+        branch=branch,
+        role="chef",
+        is_active=True,
+        is_working=True,
+        is_logged_in=True,
+    ).exclude(Exists(busy)).order_by("id")
+
+# ✅ Hand the branch's pending orders to its idle chefs
+@transaction.atomic
+def dispatch_branch_orders(branch, policy=None):
+    # Rows another dispatcher (or a chef accepting by hand) is holding
+    # are skipped, so several workers can run this side by side.
+    chefs = list(idle_chefs(branch).select_for_update(skip_locked=True))
+
+    # Re-check under the lock: a manual accept that committed after the
+    # idle check ran must not get its chef a second order.
+    busy = set(active_orders(chefs).values_list("assigned_chef_id", flat=True))
+    chefs = [chef for chef in chefs if chef.id not in busy]
+    if not chefs:
+        return []
+
+    # Read the queue a chef's worth at a time: an order the branch can't
+    # stock is passed over rather than keeping its chef idle.
+    orders = dispatch_queue(branch, policy).select_for_update(skip_locked=True)
+
+    assigned = []
+    for order in orders.iterator(chunk_size=len(chefs)):
+        if len(assigned) == len(chefs):
+            break
+        chef = chefs[len(assigned)]
+        try:
+            with transaction.atomic():
+                claimed = Order.objects.filter(
+                    id=order.id, status="pending"
+                ).update(status="preparing", assigned_chef=chef, accepted_at=timezone.now())
+
+                if claimed:
+                    reserve_order_stock(order)
+        except InsufficientStock:
+            continue    # stays pending; the chef takes the next order
+
+        if claimed:
+            assigned.append((order, chef))
+
+    def notify_customers():
+        for order, _ in assigned:
+            notify_order_change(order.customer_id)
+
+    transaction.on_commit(notify_customers)
+    return assigned
+
+# ✅ One dispatch pass over every branch with waiting orders
+def dispatch_pending_orders(policy=None, branches=None):
+    if branches is None:
+        branches = Branch.objects.filter(
+            order__status="pending"
+        ).distinct()
+
+    assigned = []
+    for branch in branches:
+        assigned.extend(dispatch_branch_orders(branch, policy))
+    return assigned
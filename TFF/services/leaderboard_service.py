@@ -0,0 +1,95 @@
+from calendar import month_name
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, Rank
+from django.utils import timezone
+from ..models import Branch, DailyAnalytics, Employees, Order
+from .reporting_periods import days_period, reporting_period
+from .rollup_service import rolled_through
+
+LEADERBOARD_CACHE_KEY = "branch_leaderboard"
+LEADERBOARD_CACHE_SECONDS = 300   # backstop; placing an order clears it
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal("0.00"), output_field=MONEY)
+
+def _sum_per_branch(qs, field):
+    return Coalesce(
+        Subquery(
+            qs.filter(branch=OuterRef("pk"))
+            .order_by().values("branch")
+            .annotate(total=Sum(field)).values("total"),
+            output_field=MONEY,
+        ),
+        ZERO,
+    )
+
+# ✅ Sales of each branch over a reporting period, as a Branch annotation
+def _sales_between(period, closed_until):
+    """Closed days from DailyAnalytics, the rest from Order."""
+    first, last = period.first, period.last
+    sales = ZERO
+    if closed_until and first <= closed_until:
+        sales = sales + _sum_per_branch(
+            DailyAnalytics.objects.filter(date__gte=first, date__lte=min(last, closed_until)),
+            "total_sales",
+        )
+
+    live_first = max(first, closed_until + timedelta(days=1)) if closed_until else first
+    if live_first <= last:
+        sales = sales + _sum_per_branch(
+            Order.objects.filter(days_period(live_first, last).filter()),
+            "total_amount",
+        )
+    return sales
+
+# ✅ Every branch ranked by this month's sales, in one query
+def branch_leaderboard():
+    today = timezone.localdate()
+    key = f"{LEADERBOARD_CACHE_KEY}:{today.isoformat()}"
+
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    current = reporting_period("month", today)
+    previous = reporting_period("previous_month", today)
+    closed_until = rolled_through()
+
+    manager = (
+        Employees.objects.filter(branch=OuterRef("pk"), role="branch_manager")
+        .order_by("id").values("username")[:1]
+    )
+
+    branches = (
+        Branch.objects
+        .annotate(
+            manager=Subquery(manager),
+            previous_month_sales=_sales_between(previous, closed_until),
+            current_month_sales=_sales_between(current, closed_until),
+        )
+        .annotate(rank=Window(Rank(), order_by=F("current_month_sales").desc()))
+        .order_by("-current_month_sales", "id")
+        .values("branch_name", "branch_code", "manager", "previous_month_sales", "current_month_sales", "rank")
+    )
+
+    data = [
+        {
+            "rank": b["rank"],
+            "branch_name": b["branch_name"],
+            "branch_code": b["branch_code"],
+            "branch_manager": b["manager"],
+            "previous_month_name": month_name[previous.first.month],
+            "previous_month_sales": float(b["previous_month_sales"]),
+            "current_month_name": month_name[today.month],
+            "current_month_sales": float(b["current_month_sales"]),
+        }
+        for b in branches
+    ]
+    cache.set(key, data, LEADERBOARD_CACHE_SECONDS)
+    return data
+
+def invalidate_leaderboard():
+    cache.delete(f"{LEADERBOARD_CACHE_KEY}:{timezone.localdate().isoformat()}")
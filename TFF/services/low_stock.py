@@ -0,0 +1,101 @@
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Branch, Item, LowStockAlert
+
+def _pairs_filter(stocks):
+    return reduce(or_, (Q(branch_id=s.branch_id, item_id=s.item_id) for s in stocks))
+
+def _open_alerts(stocks):
+    """
+    Insert an open alert per stock row, recording the unreserved
+    quantity, skipping pairs that already have one, and return just the
+    alerts that were inserted.
+    """
+    if not stocks:
+        return []
+
+    now = timezone.now()
+    if connection.vendor in ("postgresql", "sqlite"):
+        table = connection.ops.quote_name(LowStockAlert._meta.db_table)
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(stocks))
+        with connection.cursor() as cursor:
+            # The conflict target names the one_open_low_stock_alert index
+            cursor.execute(
+                f"INSERT INTO {table} (branch_id, item_id, quantity, min_level, created_at) "
+                f"VALUES {placeholders} "
+                f"ON CONFLICT (branch_id, item_id) WHERE resolved_at IS NULL DO NOTHING "
+                f"RETURNING id",
+                [
+                    value
+                    for s in stocks
+                    for value in (s.branch_id, s.item_id, s.quantity - s.reserved, s.min_level, now)
+                ],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return list(LowStockAlert.objects.filter(id__in=ids).order_by("id"))
+
+    alerts = []
+    for s in stocks:
+        try:
+            with transaction.atomic():
+                alerts.append(LowStockAlert.objects.create(
+                    branch_id=s.branch_id,
+                    item_id=s.item_id,
+                    quantity=s.quantity - s.reserved,
+                    min_level=s.min_level,
+                ))
+        except IntegrityError:
+            pass
+    return alerts
+
+# ✅ Open / resolve alerts for the stock rows an operation just changed
+def check_low_stock(stocks):
+    """
+    Called with the BranchStock rows a mutation touched, after their new
+    quantities (and reservations) are set. A row is low when what is
+    left after reservations, quantity - reserved, is under min_level.
+    Only those rows are evaluated, so detection costs at most a couple
+    of small indexed queries per stock operation.
+    """
+    low = [s for s in stocks if s.quantity - s.reserved < s.min_level]
+    healthy = [s for s in stocks if s.quantity - s.reserved >= s.min_level]
+
+    if healthy:
+        LowStockAlert.objects.filter(
+            _pairs_filter(healthy), resolved_at__isnull=True
+        ).update(resolved_at=timezone.now())
+
+    if not low:
+        return []
+
+    already_open = set(
+        LowStockAlert.objects.filter(_pairs_filter(low), resolved_at__isnull=True)
+        .values_list("branch_id", "item_id")
+    )
+    # Only alerts this call actually inserted; a concurrent operation may
+    # open the same alert first, and must be the only one to act on it.
+    alerts = _open_alerts([
+        s for s in low if (s.branch_id, s.item_id) not in already_open
+    ])
+
+    if alerts and getattr(settings, "LOW_STOCK_AUTO_REQUEST", False):
+        keys = [(a.branch_id, a.item_id, a.min_level - a.quantity) for a in alerts]
+        transaction.on_commit(lambda: request_restock(keys))
+    return alerts
+
+# ✅ Raise a smart stock request for each new shortage
+def request_restock(keys):
+    from .stock_service import create_smart_stock_request  # avoids a circular import
+
+    branches = Branch.objects.in_bulk({k[0] for k in keys})
+    items = Item.objects.in_bulk({k[1] for k in keys})
+
+    for branch_id, item_id, shortage in keys:
+        req = create_smart_stock_request(branches[branch_id], items[item_id], shortage)
+        LowStockAlert.objects.filter(
+            branch_id=branch_id, item_id=item_id, resolved_at__isnull=True
+        ).update(stock_request=req)
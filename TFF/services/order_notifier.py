@@ -0,0 +1,119 @@
+import logging
+import select
+import threading
+import time
+from collections import Counter
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Wake-up channel for customers long-polling their orders.
+#
+# A version is the millisecond timestamp of a customer's latest order
+# change, so every process agrees on which is newer. On Postgres an
+# order change is a NOTIFY: it is sent when the changing transaction
+# commits and writes nothing. One listener thread per process receives
+# it and wakes that process's waiters, which only ever hold the
+# in-process condition, never a DB connection. Other backends are
+# single-process dev setups and are woken in-process after commit.
+CHANNEL = "order_changes"
+
+# How long the listener blocks on its socket before checking it is alive
+LISTEN_POLL_SECONDS = 5
+RECONNECT_SECONDS = 2
+
+_condition = threading.Condition()
+_versions = {}
+_waiting = Counter()
+_listener = None
+
+
+def current_version(customer_id):
+    with _condition:
+        return _versions.get(customer_id, 0)
+
+
+def _deliver(customer_id, version):
+    """Record a change seen by this process and wake its waiters."""
+    with _condition:
+        # Never step back, and never repeat a version two changes share
+        _versions[customer_id] = max(version, _versions.get(customer_id, 0) + 1)
+        _condition.notify_all()
+
+
+def _wake_waiters():
+    """After a listener reconnect: notifications may have been missed."""
+    with _condition:
+        for customer_id in list(_waiting):
+            _versions[customer_id] = _versions.get(customer_id, 0) + 1
+        _condition.notify_all()
+
+
+def notify_order_change(customer_id):
+    version = time.time_ns() // 1_000_000
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, f"{customer_id}:{version}"])
+    else:
+        transaction.on_commit(lambda: _deliver(customer_id, version))
+
+
+def _listen_forever():
+    while True:
+        listener = connections.create_connection("default")
+        try:
+            listener.ensure_connection()
+            listener.set_autocommit(True)
+            with listener.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            _wake_waiters()
+
+            raw = listener.connection
+            while True:
+                if select.select([raw], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    payload = raw.notifies.pop(0).payload
+                    customer_id, version = payload.split(":")
+                    _deliver(int(customer_id), int(version))
+        except Exception:
+            logger.exception("Order change listener lost its connection")
+            time.sleep(RECONNECT_SECONDS)
+        finally:
+            listener.close()
+
+
+def _ensure_listener():
+    global _listener
+    if connection.vendor != "postgresql":
+        return
+    with _condition:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(
+                target=_listen_forever, name="order-change-listener", daemon=True
+            )
+            _listener.start()
+
+
+def wait_for_order_change(customer_id, since, timeout):
+    """
+    Block until the customer's version is newer than `since` or the
+    timeout elapses. Returns the latest version this process has seen.
+    """
+    _ensure_listener()
+    deadline = time.monotonic() + timeout
+
+    with _condition:
+        _waiting[customer_id] += 1
+        try:
+            while _versions.get(customer_id, 0) <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _condition.wait(remaining)
+            return _versions.get(customer_id, 0)
+        finally:
+            _waiting[customer_id] -= 1
+            if not _waiting[customer_id]:
+                del _waiting[customer_id]
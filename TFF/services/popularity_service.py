@@ -0,0 +1,118 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+from ..models import MenuItemDailySales, OrderItem
+
+POPULAR_DAYS = 30
+
+ZERO = Decimal("0.00")
+
+def _line_revenue(line):
+    return max(line.price - (line.discount or ZERO), ZERO) * line.quantity
+
+# ✅ Bump (or, with sign=-1, take back) an order's per-item daily counters
+def record_menu_sales(order, lines, sign=1):
+    """
+    `lines` are the order's OrderItems. One multi-row
+    INSERT ... ON CONFLICT DO UPDATE adds every item's plates and revenue
+    to today's row for the branch, creating rows as needed, so concurrent
+    orders never lose an increment.
+    """
+    day = timezone.localdate(order.created_at)
+    totals = defaultdict(lambda: [0, ZERO])
+    for line in lines:
+        totals[line.menu_item_id][0] += sign * line.quantity
+        totals[line.menu_item_id][1] += sign * _line_revenue(line)
+    if not totals:
+        return
+
+    rows = [
+        (order.branch_id, menu_item_id, day, quantity, revenue)
+        for menu_item_id, (quantity, revenue) in sorted(totals.items())
+    ]
+
+    if connection.vendor in ("postgresql", "sqlite"):
+        table = connection.ops.quote_name(MenuItemDailySales._meta.db_table)
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (branch_id, menu_item_id, date, quantity, revenue) "
+                f"VALUES {placeholders} "
+                f"ON CONFLICT (branch_id, menu_item_id, date) DO UPDATE SET "
+                f"quantity = {table}.quantity + EXCLUDED.quantity, "
+                f"revenue = {table}.revenue + EXCLUDED.revenue",
+                [value for row in rows for value in row],
+            )
+        return
+
+    with transaction.atomic():
+        for branch_id, menu_item_id, date, quantity, revenue in rows:
+            counter, created = MenuItemDailySales.objects.select_for_update().get_or_create(
+                branch_id=branch_id, menu_item_id=menu_item_id, date=date,
+                defaults={"quantity": quantity, "revenue": revenue},
+            )
+            if not created:
+                MenuItemDailySales.objects.filter(pk=counter.pk).update(
+                    quantity=F("quantity") + quantity,
+                    revenue=F("revenue") + revenue,
+                )
+
+# ✅ Best selling items of a branch over a reporting period
+def top_sellers(branch, period, limit=10):
+    return list(
+        MenuItemDailySales.objects
+        .filter(branch=branch, date__range=(period.first, period.last))
+        .values("menu_item_id", "menu_item__name", "menu_item__category")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .filter(quantity__gt=0)
+        .order_by("-quantity", "-revenue", "menu_item__name")[:limit]
+    )
+
+def sold_quantities(branch_id=None, days=POPULAR_DAYS):
+    """{menu_item_id: plates sold over the last `days` days}, for sorting menus."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    counters = MenuItemDailySales.objects.filter(date__gte=since)
+    if branch_id:
+        counters = counters.filter(branch_id=branch_id)
+    return dict(
+        counters.order_by().values("menu_item_id")
+        .annotate(quantity=Sum("quantity")).values_list("menu_item_id", "quantity")
+    )
+
+# ✅ Rebuild every counter from OrderItem (backfill / repair)
+@transaction.atomic
+def rebuild_menu_sales():
+    money = DecimalField(max_digits=12, decimal_places=2)
+    rows = (
+        OrderItem.objects
+        .annotate(day=TruncDate("order__created_at"))
+        .order_by().values("order__branch_id", "menu_item_id", "day")
+        .annotate(
+            plates=Sum("quantity"),
+            takings=Sum(
+                Greatest(F("price") - Coalesce("discount", Value(ZERO)), Value(ZERO), output_field=money)
+                * F("quantity"),
+                output_field=money,
+            ),
+        )
+    )
+
+    MenuItemDailySales.objects.all().delete()
+    return len(MenuItemDailySales.objects.bulk_create(
+        [
+            MenuItemDailySales(
+                branch_id=r["order__branch_id"],
+                menu_item_id=r["menu_item_id"],
+                date=r["day"],
+                quantity=r["plates"],
+                revenue=r["takings"] or ZERO,
+            )
+            for r in rows
+        ],
+        batch_size=500,
+    ))
@@ -0,0 +1,209 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from math import asin, cos, radians, sin, sqrt
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from ..models import Branch, BranchStock, StockRequest, StockTransfer
+
+def _distance_km(a, b):
+    lat1, lon1 = radians(float(a.latitude)), radians(float(a.longitude))
+    lat2, lon2 = radians(float(b.latitude)), radians(float(b.longitude))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * asin(sqrt(h))
+
+# ✅ Min-cost flow from donors to receivers (successive shortest paths)
+def min_cost_flow(supply, demand, cost):
+    """
+    `supply` / `demand` map node -> quantity, `cost(donor, receiver)` is
+    the price per unit shipped. Returns {(donor, receiver): quantity}
+    moving as much as possible at the lowest total cost.
+    """
+    donors, receivers = list(supply), list(demand)
+    source, sink = 0, 1 + len(donors) + len(receivers)
+    graph = [[] for _ in range(sink + 1)]
+
+    def add_edge(u, v, cap, unit_cost):
+        graph[u].append([v, cap, unit_cost, len(graph[v])])
+        graph[v].append([u, Decimal("0"), -unit_cost, len(graph[u]) - 1])
+
+    for i, d in enumerate(donors):
+        add_edge(source, 1 + i, supply[d], 0)
+        for j, r in enumerate(receivers):
+            add_edge(1 + i, 1 + len(donors) + j, min(supply[d], demand[r]), cost(d, r))
+    for j, r in enumerate(receivers):
+        add_edge(1 + len(donors) + j, sink, demand[r], 0)
+
+    while True:
+        # Bellman-Ford: residual edges carry negative costs
+        dist = [None] * len(graph)
+        prev = [None] * len(graph)
+        dist[source] = 0
+        for _ in range(len(graph) - 1):
+            changed = False
+            for u, edges in enumerate(graph):
+                if dist[u] is None:
+                    continue
+                for k, (v, cap, unit_cost, _) in enumerate(edges):
+                    if cap > 0 and (dist[v] is None or dist[u] + unit_cost < dist[v] - 1e-9):
+                        dist[v] = dist[u] + unit_cost
+                        prev[v] = (u, k)
+                        changed = True
+            if not changed:
+                break
+
+        if dist[sink] is None:
+            break
+
+        path, v = [], sink
+        while v != source:
+            u, k = prev[v]
+            path.append((u, k))
+            v = u
+        pushed = min(graph[u][k][1] for u, k in path)
+        for u, k in path:
+            edge = graph[u][k]
+            edge[1] -= pushed
+            graph[edge[0]][edge[3]][1] += pushed
+
+    flows = {}
+    for i, d in enumerate(donors):
+        for v, cap, _, rev in graph[1 + i]:
+            shipped = graph[v][rev][1]
+            if v != source and shipped > 0:
+                flows[(d, receivers[v - 1 - len(donors)])] = shipped
+    return flows
+
+# ✅ Few transfers: pair the largest donor with the largest receiver
+def fewest_transfers(supply, demand):
+    """
+    Same inputs and result as min_cost_flow, for when every transfer
+    costs the same. A donor whose surplus exactly matches a receiver's
+    need is paired with it first; then the largest remaining donor
+    repeatedly ships to the largest remaining receiver. Every shipment
+    empties a donor or fills a receiver, so there are at most
+    donors + receivers - 1 transfers, and usually far fewer.
+    """
+    supply = {d: q for d, q in supply.items() if q > 0}
+    demand = {r: q for r, q in demand.items() if q > 0}
+    flows = {}
+
+    def ship(donor, receiver, qty):
+        flows[(donor, receiver)] = flows.get((donor, receiver), 0) + qty
+        supply[donor] -= qty
+        demand[receiver] -= qty
+        if not supply[donor]:
+            del supply[donor]
+        if not demand[receiver]:
+            del demand[receiver]
+
+    for donor in sorted(supply, key=lambda d: (-supply[d], d)):
+        match = next(
+            (r for r in sorted(demand) if demand[r] == supply[donor]), None
+        )
+        if match is not None:
+            ship(donor, match, supply[donor])
+
+    while supply and demand:
+        donor = max(supply, key=lambda d: (supply[d], -d))
+        receiver = max(demand, key=lambda r: (demand[r], -r))
+        ship(donor, receiver, min(supply[donor], demand[receiver]))
+    return flows
+
+# ✅ Surplus / shortage of every branch stock row, net of reservations and pending requests
+def _stock_balances():
+    surplus = defaultdict(dict)      # item_id -> {branch_id: qty it can give}
+    shortage = defaultdict(dict)     # item_id -> {branch_id: qty it needs}
+
+    rows = (
+        BranchStock.objects
+        .annotate(balance=F("quantity") - F("min_level") - F("reserved"))
+        .values_list("branch_id", "item_id", "balance")
+    )
+
+    incoming = defaultdict(Decimal)
+    outgoing = defaultdict(Decimal)
+
+    # Stock already on its way (or asked of a donor) is not counted twice
+    pending = (
+        StockRequest.objects.filter(status="pending")
+        .values("from_branch_id", "to_branch_id", "item_id")
+        .annotate(total=Sum("quantity"))
+    )
+    for row in pending:
+        incoming[(row["from_branch_id"], row["item_id"])] += row["total"]
+        if row["to_branch_id"] is not None:
+            outgoing[(row["to_branch_id"], row["item_id"])] += row["total"]
+
+    for branch_id, item_id, balance in rows:
+        key = (branch_id, item_id)
+        if balance - outgoing[key] > 0:
+            surplus[item_id][branch_id] = balance - outgoing[key]
+        elif balance + incoming[key] < 0:
+            shortage[item_id][branch_id] = -(balance + incoming[key])
+    return surplus, shortage
+
+# ✅ Network-wide plan: which branch sends how much of what to whom
+def plan_rebalance(by_distance=False):
+    """
+    Returns [(receiver_id, donor_id, item_id, quantity)]. Each item is an
+    independent transport problem; with `by_distance` it is solved as a
+    min-cost flow priced by the distance between the branches. Otherwise
+    what costs is each transfer (a trip, an approval), not each unit, so
+    the plan aims for the fewest transfers instead.
+    """
+    surplus, shortage = _stock_balances()
+    items = [i for i in shortage if surplus.get(i)]
+    if not items:
+        return []
+
+    branches = Branch.objects.in_bulk() if by_distance else {}
+
+    def cost(donor_id, receiver_id):
+        return _distance_km(branches[donor_id], branches[receiver_id])
+
+    plan = []
+    for item_id in items:
+        if by_distance:
+            flows = min_cost_flow(surplus[item_id], shortage[item_id], cost)
+        else:
+            flows = fewest_transfers(surplus[item_id], shortage[item_id])
+        plan.extend(
+            (receiver_id, donor_id, item_id, qty)
+            for (donor_id, receiver_id), qty in flows.items()
+        )
+    return sorted(plan)
+
+# ✅ Materialize a plan as one StockTransfer per (receiver, donor) pair
+@transaction.atomic
+def apply_rebalance(plan):
+    by_pair = defaultdict(list)
+    for receiver_id, donor_id, item_id, qty in plan:
+        by_pair[(receiver_id, donor_id)].append((item_id, qty))
+
+    expiry = timezone.now() + timedelta(minutes=15)
+    transfers = StockTransfer.objects.bulk_create([
+        StockTransfer(from_branch_id=receiver_id, to_branch_id=donor_id, expires_at=expiry)
+        for receiver_id, donor_id in by_pair
+    ])
+
+    StockRequest.objects.bulk_create([
+        StockRequest(
+            transfer=transfer,
+            from_branch_id=transfer.from_branch_id,
+            to_branch_id=transfer.to_branch_id,
+            item_id=item_id,
+            quantity=qty,
+            expires_at=expiry,
+            from_godown=False,
+        )
+        for transfer in transfers
+        for item_id, qty in by_pair[(transfer.from_branch_id, transfer.to_branch_id)]
+    ])
+    return transfers
+
+def rebalance_stock(by_distance=False, dry_run=False):
+    plan = plan_rebalance(by_distance)
+    transfers = [] if dry_run or not plan else apply_rebalance(plan)
+    return plan, transfers
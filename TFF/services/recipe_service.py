@@ -0,0 +1,102 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from ..models import Item, OrderItem, RecipeIngredient
+from .stock_service import deduct_ingredient_usage
+
+# RecipeIngredient.quantity is DecimalField(max_digits=10, decimal_places=2)
+MAX_QUANTITY = Decimal("99999999.99")
+ZERO = Decimal("0.00")
+
+class InvalidRecipe(Exception):
+    def __init__(self, errors):
+        super().__init__("Invalid recipe")
+        self.errors = errors
+
+# ✅ Ingredient demand per order, from the recipes of what was ordered
+def order_ingredient_demand(orders):
+    """
+    Returns {order_id: {item_id: quantity}} for the given orders, computed
+    in one grouped query over OrderItem x RecipeIngredient.
+    """
+    rows = (
+        OrderItem.objects
+        .filter(order__in=orders, menu_item__recipe__isnull=False)
+        .values("order_id", "menu_item__recipe__item_id")
+        .annotate(total=Sum(
+            F("quantity") * F("menu_item__recipe__quantity"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+    )
+
+    demand = defaultdict(dict)
+    for row in rows:
+        demand[row["order_id"]][row["menu_item__recipe__item_id"]] = row["total"]
+    return demand
+
+# ✅ Total demand of a batch of orders as one (branch, item) vector
+def ingredient_demand_vector(orders):
+    orders = list(orders)
+    branch_of = {o.id: o.branch_id for o in orders}
+
+    vector = defaultdict(Decimal)
+    for order_id, items in order_ingredient_demand(orders).items():
+        for item_id, qty in items.items():
+            vector[(branch_of[order_id], item_id)] += qty
+    return dict(vector)
+
+# ✅ Consume recipe ingredients for a batch of orders in one transaction
+@transaction.atomic
+def consume_recipe_stock(orders):
+    orders = {o.id: o for o in orders}
+    demand = order_ingredient_demand(list(orders.values()))
+
+    usages = [
+        (orders[order_id], item_id, qty)
+        for order_id, items in demand.items()
+        for item_id, qty in items.items()
+    ]
+    return deduct_ingredient_usage(usages)
+
+# ✅ Replace a menu item's recipe
+@transaction.atomic
+def set_recipe(menu_item, ingredients):
+    """
+    `ingredients` are (item_id, quantity per plate) pairs. Raises
+    InvalidRecipe, naming each offending item, when an item is listed
+    twice or its quantity is not a positive amount; the old recipe is
+    left untouched then.
+    """
+    names = Item.objects.in_bulk([item_id for item_id, _ in ingredients])
+
+    errors, seen = [], set()
+    for item_id, qty in ingredients:
+        item = names.get(item_id)
+
+        def fail(error):
+            errors.append({
+                "item_id": item_id,
+                "item": item.item_name if item else None,
+                "error": error,
+            })
+
+        if item_id in seen:
+            fail("Listed more than once")
+        seen.add(item_id)
+
+        if (
+            not qty.is_finite()
+            or not ZERO < qty <= MAX_QUANTITY
+            or qty.quantize(Decimal("0.01")) == ZERO
+        ):
+            fail(f"Quantity must be between 0.01 and {MAX_QUANTITY}")
+
+    if errors:
+        raise InvalidRecipe(errors)
+
+    RecipeIngredient.objects.filter(menu_item=menu_item).delete()
+    return RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(menu_item=menu_item, item_id=item_id, quantity=qty)
+        for item_id, qty in ingredients
+    ])
@@ -0,0 +1,48 @@
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+from django.db.models import Q
+from django.utils import timezone
+
+class ReportingPeriod(NamedTuple):
+    """
+    Local days `first`..`last` (inclusive) and the matching half-open
+    aware range [start, end) to filter timestamps with.
+    """
+    first: object
+    last: object
+    start: datetime
+    end: datetime
+
+    def filter(self, field="created_at"):
+        return Q(**{f"{field}__gte": self.start, f"{field}__lt": self.end})
+
+# ✅ Midnight (local time) at the start of `day`, as an aware datetime
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def days_period(first, last):
+    return ReportingPeriod(first, last, day_start(first), day_start(last + timedelta(days=1)))
+
+# ✅ Named reporting periods, relative to today (local date)
+def reporting_period(name, today=None, first=None, last=None):
+    """
+    `name` is one of today / week / month / previous_month / custom.
+    Week and month run up to and including today; custom needs
+    `first` and `last`.
+    """
+    today = today or timezone.localdate()
+
+    if name == "today":
+        return days_period(today, today)
+    if name == "week":
+        return days_period(today - timedelta(days=today.weekday()), today)
+    if name == "month":
+        return days_period(today.replace(day=1), today)
+    if name == "previous_month":
+        last_day = today.replace(day=1) - timedelta(days=1)
+        return days_period(last_day.replace(day=1), last_day)
+    if name == "custom":
+        if first is None or last is None:
+            raise ValueError("custom period needs first and last")
+        return days_period(first, last)
+    raise ValueError(f"Unknown reporting period: {name}")
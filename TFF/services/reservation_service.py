@@ -0,0 +1,121 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+from ..models import BranchStock, Item, StockReservation
+from .low_stock import check_low_stock
+from .recipe_service import order_ingredient_demand
+from .stock_service import InsufficientStock
+from .stock_summary import invalidate_stock_summary
+
+def _shortfalls(branch_id, demand):
+    stocks = {
+        s.item_id: s
+        for s in BranchStock.objects.filter(branch_id=branch_id, item_id__in=demand)
+    }
+    items = Item.objects.in_bulk(demand.keys())
+
+    shortfalls = []
+    for item_id, qty in sorted(demand.items()):
+        stock = stocks.get(item_id)
+        available = stock.quantity - stock.reserved if stock else Decimal("0.00")
+        if available < qty:
+            shortfalls.append({
+                "item_id": item_id,
+                "item": items[item_id].item_name,
+                "required": qty,
+                "available": available,
+            })
+    return shortfalls
+
+# ✅ Hold an accepted order's ingredients
+@transaction.atomic
+def reserve_order_stock(order):
+    """
+    One conditional UPDATE raises `reserved` on every stock row the
+    order's recipes need, but only where `quantity - reserved` still
+    covers it. If any row didn't qualify the statement is rolled back
+    and InsufficientStock lists what is missing. No row is locked
+    for longer than that single statement.
+    """
+    demand = order_ingredient_demand([order]).get(order.id, {})
+    if not demand:
+        return []
+
+    qty = DecimalField(max_digits=10, decimal_places=2)
+    with transaction.atomic():
+        reserved = BranchStock.objects.filter(
+            reduce(or_, (
+                Q(item_id=item_id, quantity__gte=F("reserved") + Value(need, output_field=qty))
+                for item_id, need in demand.items()
+            )),
+            branch_id=order.branch_id,
+        ).update(reserved=F("reserved") + Case(
+            *[When(item_id=item_id, then=Value(need)) for item_id, need in demand.items()],
+            output_field=qty,
+        ))
+        # Undo the rows that did qualify before reporting what is short
+        if reserved != len(demand):
+            transaction.set_rollback(True)
+
+    if reserved != len(demand):
+        raise InsufficientStock(_shortfalls(order.branch_id, demand))
+
+    check_low_stock(list(
+        BranchStock.objects.filter(branch_id=order.branch_id, item_id__in=demand)
+    ))
+    # Reserved stock counts towards below_min_count
+    transaction.on_commit(invalidate_stock_summary)
+
+    expires_at = timezone.now() + timedelta(minutes=settings.ORDER_RESERVATION_MINUTES)
+    return StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order,
+            branch_id=order.branch_id,
+            item_id=item_id,
+            quantity=need,
+            expires_at=expires_at,
+        )
+        for item_id, need in demand.items()
+    ])
+
+# ✅ Give held ingredients back to the branch
+@transaction.atomic
+def release_reservations(reservations):
+    held = list(
+        reservations.filter(status="active")
+        .select_for_update(skip_locked=True)
+        .values_list("id", "branch_id", "item_id", "quantity")
+    )
+    if not held:
+        return 0
+
+    StockReservation.objects.filter(id__in=[h[0] for h in held]).update(status="released")
+
+    totals = defaultdict(Decimal)
+    for _, branch_id, item_id, quantity in held:
+        totals[(branch_id, item_id)] += quantity
+    for (branch_id, item_id), quantity in sorted(totals.items()):
+        BranchStock.objects.filter(branch_id=branch_id, item_id=item_id).update(
+            reserved=F("reserved") - quantity
+        )
+
+    check_low_stock(list(BranchStock.objects.filter(
+        reduce(or_, (Q(branch_id=b, item_id=i) for b, i in totals))
+    )))
+    transaction.on_commit(invalidate_stock_summary)
+    return len(held)
+
+def release_order_reservations(order):
+    return release_reservations(StockReservation.objects.filter(order=order))
+
+# ✅ Periodic: free reservations of orders that were never cooked
+def release_expired_reservations():
+    return release_reservations(
+        StockReservation.objects.filter(expires_at__lt=timezone.now())
+    )
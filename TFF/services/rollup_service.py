@@ -0,0 +1,139 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import DailyAnalytics, Expense, Order, RollupDirtyDay, RollupWatermark, TiexCollect
+from .reporting_periods import days_period
+
+DAILY_ANALYTICS = "daily_analytics"
+
+# Rows committed a little after they were stamped must not slip under the
+# watermark; re-reading a few minutes is harmless since days are recomputed.
+ROLLUP_OVERLAP = timedelta(minutes=5)
+
+ZERO = Decimal("0.00")
+
+# ✅ Last local day whose DailyAnalytics rows can be trusted
+def rolled_through():
+    """
+    Days before the one the watermark falls on were closed when the job
+    last ran; later days must be aggregated live. None before the first run.
+    """
+    value = (
+        RollupWatermark.objects.filter(name=DAILY_ANALYTICS)
+        .values_list("value", flat=True).first()
+    )
+    return timezone.localdate(value) - timedelta(days=1) if value else None
+
+# ✅ Orders about to be deleted: re-roll their days on the next run
+def mark_orders_dirty(orders):
+    RollupDirtyDay.objects.bulk_create(
+        [
+            RollupDirtyDay(branch_id=o.branch_id, date=timezone.localdate(o.created_at))
+            for o in orders
+        ],
+        ignore_conflicts=True,
+    )
+
+def _touched_days(since):
+    """(branch_id, day) pairs whose figures may have changed after `since`."""
+    orders = Order.objects.all()
+    gst = TiexCollect.objects.all()
+    expenses = Expense.objects.all()
+    if since is not None:
+        orders = orders.filter(Q(created_at__gt=since) | Q(completed_at__gt=since))
+        gst = gst.filter(created_at__gt=since)
+        expenses = expenses.filter(created_at__gt=since)
+
+    touched = set()
+    for qs in (orders, gst):
+        touched.update(
+            qs.annotate(day=TruncDate("created_at"))
+            .order_by().values_list("branch_id", "day").distinct()
+        )
+    touched.update(expenses.order_by().values_list("branch_id", "expense_date").distinct())
+    return touched
+
+# ✅ Incremental job: upsert DailyAnalytics for every day touched since last run
+@transaction.atomic
+def rollup_daily_analytics():
+    watermark = (
+        RollupWatermark.objects.select_for_update()
+        .filter(name=DAILY_ANALYTICS).first()
+    )
+    started = timezone.now()
+
+    touched = _touched_days(watermark.value - ROLLUP_OVERLAP if watermark else None)
+
+    # Days whose orders were deleted leave no changed row behind
+    dirty = list(RollupDirtyDay.objects.select_for_update().values_list("id", "branch_id", "date"))
+    touched.update((branch_id, day) for _, branch_id, day in dirty)
+    if touched:
+        days = {day for _, day in touched}
+        branches = {branch_id for branch_id, _ in touched}
+        first, last = min(days), max(days)
+        window = days_period(first, last).filter() & Q(branch_id__in=branches)
+
+        completed = Q(status="completed")
+        order_rows = (
+            Order.objects.filter(window)
+            .annotate(day=TruncDate("created_at"))
+            .order_by().values("branch_id", "day")
+            .annotate(
+                orders=Count("id"),
+                sales=Sum("total_amount"),
+                completed_orders=Count("id", filter=completed),
+                completed_sales=Sum("total_amount", filter=completed),
+                completed_gst=Sum("gst_amount", filter=completed),
+            )
+        )
+        gst_rows = (
+            TiexCollect.objects.filter(window)
+            .annotate(day=TruncDate("created_at"))
+            .order_by().values("branch_id", "day")
+            .annotate(gst=Sum("gst"))
+        )
+        expense_rows = (
+            Expense.objects.filter(branch_id__in=branches, expense_date__range=(first, last))
+            .order_by().values("branch_id", "expense_date")
+            .annotate(amount=Sum("amount"))
+        )
+
+        orders = {(r["branch_id"], r["day"]): r for r in order_rows}
+        gst = {(r["branch_id"], r["day"]): r["gst"] for r in gst_rows}
+        expenses = {(r["branch_id"], r["expense_date"]): r["amount"] for r in expense_rows}
+
+        rows = []
+        for key in sorted(touched | set(orders) | set(gst) | set(expenses)):
+            o = orders.get(key, {})
+            completed_sales = o.get("completed_sales") or ZERO
+            expense = expenses.get(key) or ZERO
+            rows.append(DailyAnalytics(
+                branch_id=key[0],
+                date=key[1],
+                total_orders=o.get("orders", 0),
+                total_sales=o.get("sales") or ZERO,
+                completed_orders=o.get("completed_orders", 0),
+                completed_sales=completed_sales,
+                total_gst=gst.get(key) or ZERO,
+                total_expense=expense,
+                net_profit=completed_sales - (o.get("completed_gst") or ZERO) - expense,
+                updated_at=started,
+            ))
+
+        DailyAnalytics.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["branch", "date"],
+            update_fields=[
+                "total_orders", "total_sales", "completed_orders", "completed_sales",
+                "total_gst", "total_expense", "net_profit", "updated_at",
+            ],
+        )
+
+    RollupDirtyDay.objects.filter(id__in=[d[0] for d in dirty]).delete()
+    RollupWatermark.objects.update_or_create(name=DAILY_ANALYTICS, defaults={"value": started})
+    return len(touched)
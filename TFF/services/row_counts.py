@@ -0,0 +1,95 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from ..models import (
+    Billing, Branch, BranchStock, Customer, DailyAnalytics, Employees, Expense,
+    Godown, GodownStock, Item, KitchenOrderTicket, MenuItem, Order, OrderItem,
+    StockRequest, TableRowCount,
+)
+
+# Dashboard key -> model, in display order
+COUNTED_MODELS = {
+    "branches": Branch,
+    "employees": Employees,
+    "menuitems": MenuItem,
+    "godowns": Godown,
+    "items": Item,
+    "branch_stock": BranchStock,
+    "godown_stock": GodownStock,
+    "stock_requests": StockRequest,
+    "customers": Customer,
+    "orders": Order,
+    "order_items": OrderItem,
+    "billings": Billing,
+    "kitchen_orders": KitchenOrderTicket,
+    "expenses": Expense,
+    "daily_analytics": DailyAnalytics,
+}
+
+def _planner_estimates():
+    """
+    {table: reltuples} from pg_class in one query. Tables Postgres has
+    never analyzed report -1 and are left out.
+    """
+    # Quoted, or the regclass cast would fold "TFF_order" to lower case
+    tables = [connection.ops.quote_name(model._meta.db_table) for model in COUNTED_MODELS.values()]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class "
+            "WHERE oid = ANY(%s::regclass[])",
+            [tables],
+        )
+        return {name: count for name, count in cursor.fetchall() if count >= 0}
+
+# ✅ Periodic: reconcile TableRowCount with the real tables
+def refresh_row_counts(estimate=None):
+    """
+    Exact COUNT(*) per table, or with `estimate` (default
+    ROW_COUNT_ESTIMATES) the Postgres planner's row estimates, falling
+    back to COUNT(*) where there is none. Returns {key: count}.
+    """
+    if estimate is None:
+        estimate = getattr(settings, "ROW_COUNT_ESTIMATES", False)
+    estimates = _planner_estimates() if estimate and connection.vendor == "postgresql" else {}
+
+    now = timezone.now()
+    rows = []
+    for key, model in COUNTED_MODELS.items():
+        table = model._meta.db_table
+        rows.append(TableRowCount(
+            name=key,
+            count=estimates[table] if table in estimates else model.objects.count(),
+            estimated=table in estimates,
+            updated_at=now,
+        ))
+
+    TableRowCount.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["count", "estimated", "updated_at"],
+    )
+    return {row.name: row.count for row in rows}
+
+# ✅ Counts for the admin dashboard, read from the counter table
+def model_counts_data():
+    """
+    (counts, oldest refresh time). Refreshes inline before the first run
+    and whenever the stored counts have missed a whole scheduled refresh
+    (older than two ROW_COUNT_REFRESH_MINUTES intervals), e.g. while the
+    scheduler is down. A refresh that is merely due is left to the job.
+    """
+    stored = {
+        name: (count, updated_at)
+        for name, count, updated_at in TableRowCount.objects.values_list("name", "count", "updated_at")
+    }
+    if not all(key in stored for key in COUNTED_MODELS):
+        return refresh_row_counts(), timezone.now()
+
+    as_of = min(stored[key][1] for key in COUNTED_MODELS)
+    max_age = 2 * timedelta(minutes=getattr(settings, "ROW_COUNT_REFRESH_MINUTES", 15))
+    if timezone.now() - as_of > max_age:
+        return refresh_row_counts(), timezone.now()
+
+    return {key: stored[key][0] for key in COUNTED_MODELS}, as_of
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import BranchStock, GodownStock, StockMovement, StockSnapshot
+from .stock_summary import invalidate_stock_summary
+
+# ✅ Build (unsaved) ledger entry for a stock row that was just changed
+def movement(stock, delta, reason, order=None, stock_request=None):
+    return StockMovement(
+        branch_id=getattr(stock, "branch_id", None),   # GodownStock has no branch
+        item_id=stock.item_id,
+        delta=delta,
+        balance_after=stock.quantity,
+        reason=reason,
+        order=order,
+        stock_request=stock_request,
+    )
+
+# ✅ Write the ledger entries of one stock operation in a single INSERT
+def record_movements(movements):
+    # Every stock mutation is recorded here, so it doubles as the cache hook
+    transaction.on_commit(invalidate_stock_summary)
+    return StockMovement.objects.bulk_create(movements)
+
+# ✅ Snapshot every branch's (and the godown's) current stock
+@transaction.atomic
+def take_snapshots():
+    taken_at = timezone.now()
+
+    rows = [
+        StockSnapshot(branch_id=branch_id, item_id=item_id, quantity=qty, taken_at=taken_at)
+        for branch_id, item_id, qty in BranchStock.objects.values_list("branch_id", "item_id", "quantity").iterator()
+    ]
+    rows += [
+        StockSnapshot(branch_id=None, item_id=item_id, quantity=qty, taken_at=taken_at)
+        for item_id, qty in GodownStock.objects.values_list("item_id", "quantity").iterator()
+    ]
+
+    StockSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+# ✅ Stock of a branch (None = godown) at any point in time
+def stock_at(branch, at, item=None):
+    """
+    {item_id: quantity} as of `at`: the nearest earlier snapshot plus the
+    movements recorded after it.
+    """
+    snapshots = StockSnapshot.objects.filter(branch=branch)
+    movements = StockMovement.objects.filter(branch=branch, created_at__lte=at)
+    if item is not None:
+        snapshots = snapshots.filter(item=item)
+        movements = movements.filter(item=item)
+
+    taken_at = (
+        snapshots.filter(taken_at__lte=at)
+        .order_by("-taken_at")
+        .values_list("taken_at", flat=True)
+        .first()
+    )
+
+    quantities = defaultdict(Decimal)
+    if taken_at:
+        for item_id, qty in snapshots.filter(taken_at=taken_at).values_list("item_id", "quantity"):
+            quantities[item_id] = qty
+        movements = movements.filter(created_at__gt=taken_at)
+
+    for row in movements.values("item_id").annotate(total=Sum("delta")):
+        quantities[row["item_id"]] += row["total"]
+
+    return dict(quantities)
+
+# ✅ Daily consumption per item for a branch
+def consumption_history(branch, start, end):
+    return list(
+        StockMovement.objects.filter(
+            branch=branch,
+            reason="consumption",
+            created_at__gte=start,
+            created_at__lt=end,
+        )
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "item_id", "item__item_name")
+        .annotate(quantity=-Sum("delta"))
+        .order_by("day", "item__item_name")
+    )
+
+# ✅ Compare the ledger's view of a branch with its live stock
+def reconcile(branch):
+    expected = stock_at(branch, timezone.now())
+
+    live = BranchStock.objects.filter(branch=branch) if branch else GodownStock.objects.all()
+    actual = dict(live.values_list("item_id", "quantity"))
+
+    mismatches = []
+    for item_id in sorted(set(expected) | set(actual)):
+        ledger_qty = expected.get(item_id, Decimal("0.00"))
+        live_qty = actual.get(item_id, Decimal("0.00"))
+        if ledger_qty != live_qty:
+            mismatches.append({
+                "item_id": item_id,
+                "ledger": ledger_qty,
+                "live": live_qty,
+                "difference": live_qty - ledger_qty,
+            })
+    return mismatches
@@ -1,24 +1,63 @@
 from django.utils import timezone
 from datetime import timedelta
-from django.db import transaction
-from ..models import BranchStock, GodownStock, StockRequest, Branch, Item
+from collections import defaultdict
+from decimal import Decimal
+from math import radians, cos
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from ..models import BranchStock, GodownStock, GodownLot, StockRequest, StockReservation, StockTransfer, Item, OrderIngredientUsage
+from .stock_ledger import movement, record_movements
+from .low_stock import check_low_stock
+
+class InsufficientStock(Exception):
+    def __init__(self, shortfalls, message="Insufficient stock"):
+        super().__init__(message)
+        self.shortfalls = shortfalls
+
+class TransferAlreadyHandled(Exception):
+    pass
+
+# Great-circle distance (km) from `branch` to each stock row's branch
+def branch_distance_km(branch, prefix="branch__"):
+    lat1 = radians(float(branch.latitude))
+    lon1 = radians(float(branch.longitude))
+    lat2 = Radians(Cast(f"{prefix}latitude", FloatField()))
+    lon2 = Radians(Cast(f"{prefix}longitude", FloatField()))
+
+    a = (
+        Power(Sin((lat2 - lat1) / 2), 2)
+        + cos(lat1) * Cos(lat2) * Power(Sin((lon2 - lon1) / 2), 2)
+    )
+    return 2 * 6371 * ASin(Sqrt(a))
 
 # ✅ Find branch with excess stock
-def find_excess_branch(requesting_branch, item, quantity):
-    stocks = BranchStock.objects.select_related("branch").filter(
-        item=item,
-        quantity__gt=quantity,
-    ).exclude(branch=requesting_branch)
-
-    for stock in stocks:
-        excess = stock.quantity - stock.min_level
-        if excess >= quantity:
-            return stock.branch
-    return None
+def find_excess_branch(requesting_branch, item, quantity, by_distance=False):
+    """
+    Best donor for `quantity` of `item`: the branch with the largest
+    surplus over its min level (and what accepted orders have reserved),
+    or the nearest one with enough surplus. Ranked in the database;
+    `quantity >= qty` keeps the scan on the (item, quantity) index.
+    """
+    stocks = (
+        BranchStock.objects
+        .filter(item=item, quantity__gte=quantity)
+        .exclude(branch=requesting_branch)
+        .annotate(surplus=F("quantity") - F("min_level") - F("reserved"))
+        .filter(surplus__gte=quantity)
+    )
+
+    ordering = ["-surplus", "id"]
+    if by_distance:
+        stocks = stocks.annotate(distance=branch_distance_km(requesting_branch))
+        ordering = ["distance"] + ordering
+
+    best = stocks.select_related("branch").order_by(*ordering).first()
+    return best.branch if best else None
 
 # ✅ Create smart stock request
-def create_smart_stock_request(branch, item, quantity):
-    excess_branch = find_excess_branch(branch, item, quantity)
+def create_smart_stock_request(branch, item, quantity, by_distance=False):
+    excess_branch = find_excess_branch(branch, item, quantity, by_distance)
     expiry = timezone.now() + timedelta(minutes=15)
 
     if excess_branch:
@@ -38,55 +77,451 @@ def create_smart_stock_request(branch, item, quantity):
             from_godown=True
         )
 
-# ✅ Approve inter-branch request
+def _shortfall(item, required, available):
+    return {
+        "item_id": item.id,
+        "item": item.item_name,
+        "required": required,
+        "available": available,
+    }
+
+def _line_totals(lines):
+    totals = defaultdict(Decimal)
+    for line in lines:
+        totals[line.item_id] += Decimal(line.quantity)
+    return totals
+
+def _mark_approved(lines):
+    StockRequest.objects.filter(id__in=[l.id for l in lines]).update(status="approved")
+    for line in lines:
+        line.status = "approved"
+
+# ✅ Move the items of one or more requests from a donor branch
 @transaction.atomic
-def approve_inter_branch_request(req):
-    from_branch = req.to_branch
-    to_branch = req.from_branch
-    item = req.item
-    qty = req.quantity
+def transfer_between_branches(donor, receiver, lines):
+    """
+    `lines` are StockRequest rows asking `donor` for stock on behalf of
+    `receiver`. Donor and receiver rows are locked in one ordered query,
+    every line is validated, then all rows are written in bulk.
+    """
+    totals = _line_totals(lines)
+    stocks = {
+        (s.branch_id, s.item_id): s
+        for s in BranchStock.objects.select_for_update(of=("self",))
+        .select_related("item")
+        .filter(branch__in=[donor, receiver], item_id__in=totals.keys())
+        .order_by("branch_id", "item_id")
+    }
 
-    from_stock = BranchStock.objects.select_for_update().get(branch=from_branch, item=item)
-    if from_stock.quantity < qty:
-        raise Exception("Insufficient stock")
+    shortfalls = []
+    items = Item.objects.in_bulk(totals.keys())
+    for item_id, qty in sorted(totals.items()):
+        from_stock = stocks.get((donor.id, item_id))
+        available = from_stock.quantity - from_stock.reserved if from_stock else Decimal("0.00")
+        if available < qty:
+            shortfalls.append(_shortfall(items[item_id], qty, available))
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
 
-    to_stock, _ = BranchStock.objects.get_or_create(branch=to_branch, item=item, defaults={"quantity": 0, "min_level": 0})
-    from_stock.quantity -= qty
-    to_stock.quantity += qty
-    from_stock.save()
-    to_stock.save()
+    new_rows = [
+        BranchStock(branch=receiver, item_id=item_id, quantity=0, min_level=0)
+        for item_id in totals if (receiver.id, item_id) not in stocks
+    ]
+    for row in BranchStock.objects.bulk_create(new_rows):
+        stocks[(receiver.id, row.item_id)] = row
 
-    req.status = "approved"
-    req.save()
+    updated_at = timezone.now()
+    movements = []
+    for line in lines:
+        qty = Decimal(line.quantity)
+        from_stock = stocks[(donor.id, line.item_id)]
+        to_stock = stocks[(receiver.id, line.item_id)]
+        from_stock.quantity -= qty
+        to_stock.quantity += qty
+        movements += [
+            movement(from_stock, -qty, "transfer_out", stock_request=line),
+            movement(to_stock, qty, "transfer_in", stock_request=line),
+        ]
 
-# ✅ Approve godown request
+    changed = list(stocks.values())
+    for stock in changed:
+        stock.updated_at = updated_at
+    BranchStock.objects.bulk_update(changed, ["quantity", "updated_at"])
+
+    record_movements(movements)
+    check_low_stock(changed)
+    _mark_approved(lines)
+
+# ✅ Book a delivery into the godown as a new lot
 @transaction.atomic
-def approve_godown_request(req):
-    godown_stock = GodownStock.objects.select_for_update().get(item=req.item)
-    if godown_stock.quantity < req.quantity:
-        raise Exception("Insufficient godown stock")
+def receive_godown_lot(item, quantity, expiry_date=None):
+    quantity = Decimal(str(quantity))
 
-    branch_stock, _ = BranchStock.objects.get_or_create(branch=req.from_branch, item=req.item, defaults={"quantity": 0, "min_level": 0})
-    godown_stock.quantity -= req.quantity
-    branch_stock.quantity += req.quantity
+    godown_stock, _ = GodownStock.objects.select_for_update().get_or_create(
+        item=item, defaults={"quantity": 0}
+    )
+    lot = GodownLot.objects.create(item=item, quantity=quantity, expiry_date=expiry_date)
+
+    godown_stock.quantity = Decimal(godown_stock.quantity) + quantity
+    if expiry_date and (not godown_stock.expiry_date or lot.expiry_date < godown_stock.expiry_date):
+        godown_stock.expiry_date = lot.expiry_date
     godown_stock.save()
-    branch_stock.save()
 
-    req.status = "approved"
-    req.save()
+    record_movements([movement(godown_stock, quantity, "receipt")])
+    return godown_stock, lot
+
+# ✅ Move the items of one or more requests from the godown
+@transaction.atomic
+def transfer_from_godown(receiver, lines):
+    """
+    Stock leaves the godown first-expiry-first-out: usable lots of each
+    item are locked in (item, expiry_date) index order and drained
+    front to back. Expired lots are never handed out.
+    """
+    totals = _line_totals(lines)
+    godown = {
+        g.item_id: g
+        for g in GodownStock.objects.select_for_update()
+        .filter(item_id__in=totals.keys())
+        .order_by("item_id")
+    }
+
+    today = timezone.localdate()
+    lots = defaultdict(list)
+    for lot in (
+        GodownLot.objects.select_for_update()
+        .filter(item_id__in=totals.keys(), quantity__gt=0)
+        .exclude(expiry_date__lt=today)
+        .order_by("item_id", F("expiry_date").asc(nulls_last=True), "id")
+    ):
+        lots[lot.item_id].append(lot)
+
+    shortfalls = []
+    items = Item.objects.in_bulk(totals.keys())
+    for item_id, qty in sorted(totals.items()):
+        available = sum((lot.quantity for lot in lots[item_id]), Decimal("0.00"))
+        if item_id not in godown or available < qty:
+            shortfalls.append(_shortfall(items[item_id], qty, available))
+    if shortfalls:
+        raise InsufficientStock(shortfalls, "Insufficient godown stock")
+
+    stocks = {
+        s.item_id: s
+        for s in BranchStock.objects.select_for_update()
+        .filter(branch=receiver, item_id__in=totals.keys())
+        .order_by("item_id")
+    }
+    new_rows = [
+        BranchStock(branch=receiver, item_id=item_id, quantity=0, min_level=0)
+        for item_id in totals if item_id not in stocks
+    ]
+    for row in BranchStock.objects.bulk_create(new_rows):
+        stocks[row.item_id] = row
+
+    updated_at = timezone.now()
+    touched_lots = []
+    movements = []
+    for line in lines:
+        qty = Decimal(line.quantity)
+
+        remaining = qty
+        for lot in lots[line.item_id]:
+            if remaining <= 0:
+                break
+            take = min(lot.quantity, remaining)
+            if take > 0:
+                lot.quantity -= take
+                remaining -= take
+                touched_lots.append(lot)
+
+        godown[line.item_id].quantity -= qty
+        stocks[line.item_id].quantity += qty
+        movements += [
+            movement(godown[line.item_id], -qty, "transfer_out", stock_request=line),
+            movement(stocks[line.item_id], qty, "transfer_in", stock_request=line),
+        ]
+
+    for item_id, godown_stock in godown.items():
+        # the item's total keeps showing the next lot due to expire
+        left = [lot for lot in lots[item_id] if lot.quantity > 0 and lot.expiry_date]
+        godown_stock.expiry_date = left[0].expiry_date if left else None
+
+    for row in list(godown.values()) + list(stocks.values()):
+        row.updated_at = updated_at
+    GodownLot.objects.bulk_update(set(touched_lots), ["quantity"])
+    GodownStock.objects.bulk_update(godown.values(), ["quantity", "expiry_date", "updated_at"])
+    BranchStock.objects.bulk_update(stocks.values(), ["quantity", "updated_at"])
+
+    record_movements(movements)
+    check_low_stock(list(stocks.values()))
+    _mark_approved(lines)
+
+# ✅ Approve inter-branch request
+def approve_inter_branch_request(req):
+    transfer_between_branches(req.to_branch, req.from_branch, [req])
+
+# ✅ Approve godown request
+def approve_godown_request(req):
+    transfer_from_godown(req.from_branch, [req])
+
+# ✅ Multi-item request: one donor search for every line
+def create_stock_transfers(branch, lines, by_distance=False):
+    """
+    `lines` is a list of (item, quantity). Donors for all lines are
+    ranked in one query; lines are grouped per donor into StockTransfer
+    rows (lines nobody can spare go to a godown transfer).
+    """
+    lines = [(item, Decimal(str(qty))) for item, qty in lines]
+    smallest = min((qty for _, qty in lines), default=0)
+
+    candidates = (
+        BranchStock.objects
+        .filter(item__in=[item for item, _ in lines], quantity__gte=smallest)
+        .exclude(branch=branch)
+        .annotate(surplus=F("quantity") - F("min_level") - F("reserved"))
+        .filter(surplus__gte=smallest)
+    )
+    ordering = ["-surplus", "id"]
+    if by_distance:
+        candidates = candidates.annotate(distance=branch_distance_km(branch))
+        ordering = ["distance"] + ordering
+
+    ranked = defaultdict(list)       # item_id -> [(branch_id, surplus)] best first
+    for row in candidates.order_by(*ordering).values("item_id", "branch_id", "surplus"):
+        ranked[row["item_id"]].append((row["branch_id"], row["surplus"]))
+
+    # Prefer donors already chosen for earlier lines: fewer donors means
+    # fewer approvals and transactions.
+    by_donor = defaultdict(list)
+    for item, qty in lines:
+        able = [b for b, surplus in ranked[item.id] if surplus >= qty]
+        chosen = next((b for b in able if b in by_donor), able[0] if able else None)
+        by_donor[chosen].append((item, qty))
+
+    expiry = timezone.now() + timedelta(minutes=15)
+    transfers = []
+    with transaction.atomic():
+        for donor_id, donor_lines in by_donor.items():
+            transfer = StockTransfer.objects.create(
+                from_branch=branch,
+                to_branch_id=donor_id,
+                from_godown=donor_id is None,
+                expires_at=None if donor_id is None else expiry,
+            )
+            StockRequest.objects.bulk_create([
+                StockRequest(
+                    transfer=transfer,
+                    from_branch=branch,
+                    to_branch_id=donor_id,
+                    from_godown=donor_id is None,
+                    item=item,
+                    quantity=qty,
+                    expires_at=transfer.expires_at,
+                )
+                for item, qty in donor_lines
+            ])
+            transfers.append(transfer)
+    return transfers
+
+def _lock_pending(transfer):
+    """
+    Re-read `transfer` and its pending lines under row locks, so a
+    concurrent accept / reject / timeout of the same transfer waits and
+    then sees it already handled.
+    """
+    locked = StockTransfer.objects.select_for_update().get(pk=transfer.pk)
+    if locked.status != "pending":
+        raise TransferAlreadyHandled(f"Transfer {transfer.pk} is already {locked.status}")
+    lines = list(
+        StockRequest.objects.select_for_update()
+        .filter(transfer=locked, status="pending").order_by("id")
+    )
+    return locked, lines
+
+# ✅ Requested items nobody could give go to the godown as one transfer each
+def godown_fallbacks(groups):
+    """`groups` is a list of (from_branch_id, [(item_id, quantity)])."""
+    groups = [(branch_id, lines) for branch_id, lines in groups if lines]
+    fallbacks = StockTransfer.objects.bulk_create([
+        StockTransfer(from_branch_id=branch_id, from_godown=True)
+        for branch_id, _ in groups
+    ])
+    StockRequest.objects.bulk_create([
+        StockRequest(
+            transfer=fallback,
+            from_branch_id=branch_id,
+            item_id=item_id,
+            quantity=quantity,
+            from_godown=True
+        )
+        for fallback, (branch_id, lines) in zip(fallbacks, groups)
+        for item_id, quantity in lines
+    ])
+    return fallbacks
+
+# ✅ Approve every pending line of a transfer in one transaction
+@transaction.atomic
+def approve_stock_transfer(transfer):
+    transfer, lines = _lock_pending(transfer)
+
+    if transfer.from_godown:
+        transfer_from_godown(transfer.from_branch, lines)
+    else:
+        transfer_between_branches(transfer.to_branch, transfer.from_branch, lines)
+
+    transfer.status = "approved"
+    transfer.save(update_fields=["status"])
+
+# ✅ Donor declined: the whole transfer falls back to the godown
+@transaction.atomic
+def reject_stock_transfer(transfer):
+    transfer, lines = _lock_pending(transfer)
+    StockRequest.objects.filter(id__in=[l.id for l in lines]).update(status="rejected")
+    transfer.status = "rejected"
+    transfer.save(update_fields=["status"])
+
+    fallbacks = godown_fallbacks(
+        [(transfer.from_branch_id, [(l.item_id, l.quantity) for l in lines])]
+    )
+    return fallbacks[0] if fallbacks else None
 
 # ✅ Handle expired inter-branch requests
+@transaction.atomic
 def handle_stock_request_timeouts():
+    """
+    Time out every expired inter-branch request with one
+    UPDATE ... RETURNING and queue the godown fallbacks in bulk: one
+    godown StockTransfer per timed-out transfer (and per branch for
+    loose requests), just like a rejection. Transfers a donor is
+    answering right now are locked and left for the next run.
+    Returns the number of requests timed out.
+    """
     now = timezone.now()
-    expired_requests = StockRequest.objects.filter(status="pending", from_godown=False, expires_at__lt=now)
-
-    for req in expired_requests:
-        req.status = "timeout"
-        req.save()
-        # fallback to godown
-        StockRequest.objects.create(
-            from_branch=req.from_branch,
-            item=req.item,
-            quantity=req.quantity,
-            from_godown=True
+
+    transfer_ids = list(
+        StockTransfer.objects.select_for_update(skip_locked=True)
+        .filter(status="pending", from_godown=False, expires_at__lt=now)
+        .values_list("id", flat=True)
+    )
+
+    if connection.vendor in ("postgresql", "sqlite"):
+        table = connection.ops.quote_name(StockRequest._meta.db_table)
+        in_transfers = (
+            f" OR transfer_id IN ({', '.join(['%s'] * len(transfer_ids))})" if transfer_ids else ""
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = %s "
+                f"WHERE status = %s AND from_godown = %s AND expires_at < %s "
+                f"AND (transfer_id IS NULL{in_transfers}) "
+                f"RETURNING transfer_id, from_branch_id, item_id, quantity",
+                ["timeout", "pending", False, now, *transfer_ids],
+            )
+            expired = cursor.fetchall()
+    else:
+        pending = StockRequest.objects.select_for_update().filter(
+            Q(transfer__isnull=True) | Q(transfer_id__in=transfer_ids),
+            status="pending", from_godown=False, expires_at__lt=now,
+        )
+        rows = list(pending.values_list("id", "transfer_id", "from_branch_id", "item_id", "quantity"))
+        StockRequest.objects.filter(id__in=[r[0] for r in rows]).update(status="timeout")
+        expired = [r[1:] for r in rows]
+
+    StockTransfer.objects.filter(id__in=transfer_ids).update(status="timeout")
+
+    # fallback to godown
+    groups = defaultdict(list)
+    for transfer_id, from_branch_id, item_id, quantity in expired:
+        groups[(transfer_id or 0, from_branch_id)].append((item_id, quantity))
+    godown_fallbacks([(branch_id, lines) for (_, branch_id), lines in sorted(groups.items())])
+    return len(expired)
+
+# ✅ Deduct ingredient usage for one or more orders in a single batch
+@transaction.atomic
+def deduct_ingredient_usage(usages):
+    """
+    `usages` is an iterable of (order, item_id, quantity); stock is taken
+    from each order's branch. Every stock row involved is locked in one
+    ordered query (so concurrent batches can't deadlock), all shortfalls
+    are collected before anything is written, then stock, usage and
+    ledger rows are written with one bulk statement each. Whatever the
+    orders had reserved is consumed along with the stock.
+    """
+    required = defaultdict(Decimal)      # (branch_id, item_id) -> qty
+    used = defaultdict(Decimal)          # (order, item_id) -> qty
+    for order, item_id, qty in usages:
+        required[(order.branch_id, item_id)] += qty
+        used[(order, item_id)] += qty
+
+    if not required:
+        return []
+
+    # Reservations first: release_reservations locks them in the same order
+    held = list(
+        StockReservation.objects.select_for_update()
+        .filter(order_id__in={order.id for order, _ in used}, status="active")
+        .order_by("id")
+    )
+    own = defaultdict(Decimal)           # (branch_id, item_id) -> reserved by these orders
+    for r in held:
+        own[(r.branch_id, r.item_id)] += r.quantity
+
+    stocks = {
+        (s.branch_id, s.item_id): s
+        for s in BranchStock.objects.select_for_update(of=("self",))
+        .select_related("item")
+        .filter(
+            branch_id__in={b for b, _ in required} | {b for b, _ in own},
+            item_id__in={i for _, i in required} | {i for _, i in own},
+        )
+        .order_by("branch_id", "item_id")
+    }
+
+    missing = {key[1] for key in required if key not in stocks}
+    names = Item.objects.in_bulk(missing) if missing else {}
+
+    shortfalls = []
+    for (branch_id, item_id), qty in sorted(required.items()):
+        stock = stocks.get((branch_id, item_id))
+        available = (
+            stock.quantity - stock.reserved + own[(branch_id, item_id)]
+            if stock else Decimal("0.00")
         )
+        if available < qty:
+            item = stock.item if stock else names.get(item_id)
+            shortfalls.append({
+                "item_id": item_id,
+                "item": item.item_name if item else None,
+                "required": qty,
+                "available": available,
+            })
+
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
+
+    updated_at = timezone.now()
+    changed = {}
+    movements = []
+    for (order, item_id), qty in used.items():
+        stock = stocks[(order.branch_id, item_id)]
+        stock.quantity -= qty
+        stock.updated_at = updated_at
+        changed[stock.pk] = stock
+        movements.append(movement(stock, -qty, "consumption", order=order))
+
+    for key, qty in own.items():
+        if key in stocks:
+            stocks[key].reserved -= qty
+            stocks[key].updated_at = updated_at
+            changed[stocks[key].pk] = stocks[key]
+
+    changed = list(changed.values())
+    BranchStock.objects.bulk_update(changed, ["quantity", "reserved", "updated_at"])
+    StockReservation.objects.filter(id__in=[r.id for r in held]).update(status="consumed")
+    OrderIngredientUsage.objects.bulk_create([
+        OrderIngredientUsage(order=order, item_id=item_id, quantity_used=qty)
+        for (order, item_id), qty in used.items()
+    ])
+    record_movements(movements)
+    check_low_stock(changed)
+    return changed
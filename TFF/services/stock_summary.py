@@ -0,0 +1,55 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from ..models import Branch
+
+STOCK_SUMMARY_CACHE_KEY = "branches_stock_summary"
+STOCK_SUMMARY_CACHE_SECONDS = 60   # backstop; stock changes and reservations clear it
+
+ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+# ✅ Stock totals for every branch in one grouped query
+def branches_stock_summary_data():
+    data = cache.get(STOCK_SUMMARY_CACHE_KEY)
+    if data is not None:
+        return data
+
+    branches = (
+        Branch.objects
+        .annotate(
+            total=Coalesce(Sum("branchstock__quantity"), ZERO),
+            item_count=Count("branchstock"),
+            below_min=Count(
+                "branchstock",
+                filter=Q(branchstock__quantity__lt=F("branchstock__min_level") + F("branchstock__reserved")),
+            ),
+            stock_value=Coalesce(
+                Sum(
+                    F("branchstock__quantity") * F("branchstock__item__price"),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                ),
+                ZERO,
+            ),
+        )
+        .order_by("branch_code")
+        .values("branch_code", "branch_name", "total", "item_count", "below_min", "stock_value")
+    )
+
+    data = [
+        {
+            "branch_id": b["branch_code"],
+            "branch_name": b["branch_name"],
+            "total_items": b["total"],
+            "item_count": b["item_count"],
+            "below_min_count": b["below_min"],
+            "stock_value": b["stock_value"],
+        }
+        for b in branches
+    ]
+    cache.set(STOCK_SUMMARY_CACHE_KEY, data, STOCK_SUMMARY_CACHE_SECONDS)
+    return data
+
+# ✅ Drop the cached summary after a stock change commits
+def invalidate_stock_summary():
+    cache.delete(STOCK_SUMMARY_CACHE_KEY)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from ..models import Branch, DailyAnalytics, Order, TiexCollect
+from .reporting_periods import days_period, reporting_period
+from .rollup_service import rolled_through
+
+METRICS = ("orders", "sales", "completed_orders", "completed_sales", "gst")
+
+def summary_periods(today=None):
+    return {
+        "today": reporting_period("today", today),
+        "this_week": reporting_period("week", today),
+        "this_month": reporting_period("month", today),
+        "previous_month": reporting_period("previous_month", today),
+    }
+
+# ✅ Order / GST totals for several periods at once
+def period_totals(periods, branch=None, by_branch=False):
+    """
+    `periods` maps name -> ReportingPeriod. Days the rollup job has
+    closed are read from DailyAnalytics, later days are aggregated live
+    from Order and TiexCollect over half-open datetime ranges; each table
+    is scanned at most once for all periods together.
+
+    Returns {branch_id or None: {period: {metric: value}}}.
+    """
+    closed_until = rolled_through()
+
+    rollup_aggs, order_aggs, gst_aggs = {}, {}, {}
+    rollup_days, live_days = [], []
+    for name, period in periods.items():
+        first, last = period.first, period.last
+        if closed_until and first <= closed_until:
+            closed = Q(date__gte=first, date__lte=min(last, closed_until))
+            rollup_aggs[f"{name}_orders"] = Sum("total_orders", filter=closed)
+            rollup_aggs[f"{name}_sales"] = Sum("total_sales", filter=closed)
+            rollup_aggs[f"{name}_completed_orders"] = Sum("completed_orders", filter=closed)
+            rollup_aggs[f"{name}_completed_sales"] = Sum("completed_sales", filter=closed)
+            rollup_aggs[f"{name}_gst"] = Sum("total_gst", filter=closed)
+            rollup_days += [first, min(last, closed_until)]
+
+        live_first = max(first, closed_until + timedelta(days=1)) if closed_until else first
+        if live_first <= last:
+            live = days_period(live_first, last).filter()
+            order_aggs[f"{name}_orders"] = Count("id", filter=live)
+            order_aggs[f"{name}_sales"] = Sum("total_amount", filter=live)
+            order_aggs[f"{name}_completed_orders"] = Count("id", filter=live & Q(status="completed"))
+            order_aggs[f"{name}_completed_sales"] = Sum("total_amount", filter=live & Q(status="completed"))
+            gst_aggs[f"{name}_gst"] = Sum("gst", filter=live)
+            live_days += [live_first, last]
+
+    def aggregate(qs, aggs):
+        if not aggs:
+            return {}
+        if branch is not None:
+            qs = qs.filter(branch=branch)
+        if by_branch:
+            return {r["branch_id"]: r for r in qs.order_by().values("branch_id").annotate(**aggs)}
+        return {None: qs.aggregate(**aggs)}
+
+    parts = []
+    if rollup_days:
+        parts.append(aggregate(
+            DailyAnalytics.objects.filter(date__range=(min(rollup_days), max(rollup_days))),
+            rollup_aggs,
+        ))
+    if live_days:
+        window = days_period(min(live_days), max(live_days)).filter()
+        parts += [
+            aggregate(Order.objects.filter(window), order_aggs),
+            aggregate(TiexCollect.objects.filter(window), gst_aggs),
+        ]
+
+    if by_branch:
+        keys = [branch.id] if branch is not None else list(Branch.objects.values_list("id", flat=True))
+    else:
+        keys = [None]
+
+    totals = {}
+    for key in keys:
+        totals[key] = {}
+        for name in periods:
+            totals[key][name] = {}
+            for metric in METRICS:
+                zero = 0 if metric.endswith("orders") else Decimal("0.00")
+                totals[key][name][metric] = sum(
+                    (part.get(key, {}).get(f"{name}_{metric}") or zero for part in parts), zero
+                )
+    return totals
+
+# ✅ Orders / sales / GST for today, this week, this month, previous month
+def period_summary(branch=None, by_branch=False, today=None):
+    """
+    `today` counts every order placed today; the other periods count
+    completed orders only. Returns one summary dict, or
+    {branch_id: summary} for every branch with `by_branch`.
+    """
+    periods = summary_periods(today)
+    totals = period_totals(periods, branch=branch, by_branch=by_branch)
+
+    def build(key):
+        summary = {}
+        for name, period in periods.items():
+            t = totals[key][name]
+            prefix = "" if name == "today" else "completed_"
+            summary[name] = {
+                **({"date": period.first} if name == "today" else {"from": period.first, "to": period.last}),
+                "total_orders": t[f"{prefix}orders"],
+                "total_sales": t[f"{prefix}sales"],
+                "total_gst": t["gst"],
+            }
+        return summary
+
+    if not by_branch:
+        return build(None)
+    return {key: build(key) for key in totals}
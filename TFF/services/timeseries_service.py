@@ -0,0 +1,124 @@
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+from ..models import Order
+from .reporting_periods import day_start
+
+TRUNC = {"hour": TruncHour, "day": TruncDay, "week": TruncWeek}
+
+# How far back the cached series of each bucket size reaches
+RECENT = {"hour": timedelta(days=2), "day": timedelta(days=35), "week": timedelta(weeks=13)}
+
+TIMESERIES_CACHE_KEY = "sales_timeseries"
+# Hard limit on a cached series, counted from its full rebuild rather
+# than its last refresh: closed buckets are never re-read otherwise.
+TIMESERIES_MAX_AGE = timedelta(hours=1)
+
+# Orders are stamped a moment before they commit; refresh a little
+# behind the last refresh so none of them are missed.
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+ZERO = Decimal("0.00")
+
+def bucket_floor(moment, bucket):
+    """Start of the local hour / day / ISO week containing `moment`."""
+    local = timezone.localtime(moment)
+    if bucket == "hour":
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if bucket == "week":
+        day -= timedelta(days=day.weekday())
+    return day_start(day)
+
+def bucket_after(start, bucket):
+    if bucket == "hour":
+        return start + timedelta(hours=1)
+    local = timezone.localtime(start).date()
+    return day_start(local + timedelta(weeks=1 if bucket == "week" else 1))
+
+def bucket_ceil(moment, bucket):
+    start = bucket_floor(moment, bucket)
+    return start if start == moment else bucket_after(start, bucket)
+
+# ✅ Orders / revenue / GST per (branch, bucket), in one grouped query
+def _bucket_rows(window, bucket):
+    rows = (
+        Order.objects.filter(window)
+        .annotate(bucket=TRUNC[bucket]("created_at"))
+        .order_by().values("branch_id", "bucket")
+        .annotate(orders=Count("id"), revenue=Sum("total_amount"), gst=Sum("gst_amount"))
+    )
+    return {
+        (r["branch_id"], r["bucket"]): (r["orders"], r["revenue"] or ZERO, r["gst"] or ZERO)
+        for r in rows
+    }
+
+def _between(start, end):
+    return Q(created_at__gte=start, created_at__lt=end)
+
+# ✅ Incrementally refreshed series of recent buckets, all branches
+def _recent_buckets(bucket, now):
+    """
+    The cache holds every (branch, bucket) row from `since` on. Each
+    call only re-aggregates the buckets from the last refresh onwards
+    (the open bucket plus whatever closed in between) and drops buckets
+    that have aged out of the window.
+    """
+    key = f"{TIMESERIES_CACHE_KEY}:{bucket}"
+    since = bucket_floor(now - RECENT[bucket], bucket)
+
+    entry = cache.get(key)
+    if entry is None or now - entry["built"] >= TIMESERIES_MAX_AGE:
+        built = now
+        rows = _bucket_rows(Q(created_at__gte=since), bucket)
+    else:
+        built = entry["built"]
+        stale = max(since, bucket_floor(entry["refreshed"] - REFRESH_OVERLAP, bucket))
+        rows = {k: v for k, v in entry["rows"].items() if since <= k[1] < stale}
+        rows.update(_bucket_rows(Q(created_at__gte=stale), bucket))
+
+    expires = built + TIMESERIES_MAX_AGE - now
+    cache.set(key, {"built": built, "refreshed": now, "rows": rows}, max(1, int(expires.total_seconds())))
+    return since, rows
+
+def invalidate_timeseries():
+    """Forget every cached series; a deleted order may sit in a closed bucket."""
+    cache.delete_many([f"{TIMESERIES_CACHE_KEY}:{bucket}" for bucket in TRUNC])
+
+def sales_timeseries(period, bucket="hour", branch=None):
+    """
+    {branch_id: [(bucket_start, orders, revenue, gst), ...]} for orders
+    created within the ReportingPeriod. Whole buckets inside the recent
+    window come from the cache; the rest (older history, and partial
+    buckets at the period's edges) from a single grouped query.
+    """
+    now = timezone.now()
+    since, recent = _recent_buckets(bucket, now)
+
+    lo = max(since, bucket_ceil(period.start, bucket))
+    hi = bucket_floor(period.end, bucket) if period.end <= now else period.end
+
+    rows = {}
+    if lo < hi:
+        rows.update((k, v) for k, v in recent.items() if lo <= k[1] < hi)
+        uncached = [(period.start, lo), (hi, period.end)]
+    else:
+        uncached = [(period.start, period.end)]
+
+    uncached = [_between(start, end) for start, end in uncached if start < end]
+    if uncached:
+        window = reduce(or_, uncached)
+        if branch is not None:
+            window &= Q(branch=branch)
+        rows.update(_bucket_rows(window, bucket))
+
+    series = {}
+    for (branch_id, start), values in sorted(rows.items()):
+        if branch is None or branch_id == branch.id:
+            series.setdefault(branch_id, []).append((start, *values))
+    return series
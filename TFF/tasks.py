@@ -2,10 +2,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 from twilio.rest import Client
 from django.utils.timezone import now
-from datetime import timedelta
-from decimal import Decimal
-from django.db.models import Sum
-from TFF.models import TiexCollect
+from TFF.services.reporting_periods import reporting_period
+from TFF.services.summary_service import period_totals
 
 # -----------------------------
 # WhatsApp sender function
@@ -68,22 +66,20 @@ def generate_gst_message(total_gst, month_year):
         f"– TFF Automated Accounts Notification"
     )
 
+# -----------------------------
+# GST total for a closed month (read from the daily rollup)
+# -----------------------------
+def monthly_gst(period):
+    return period_totals({"month": period})[None]["month"]["gst"]
+
 # -----------------------------
 # Send monthly GST Email
 # -----------------------------
 def send_monthly_gst_email():
-    today = now()
-    first_day_this_month = today.replace(day=1)
-    last_month = first_day_this_month - timedelta(days=1)
-    start_date = last_month.replace(day=1)
-    end_date = first_day_this_month - timedelta(days=1)
+    period = reporting_period("previous_month")
+    total_gst = monthly_gst(period)
 
-    total_gst = TiexCollect.objects.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    ).aggregate(total=Sum('gst'))['total'] or Decimal('0.00')
-
-    month_year = start_date.strftime('%B %Y')
+    month_year = period.first.strftime('%B %Y')
     message = generate_gst_message(total_gst, month_year)
     subject = f"GST Collection Intimation - {month_year}"
 
@@ -106,18 +102,10 @@ def send_monthly_gst_email():
 # Send monthly GST WhatsApp
 # -----------------------------
 def send_monthly_gst_whatsapp():
-    today = now()
-    first_day_this_month = today.replace(day=1)
-    last_month = first_day_this_month - timedelta(days=1)
-    start_date = last_month.replace(day=1)
-    end_date = first_day_this_month - timedelta(days=1)
-
-    total_gst = TiexCollect.objects.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    ).aggregate(total=Sum('gst'))['total'] or Decimal('0.00')
+    period = reporting_period("previous_month")
+    total_gst = monthly_gst(period)
 
-    month_year = start_date.strftime('%B %Y')
+    month_year = period.first.strftime('%B %Y')
     message = generate_gst_message(total_gst, month_year)
 
     send_whatsapp_message(message)
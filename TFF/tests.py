@@ -1,3 +1,1466 @@
-from django.test import TestCase
+import io
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+import pyarrow.parquet as pq
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.utils import timezone
+from .models import (
+    Branch, BranchSalesShard, BranchStock, Customer, DailyAnalytics, Employees, Expense, GodownLot,
+    Item, LowStockAlert, MenuItem, MenuItemDailySales, Order, OrderIngredientUsage, OrderItem, PrepTimeStat, RecipeIngredient,
+    ReorderSuggestion, RollupDirtyDay, RollupWatermark, TableRowCount, TiexCollect, StockMovement, StockRequest,
+    StockReservation, StockSnapshot, StockTransfer,
+)
+from .services.branch_sales import SALES_SHARDS, add_branch_sale, reconcile_branch_sales, with_sales_total
+from .services.expense_service import (
+    EXPENSE_IMPORT_MAX_ROWS, ExpenseImportError, branch_profit, import_expenses, parse_expense_csv,
+)
+from .services import order_notifier
+from . import scheduler
+from .services import export_service
+from .services.export_service import stream_export
+from .services import kitchen_dispatcher
+from .services.kitchen_dispatcher import dispatch_branch_orders, dispatch_pending_orders
+from .services.low_stock import _open_alerts, check_low_stock
+from .services.popularity_service import rebuild_menu_sales, record_menu_sales, top_sellers
+from .services.leaderboard_service import branch_leaderboard, invalidate_leaderboard
+from .services.forecast_service import FORECAST_WINDOW_DAYS, daily_usage, generate_reorder_suggestions
+from .services.rebalance_service import fewest_transfers, min_cost_flow, plan_rebalance
+from .services.reporting_periods import day_start, days_period, reporting_period
+from .services.rollup_service import DAILY_ANALYTICS, rollup_daily_analytics
+from .services.recipe_service import (
+    InvalidRecipe, consume_recipe_stock, ingredient_demand_vector, order_ingredient_demand, set_recipe,
+)
+from .services.reservation_service import (
+    release_expired_reservations, release_order_reservations, reserve_order_stock,
+)
+from .services.row_counts import model_counts_data, refresh_row_counts
+from .services.summary_service import period_summary
+from .services.stock_ledger import reconcile, stock_at, take_snapshots
+from .services.stock_summary import branches_stock_summary_data
+from .services.timeseries_service import TIMESERIES_CACHE_KEY, TIMESERIES_MAX_AGE, sales_timeseries
+from .views import discard_order
+from .services.stock_service import (
+    InsufficientStock, TransferAlreadyHandled, approve_stock_transfer, create_smart_stock_request,
+    deduct_ingredient_usage, find_excess_branch, handle_stock_request_timeouts, reject_stock_transfer,
+)
 
-# Create your tests here.
+
+def make_branch(name="Indiranagar", latitude="12.971600", longitude="77.640100"):
+    return Branch.objects.create(
+        branch_name=name, address="-", city="Bengaluru",
+        latitude=Decimal(latitude), longitude=Decimal(longitude), phone="9000000000",
+    )
+
+def make_item(name, unit="kg"):
+    return Item.objects.create(item_name=name, item_type="raw_material", category="Vegetables", unit=unit)
+
+def make_stock(branch, item, quantity, min_level="0", reserved="0"):
+    return BranchStock.objects.create(
+        branch=branch, item=item, quantity=Decimal(quantity),
+        min_level=Decimal(min_level), reserved=Decimal(reserved),
+    )
+
+def make_order(branch, customer=None, total="100.00", **fields):
+    customer = customer or Customer.objects.create(name="Asha", phone="9111111111", password="pw")
+    total = Decimal(total)
+    return Order.objects.create(
+        branch=branch, customer=customer, subtotal=total, gst_amount=Decimal("0.00"),
+        total_amount=total, **fields,
+    )
+
+def make_chef(branch, username="ravi", phone="9222222222", **fields):
+    return Employees.objects.create(
+        username=username, password="pw", role="chef", branch=branch, phone=phone,
+        email=f"{username}@example.com", **fields,
+    )
+
+def make_dish(name, recipe, price="120.00"):
+    dish = MenuItem.objects.create(name=name, category="currie", price=Decimal(price))
+    for item, quantity in recipe:
+        RecipeIngredient.objects.create(menu_item=dish, item=item, quantity=Decimal(quantity))
+    return dish
+
+def add_dish(order, dish, quantity=1):
+    return OrderItem.objects.create(order=order, menu_item=dish, quantity=quantity, price=dish.price)
+
+
+class DeductIngredientUsageTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice = make_item("Rice")
+        self.dal = make_item("Dal")
+        self.rice_stock = make_stock(self.branch, self.rice, "5.00")
+        self.dal_stock = make_stock(self.branch, self.dal, "1.00")
+        self.order = make_order(self.branch)
+
+    def test_deducts_stock_and_records_usage(self):
+        deduct_ingredient_usage([(self.order, self.rice.id, Decimal("2.00"))])
+
+        self.rice_stock.refresh_from_db()
+        self.assertEqual(self.rice_stock.quantity, Decimal("3.00"))
+        usage = OrderIngredientUsage.objects.get(order=self.order, item=self.rice)
+        self.assertEqual(usage.quantity_used, Decimal("2.00"))
+        move = StockMovement.objects.get(order=self.order)
+        self.assertEqual((move.delta, move.balance_after, move.reason), (Decimal("-2.00"), Decimal("3.00"), "consumption"))
+
+    def test_shortfalls_are_all_reported_and_nothing_is_written(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            deduct_ingredient_usage([
+                (self.order, self.rice.id, Decimal("2.00")),
+                (self.order, self.dal.id, Decimal("1.50")),
+                (self.order, self.dal.id, Decimal("0.50")),
+            ])
+
+        self.assertEqual(ctx.exception.shortfalls, [{
+            "item_id": self.dal.id,
+            "item": "Dal",
+            "required": Decimal("2.00"),
+            "available": Decimal("1.00"),
+        }])
+        self.rice_stock.refresh_from_db()
+        self.assertEqual(self.rice_stock.quantity, Decimal("5.00"))
+        self.assertFalse(OrderIngredientUsage.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_missing_stock_row_is_a_shortfall(self):
+        oil = make_item("Oil", unit="ltr")
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            deduct_ingredient_usage([(self.order, oil.id, Decimal("1.00"))])
+
+        self.assertEqual(ctx.exception.shortfalls[0]["item"], "Oil")
+        self.assertEqual(ctx.exception.shortfalls[0]["available"], Decimal("0.00"))
+
+    def test_other_orders_reservations_are_not_available(self):
+        BranchStock.objects.filter(pk=self.rice_stock.pk).update(reserved=Decimal("4.00"))
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            deduct_ingredient_usage([(self.order, self.rice.id, Decimal("2.00"))])
+        self.assertEqual(ctx.exception.shortfalls[0]["available"], Decimal("1.00"))
+
+    def test_own_reservation_is_consumed(self):
+        BranchStock.objects.filter(pk=self.rice_stock.pk).update(reserved=Decimal("4.00"))
+        reservation = StockReservation.objects.create(
+            order=self.order, branch=self.branch, item=self.rice,
+            quantity=Decimal("4.00"), expires_at=self.order.created_at,
+        )
+
+        deduct_ingredient_usage([(self.order, self.rice.id, Decimal("4.00"))])
+
+        self.rice_stock.refresh_from_db()
+        reservation.refresh_from_db()
+        self.assertEqual((self.rice_stock.quantity, self.rice_stock.reserved), (Decimal("1.00"), Decimal("0.00")))
+        self.assertEqual(reservation.status, "consumed")
+
+
+class StockTransferTests(TestCase):
+    def setUp(self):
+        self.receiver = make_branch("Indiranagar")
+        self.donor = make_branch("Koramangala", "12.935200", "77.624500")
+        self.rice = make_item("Rice")
+        self.donor_stock = make_stock(self.donor, self.rice, "10.00")
+        self.receiver_stock = make_stock(self.receiver, self.rice, "1.00", min_level="3.00")
+        self.transfer = self.make_transfer("4.00")
+
+    def make_transfer(self, quantity, expires_at=None):
+        expires_at = expires_at or timezone.now() + timedelta(minutes=15)
+        transfer = StockTransfer.objects.create(
+            from_branch=self.receiver, to_branch=self.donor, expires_at=expires_at
+        )
+        StockRequest.objects.create(
+            transfer=transfer, from_branch=self.receiver, to_branch=self.donor,
+            item=self.rice, quantity=Decimal(quantity), expires_at=expires_at,
+        )
+        return transfer
+
+    def assert_stock(self, donor, receiver):
+        self.donor_stock.refresh_from_db()
+        self.receiver_stock.refresh_from_db()
+        self.assertEqual(
+            (self.donor_stock.quantity, self.receiver_stock.quantity),
+            (Decimal(donor), Decimal(receiver)),
+        )
+
+    def test_approve_moves_stock(self):
+        approve_stock_transfer(self.transfer)
+
+        self.assert_stock("6.00", "5.00")
+        self.transfer.refresh_from_db()
+        self.assertEqual(self.transfer.status, "approved")
+        self.assertEqual(list(self.transfer.lines.values_list("status", flat=True)), ["approved"])
+
+    def test_double_accept_moves_stock_once(self):
+        stale = StockTransfer.objects.get(pk=self.transfer.pk)
+        approve_stock_transfer(self.transfer)
+
+        with self.assertRaises(TransferAlreadyHandled):
+            approve_stock_transfer(stale)
+        self.assert_stock("6.00", "5.00")
+
+    def test_reject_after_accept_is_refused(self):
+        approve_stock_transfer(self.transfer)
+
+        with self.assertRaises(TransferAlreadyHandled):
+            reject_stock_transfer(self.transfer)
+        self.assertFalse(StockTransfer.objects.filter(from_godown=True).exists())
+
+    def test_reject_falls_back_to_godown(self):
+        fallback = reject_stock_transfer(self.transfer)
+
+        self.assertTrue(fallback.from_godown)
+        self.assertEqual(
+            list(fallback.lines.values_list("item_id", "quantity", "status")),
+            [(self.rice.id, Decimal("4.00"), "pending")],
+        )
+        self.assert_stock("10.00", "1.00")
+
+    def test_donor_short_of_stock_rolls_back(self):
+        BranchStock.objects.filter(pk=self.donor_stock.pk).update(reserved=Decimal("8.00"))
+
+        with self.assertRaises(InsufficientStock):
+            approve_stock_transfer(self.transfer)
+        self.transfer.refresh_from_db()
+        self.assertEqual(self.transfer.status, "pending")
+        self.assert_stock("10.00", "1.00")
+
+    def test_timeout_falls_back_to_godown_like_reject(self):
+        expired = self.make_transfer("2.00", expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(handle_stock_request_timeouts(), 1)
+
+        expired.refresh_from_db()
+        self.transfer.refresh_from_db()
+        self.assertEqual((expired.status, self.transfer.status), ("timeout", "pending"))
+        fallback = StockTransfer.objects.get(from_godown=True)
+        self.assertEqual(fallback.from_branch, self.receiver)
+        self.assertEqual(
+            [(item_id, Decimal(qty)) for item_id, qty in fallback.lines.values_list("item_id", "quantity")],
+            [(self.rice.id, Decimal("2.00"))],
+        )
+
+    def test_timeouts_expire_everything_due_in_one_pass(self):
+        past = timezone.now() - timedelta(minutes=1)
+        first, second = self.make_transfer("2.00", expires_at=past), self.make_transfer("3.00", expires_at=past)
+        dal = make_item("Dal")
+        for item, quantity in ((self.rice, "1.00"), (dal, "0.50")):
+            StockRequest.objects.create(
+                from_branch=self.receiver, to_branch=self.donor, item=item,
+                quantity=Decimal(quantity), expires_at=past,
+            )
+
+        self.assertEqual(handle_stock_request_timeouts(), 4)
+        self.assertEqual(handle_stock_request_timeouts(), 0)
+
+        self.assertEqual(
+            set(StockTransfer.objects.filter(pk__in=[first.pk, second.pk]).values_list("status", flat=True)),
+            {"timeout"},
+        )
+        fallbacks = StockTransfer.objects.filter(from_godown=True)
+        # One per timed-out transfer, one for the branch's loose requests
+        self.assertEqual(
+            sorted(sorted((l.item_id, l.quantity) for l in f.lines.all()) for f in fallbacks),
+            sorted([
+                [(self.rice.id, Decimal("2.00"))],
+                [(self.rice.id, Decimal("3.00"))],
+                [(self.rice.id, Decimal("1.00")), (dal.id, Decimal("0.50"))],
+            ]),
+        )
+
+    def test_multi_request_rejects_non_positive_quantities(self):
+        dal = make_item("Dal")
+        for quantity in ("0", "-2", "NaN"):
+            response = self.client.post("/TFF/stock/request/multi/", {
+                "branch_id": self.receiver.id,
+                "items": [
+                    {"item_id": self.rice.id, "quantity": "2"},
+                    {"item_id": dal.id, "quantity": quantity},
+                ],
+            }, content_type="application/json")
+
+            self.assertEqual(response.status_code, 400, quantity)
+        self.assertEqual(StockTransfer.objects.count(), 1)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice = make_item("Rice")
+        self.dal = make_item("Dal")
+        self.rice_stock = make_stock(self.branch, self.rice, "5.00")
+        make_stock(self.branch, self.dal, "2.00")
+        take_snapshots()
+        self.snapshot_at = StockSnapshot.objects.get(branch=self.branch, item=self.rice).taken_at
+
+    def test_snapshot_plus_movements_matches_live_stock(self):
+        deduct_ingredient_usage([(make_order(self.branch), self.rice.id, Decimal("1.50"))])
+
+        self.assertEqual(
+            stock_at(self.branch, timezone.now()),
+            {self.rice.id: Decimal("3.50"), self.dal.id: Decimal("2.00")},
+        )
+        self.assertEqual(reconcile(self.branch), [])
+
+    def test_stock_at_ignores_later_movements(self):
+        deduct_ingredient_usage([(make_order(self.branch), self.rice.id, Decimal("1.50"))])
+        StockMovement.objects.update(created_at=self.snapshot_at + timedelta(hours=2))
+
+        at = self.snapshot_at + timedelta(hours=1)
+        self.assertEqual(stock_at(self.branch, at, item=self.rice), {self.rice.id: Decimal("5.00")})
+
+    def test_stock_at_starts_from_the_nearest_earlier_snapshot(self):
+        StockSnapshot.objects.update(taken_at=self.snapshot_at - timedelta(days=1))
+        deduct_ingredient_usage([(make_order(self.branch), self.rice.id, Decimal("1.00"))])
+        take_snapshots()
+        deduct_ingredient_usage([(make_order(self.branch), self.rice.id, Decimal("0.50"))])
+
+        self.assertEqual(stock_at(self.branch, timezone.now(), item=self.rice), {self.rice.id: Decimal("3.50")})
+        self.assertEqual(
+            stock_at(self.branch, self.snapshot_at - timedelta(hours=1), item=self.rice),
+            {self.rice.id: Decimal("5.00")},
+        )
+
+    def test_reconcile_reports_unrecorded_changes(self):
+        BranchStock.objects.filter(pk=self.rice_stock.pk).update(quantity=Decimal("4.25"))
+
+        self.assertEqual(reconcile(self.branch), [{
+            "item_id": self.rice.id,
+            "ledger": Decimal("5.00"),
+            "live": Decimal("4.25"),
+            "difference": Decimal("-0.75"),
+        }])
+
+    def test_stock_at_view_rejects_impossible_dates(self):
+        for at in ("yesterday", "2024-02-30T10:00"):
+            response = self.client.get("/TFF/branch/stock/at/", {"at": at, "branch_id": self.branch.branch_code})
+            self.assertEqual(response.status_code, 400, at)
+
+
+class RebalancePlanTests(TestCase):
+    def test_min_cost_flow_ships_along_the_cheapest_routes(self):
+        distances = {("A", "X"): 1, ("A", "Y"): 10, ("B", "X"): 2, ("B", "Y"): 3}
+
+        flows = min_cost_flow(
+            {"A": Decimal("5"), "B": Decimal("5")},
+            {"X": Decimal("5"), "Y": Decimal("5")},
+            lambda donor, receiver: distances[(donor, receiver)],
+        )
+
+        self.assertEqual(flows, {("A", "X"): Decimal("5"), ("B", "Y"): Decimal("5")})
+
+    def test_min_cost_flow_moves_what_it_can(self):
+        flows = min_cost_flow(
+            {"A": Decimal("3")},
+            {"X": Decimal("2"), "Y": Decimal("4")},
+            lambda donor, receiver: {"X": 5, "Y": 1}[receiver],
+        )
+
+        self.assertEqual(flows, {("A", "Y"): Decimal("3")})
+
+    def test_min_cost_flow_prefers_cheap_reroutes(self):
+        # Greedy A->X would leave Y to the expensive B->Y route
+        distances = {("A", "X"): 1, ("A", "Y"): 2, ("B", "X"): 2, ("B", "Y"): 100}
+
+        flows = min_cost_flow(
+            {"A": Decimal("4"), "B": Decimal("4")},
+            {"X": Decimal("4"), "Y": Decimal("4")},
+            lambda donor, receiver: distances[(donor, receiver)],
+        )
+
+        self.assertEqual(flows, {("A", "Y"): Decimal("4"), ("B", "X"): Decimal("4")})
+
+    def test_fewest_transfers_pairs_exact_matches_then_largest(self):
+        flows = fewest_transfers(
+            {1: Decimal("10"), 2: Decimal("5"), 3: Decimal("3")},
+            {4: Decimal("5"), 5: Decimal("8"), 6: Decimal("5")},
+        )
+
+        self.assertEqual(flows, {
+            (2, 4): Decimal("5"),
+            (1, 5): Decimal("8"),
+            (3, 6): Decimal("3"),
+            (1, 6): Decimal("2"),
+        })
+
+    def test_plan_covers_shortages_from_surplus_net_of_reservations(self):
+        donor, receiver, other = make_branch("A"), make_branch("B"), make_branch("C")
+        rice = make_item("Rice")
+        make_stock(donor, rice, "20.00", min_level="5.00", reserved="5.00")
+        make_stock(receiver, rice, "1.00", min_level="4.00")
+        make_stock(other, rice, "0.00", min_level="2.00")
+
+        self.assertEqual(sorted(plan_rebalance()), [
+            (receiver.id, donor.id, rice.id, Decimal("3.00")),
+            (other.id, donor.id, rice.id, Decimal("2.00")),
+        ])
+
+
+class BranchSalesTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch("A")
+        self.other = make_branch("B")
+
+    def total(self, branch):
+        return with_sales_total(Branch.objects.filter(pk=branch.pk)).get().sales_total
+
+    def test_sales_add_up_across_shards(self):
+        for amount in ("100.00", "250.50", "-50.00"):
+            add_branch_sale(self.branch.id, Decimal(amount))
+
+        self.assertEqual(BranchSalesShard.objects.filter(branch=self.branch).count(), SALES_SHARDS)
+        self.assertEqual(self.total(self.branch), Decimal("300.50"))
+        self.assertEqual(self.total(self.other), Decimal("0.00"))
+
+    def test_reconcile_folds_drift_into_slot_zero(self):
+        make_order(self.branch, total="120.00")
+        make_order(self.branch, total="80.00")
+        add_branch_sale(self.branch.id, Decimal("150.00"))
+        make_order(self.other, total="40.00")
+        add_branch_sale(self.other.id, Decimal("40.00"))
+
+        self.assertEqual(reconcile_branch_sales(), {self.branch.id: Decimal("50.00")})
+
+        self.assertEqual(self.total(self.branch), Decimal("200.00"))
+        self.assertEqual(self.total(self.other), Decimal("40.00"))
+        self.assertEqual(reconcile_branch_sales(), {})
+
+    def test_reconcile_creates_missing_shards(self):
+        make_order(self.other, total="75.00")
+
+        reconcile_branch_sales()
+
+        self.assertEqual(BranchSalesShard.objects.filter(branch=self.other).count(), SALES_SHARDS)
+        self.assertEqual(self.total(self.other), Decimal("75.00"))
+
+
+class ExpenseImportTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch("A")
+        self.other = make_branch("B")
+        self.yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+
+    def row(self, **fields):
+        return {
+            "branch_id": self.branch.branch_code,
+            "description": "Gas cylinder",
+            "amount": "1450.5",
+            "expense_date": self.yesterday,
+            **fields,
+        }
+
+    def test_valid_rows_are_saved(self):
+        import_expenses([self.row(), self.row(branch_id=self.other.branch_code, amount="99.999")])
+
+        self.assertEqual(
+            sorted(Expense.objects.values_list("branch_id", "amount")),
+            [(self.branch.id, Decimal("1450.50")), (self.other.id, Decimal("100.00"))],
+        )
+
+    def test_every_problem_is_reported_and_nothing_is_saved(self):
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+
+        with self.assertRaises(ExpenseImportError) as ctx:
+            import_expenses([
+                self.row(),
+                self.row(branch_id="TFFB999", description=" "),
+                self.row(amount="abc", expense_date="2026-02-30"),
+                self.row(amount="0", expense_date=tomorrow),
+                "not a row",
+            ])
+
+        self.assertEqual(
+            [(e["row"], e.get("field")) for e in ctx.exception.errors],
+            [
+                (2, "branch_id"), (2, "description"),
+                (3, "amount"), (3, "expense_date"),
+                (4, "amount"), (4, "expense_date"),
+                (5, None),
+            ],
+        )
+        self.assertFalse(Expense.objects.exists())
+
+    def test_branch_import_only_accepts_its_own_rows(self):
+        import_expenses([self.row(branch_id="")], branch=self.branch)
+
+        with self.assertRaises(ExpenseImportError) as ctx:
+            import_expenses([self.row(branch_id=self.other.branch_code)], branch=self.branch)
+        self.assertEqual(ctx.exception.errors[0]["field"], "branch_id")
+        self.assertEqual(Expense.objects.get().branch, self.branch)
+
+    def test_empty_and_oversized_imports_are_rejected(self):
+        for rows in ([], [self.row()] * (EXPENSE_IMPORT_MAX_ROWS + 1)):
+            with self.assertRaises(ExpenseImportError):
+                import_expenses(rows)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_csv_with_byte_order_mark(self):
+        upload = io.BytesIO(
+            "\ufeffbranch_id,description,amount,expense_date\n"
+            f"{self.branch.branch_code},Vegetables,320,{self.yesterday}\n".encode("utf-8")
+        )
+
+        import_expenses(parse_expense_csv(upload))
+
+        self.assertEqual(Expense.objects.get().amount, Decimal("320.00"))
+
+
+class BranchProfitTests(TestCase):
+    def test_profit_is_completed_sales_net_of_gst_less_expenses(self):
+        branch = make_branch()
+        today = timezone.localdate()
+        for status in ("completed", "completed", "pending"):
+            order = make_order(branch, total="105.00", status=status)
+            Order.objects.filter(pk=order.pk).update(subtotal=Decimal("100.00"), gst_amount=Decimal("5.00"))
+        Expense.objects.create(branch=branch, description="Rent", amount=Decimal("50.00"), expense_date=today)
+
+        [row] = branch_profit(reporting_period("custom", first=today, last=today))
+
+        self.assertEqual(row["completed_sales"], Decimal("210.00"))
+        self.assertEqual(row["completed_gst"], Decimal("10.00"))
+        self.assertEqual(row["profit"], Decimal("150.00"))
+
+
+class LeaderboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_brings_in_new_orders(self):
+        branch = make_branch()
+        make_order(branch, total="100.00")
+        self.assertEqual(branch_leaderboard()[0]["current_month_sales"], 100.0)
+
+        make_order(branch, total="50.00")
+        self.assertEqual(branch_leaderboard()[0]["current_month_sales"], 100.0)
+
+        invalidate_leaderboard()
+        self.assertEqual(branch_leaderboard()[0]["current_month_sales"], 150.0)
+
+
+class GodownIntakeTests(TestCase):
+    def post(self, **fields):
+        return self.client.post("/TFF/godown/create-item/", {
+            "item_name": "Paneer", "item_type": "raw_material", "category": "Dairy",
+            "quantity": "10", **fields,
+        }, content_type="application/json")
+
+    def test_lot_keeps_its_expiry_date(self):
+        response = self.post(expiry_date="2026-10-15")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(GodownLot.objects.get(pk=response.data["lot_id"]).expiry_date.isoformat(), "2026-10-15")
+
+    def test_malformed_expiry_date_is_refused(self):
+        for expiry_date in ("15/10/2026", "2026-02-30"):
+            response = self.post(expiry_date=expiry_date)
+
+            self.assertEqual(response.status_code, 400, expiry_date)
+        self.assertFalse(Item.objects.exists())
+        self.assertFalse(GodownLot.objects.exists())
+
+
+class ForecastWindowTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice = make_item("Rice")
+        self.today = timezone.localdate()
+
+    def use(self, days_ago, quantity, hour=12):
+        usage = OrderIngredientUsage.objects.create(
+            order=make_order(self.branch), item=self.rice, quantity_used=Decimal(quantity)
+        )
+        moment = day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=hour)
+        OrderIngredientUsage.objects.filter(pk=usage.pk).update(created_at=moment)
+
+    def test_window_is_the_closed_days_before_today(self):
+        self.use(0, "9.00")                  # today: still open
+        self.use(1, "2.00", hour=23)         # yesterday, last bucket
+        self.use(FORECAST_WINDOW_DAYS, "3.00", hour=0)
+        self.use(FORECAST_WINDOW_DAYS + 1, "7.00")
+
+        series = daily_usage(today=self.today)[(self.branch.id, self.rice.id)]
+
+        self.assertEqual(len(series), FORECAST_WINDOW_DAYS)
+        self.assertEqual((series[0], series[-1]), (3.0, 2.0))
+        self.assertEqual(sum(series), 5.0)
+
+    def test_usage_only_today_gives_no_series(self):
+        self.use(0, "4.00")
+
+        self.assertEqual(dict(daily_usage(today=self.today)), {})
+
+    def test_suggestions_only_count_unexpired_godown_lots(self):
+        make_stock(self.branch, self.rice, "1.00", min_level="2.00")
+        for days_ago in range(1, 8):
+            self.use(days_ago, "1.00")
+        GodownLot.objects.create(item=self.rice, quantity=Decimal("5.00"), expiry_date=self.today)
+        GodownLot.objects.create(item=self.rice, quantity=Decimal("4.00"), expiry_date=None)
+        GodownLot.objects.create(item=self.rice, quantity=Decimal("8.00"), expiry_date=self.today - timedelta(days=1))
+
+        self.assertEqual(generate_reorder_suggestions(), 1)
+
+        suggestion = ReorderSuggestion.objects.get()
+        self.assertEqual(suggestion.godown_available, Decimal("9.00"))
+        self.assertGreater(suggestion.suggested_quantity, Decimal("1.00"))
+
+
+class OrderNotifierTests(TestCase):
+    # Module state outlives a test, so every test uses its own customer ids
+
+    def test_change_is_delivered_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            order_notifier.notify_order_change(101)
+            self.assertEqual(order_notifier.current_version(101), 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(order_notifier.current_version(101), 0)
+
+    def test_wait_returns_at_once_when_client_is_behind(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order_notifier.notify_order_change(102)
+        version = order_notifier.current_version(102)
+
+        self.assertEqual(order_notifier.wait_for_order_change(102, -1, timeout=5), version)
+        self.assertEqual(order_notifier.wait_for_order_change(102, version - 1, timeout=5), version)
+
+    def test_wait_times_out_without_a_change(self):
+        started = time.monotonic()
+
+        version = order_notifier.wait_for_order_change(103, 0, timeout=0.2)
+
+        self.assertEqual(version, 0)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_waiter_is_woken_by_a_change(self):
+        result = {}
+        waiter = threading.Thread(
+            target=lambda: result.update(version=order_notifier.wait_for_order_change(104, 0, timeout=10))
+        )
+        started = time.monotonic()
+        waiter.start()
+        time.sleep(0.1)
+        order_notifier._deliver(104, 1_700_000_000_000)
+        waiter.join(5)
+
+        self.assertEqual(result["version"], 1_700_000_000_000)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_a_version_from_another_process_is_not_a_change(self):
+        # The client last heard from a process that saw a newer change
+        order_notifier._deliver(105, 1_000)
+
+        self.assertEqual(order_notifier.wait_for_order_change(105, 2_000, timeout=0.05), 1_000)
+
+    def test_versions_never_go_back_or_repeat(self):
+        order_notifier._deliver(106, 5_000)
+        order_notifier._deliver(106, 4_000)
+        self.assertEqual(order_notifier.current_version(106), 5_001)
+        order_notifier._deliver(106, 9_000)
+        self.assertEqual(order_notifier.current_version(106), 9_000)
+
+    def test_wait_view_rejects_a_bad_customer_id(self):
+        response = self.client.get("/TFF/orders/wait/", {"customer_id": "TFCabc"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def order_on(self, day, total, **fields):
+        order = make_order(self.branch, total=total, **fields)
+        Order.objects.filter(pk=order.pk).update(created_at=day_start(day) + timedelta(hours=12))
+        order.refresh_from_db()
+        return order
+
+    def rolled(self, day):
+        return DailyAnalytics.objects.filter(branch=self.branch, date=day).values_list(
+            "total_orders", "total_sales", "completed_orders", "completed_sales"
+        ).get()
+
+    def test_first_run_rolls_every_day_and_sets_the_watermark(self):
+        self.order_on(self.yesterday, "105.00", status="completed")
+        self.order_on(self.today, "40.00")
+
+        self.assertEqual(rollup_daily_analytics(), 2)
+
+        self.assertEqual(self.rolled(self.yesterday), (1, Decimal("105.00"), 1, Decimal("105.00")))
+        self.assertEqual(self.rolled(self.today), (1, Decimal("40.00"), 0, Decimal("0.00")))
+        self.assertTrue(RollupWatermark.objects.filter(name=DAILY_ANALYTICS).exists())
+
+    def test_later_runs_only_reroll_changed_days(self):
+        order = self.order_on(self.yesterday, "105.00")
+        rollup_daily_analytics()
+        RollupWatermark.objects.update(value=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(rollup_daily_analytics(), 0)
+
+        Order.objects.filter(pk=order.pk).update(status="completed", completed_at=timezone.now())
+        self.assertEqual(rollup_daily_analytics(), 1)
+        self.assertEqual(self.rolled(self.yesterday), (1, Decimal("105.00"), 1, Decimal("105.00")))
+
+    def test_cancelled_order_is_taken_out_of_a_rolled_day(self):
+        order = self.order_on(self.yesterday, "105.00")
+        rollup_daily_analytics()
+        RollupWatermark.objects.update(value=timezone.now() - timedelta(hours=1))
+
+        response = self.client.post(
+            "/TFF/orders/cancel/",
+            {"order_id": order.id, "customer_id": order.customer.Cid},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(RollupDirtyDay.objects.exists())
+
+        self.assertEqual(rollup_daily_analytics(), 1)
+        self.assertEqual(self.rolled(self.yesterday), (0, Decimal("0.00"), 0, Decimal("0.00")))
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+    def test_net_profit_leaves_out_gst(self):
+        order = self.order_on(self.yesterday, "105.00", status="completed")
+        Order.objects.filter(pk=order.pk).update(subtotal=Decimal("100.00"), gst_amount=Decimal("5.00"))
+        Expense.objects.create(branch=self.branch, description="Gas", amount=Decimal("30.00"), expense_date=self.yesterday)
+
+        rollup_daily_analytics()
+
+        self.assertEqual(
+            DailyAnalytics.objects.get(branch=self.branch, date=self.yesterday).net_profit,
+            Decimal("70.00"),
+        )
+
+
+class ParquetExportTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.orders = [make_order(self.branch, total=total) for total in ("100.00", "250.50", "80.25")]
+        today = timezone.localdate()
+        self.period = reporting_period("custom", first=today, last=today)
+
+    def read(self, stream):
+        return pq.ParquetFile(io.BytesIO(b"".join(stream)))
+
+    def test_orders_round_trip_one_row_group_per_chunk(self):
+        with mock.patch.object(export_service, "EXPORT_CHUNK_SIZE", 2):
+            parquet = self.read(stream_export("orders", self.period, "parquet"))
+
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        table = parquet.read(columns=["order_id", "branch_code", "total_amount"]).to_pydict()
+        self.assertEqual(table["order_id"], [o.id for o in self.orders])
+        self.assertEqual(set(table["branch_code"]), {self.branch.branch_code})
+        self.assertEqual(table["total_amount"], [Decimal("100.00"), Decimal("250.50"), Decimal("80.25")])
+
+    def test_empty_period_is_a_valid_file(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        parquet = self.read(stream_export("orders", reporting_period("custom", first=yesterday, last=yesterday), "parquet"))
+
+        self.assertEqual(parquet.metadata.num_rows, 0)
+        self.assertIn("created_at", parquet.schema_arrow.names)
+
+
+class SalesTimeseriesCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch = make_branch()
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        self.period = reporting_period("custom", first=self.yesterday, last=self.yesterday)
+        self.order = make_order(self.branch, total="120.00")
+        Order.objects.filter(pk=self.order.pk).update(created_at=day_start(self.yesterday) + timedelta(hours=12))
+
+    def yesterday_orders(self):
+        return [row[1] for row in sales_timeseries(self.period, "day").get(self.branch.id, [])]
+
+    def test_deleted_order_leaves_the_cached_closed_bucket(self):
+        self.assertEqual(self.yesterday_orders(), [1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            discard_order(Order.objects.get(pk=self.order.pk))
+
+        self.assertEqual(self.yesterday_orders(), [])
+
+    def test_series_is_rebuilt_once_it_reaches_the_max_age(self):
+        self.assertEqual(self.yesterday_orders(), [1])
+        # A change to a closed bucket that no invalidation covered
+        late = make_order(self.branch)
+        Order.objects.filter(pk=late.pk).update(created_at=day_start(self.yesterday) + timedelta(hours=13))
+        self.assertEqual(self.yesterday_orders(), [1])
+
+        key = f"{TIMESERIES_CACHE_KEY}:day"
+        entry = cache.get(key)
+        entry["built"] -= TIMESERIES_MAX_AGE
+        cache.set(key, entry)
+
+        self.assertEqual(self.yesterday_orders(), [2])
+
+
+class StockSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch = make_branch()
+        rice = make_item("Rice")
+        make_stock(self.branch, rice, "5.00", min_level="2.00")
+        self.order = make_order(self.branch)
+        add_dish(self.order, make_dish("Pulao", [(rice, "2.00")]), quantity=2)
+
+    def below_min(self):
+        return branches_stock_summary_data()[0]["below_min_count"]
+
+    def test_reserving_and_releasing_refresh_the_cached_summary(self):
+        self.assertEqual(self.below_min(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order_stock(self.order)
+        self.assertEqual(self.below_min(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_order_reservations(self.order)
+        self.assertEqual(self.below_min(), 0)
+
+
+class PreparationTimeTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.chef = make_chef(self.branch)
+        # Stand-in for the authenticated user the JWT backend hands the view
+        self.chef.is_authenticated = True
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.chef)
+        self.dish = make_dish("Dosa", [])
+
+    def test_marking_an_order_ready_records_its_preparation_time(self):
+        order = make_order(
+            self.branch, status="preparing", assigned_chef=self.chef,
+            accepted_at=timezone.now() - timedelta(minutes=12),
+        )
+        add_dish(order, self.dish)
+
+        response = self.client.post("/TFF/kitchen/orders/complete/", {"order_id": order.id}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        stat = PrepTimeStat.objects.get(branch=self.branch, menu_item=self.dish)
+        self.assertAlmostEqual(stat.avg_seconds, 12 * 60, delta=5)
+        self.assertEqual(stat.samples, 1)
+
+
+@override_settings(ROW_COUNT_REFRESH_MINUTES=15)
+class RowCountTests(TestCase):
+    def setUp(self):
+        make_branch()
+        refresh_row_counts()
+        make_branch("Koramangala")
+
+    def age_counts(self, minutes):
+        TableRowCount.objects.update(updated_at=timezone.now() - timedelta(minutes=minutes))
+
+    def test_counts_due_for_refresh_are_served_as_stored(self):
+        self.age_counts(20)
+
+        counts, as_of = model_counts_data()
+
+        self.assertEqual(counts["branches"], 1)
+        self.assertLess(as_of, timezone.now() - timedelta(minutes=19))
+
+    def test_counts_that_missed_a_refresh_are_recounted(self):
+        self.age_counts(31)
+
+        counts, _ = model_counts_data()
+
+        self.assertEqual(counts["branches"], 2)
+        self.assertEqual(TableRowCount.objects.get(name="branches").count, 2)
+
+
+class ReservationLifecycleTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice, self.dal = make_item("Rice"), make_item("Dal")
+        self.rice_stock = make_stock(self.branch, self.rice, "10.00")
+        self.dal_stock = make_stock(self.branch, self.dal, "3.00")
+        self.dish = make_dish("Khichdi", [(self.rice, "2.00"), (self.dal, "1.00")])
+        self.order = self.order_of(2)
+
+    def order_of(self, plates):
+        order = make_order(self.branch)
+        add_dish(order, self.dish, quantity=plates)
+        return order
+
+    def assert_held(self, rice, dal):
+        self.rice_stock.refresh_from_db()
+        self.dal_stock.refresh_from_db()
+        self.assertEqual((self.rice_stock.reserved, self.dal_stock.reserved), (Decimal(rice), Decimal(dal)))
+
+    def test_reserve_holds_the_recipe_demand(self):
+        reservations = reserve_order_stock(self.order)
+
+        self.assertEqual(
+            sorted((r.item_id, r.quantity, r.status) for r in reservations),
+            [(self.rice.id, Decimal("4.00"), "active"), (self.dal.id, Decimal("2.00"), "active")],
+        )
+        self.assertTrue(all(r.expires_at > timezone.now() for r in reservations))
+        self.assert_held("4.00", "2.00")
+
+    def test_held_stock_is_not_available_to_the_next_order(self):
+        reserve_order_stock(self.order)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_order_stock(self.order_of(2))
+
+        self.assertEqual(
+            [(s["item_id"], s["required"], s["available"]) for s in raised.exception.shortfalls],
+            [(self.dal.id, Decimal("2.00"), Decimal("1.00"))],
+        )
+        # All or nothing: the rice the second order could have had stays free
+        self.assert_held("4.00", "2.00")
+        self.assertEqual(StockReservation.objects.count(), 2)
+
+    def test_release_gives_the_stock_back_once(self):
+        reserve_order_stock(self.order)
+
+        self.assertEqual(release_order_reservations(self.order), 2)
+        self.assertEqual(release_order_reservations(self.order), 0)
+
+        self.assert_held("0.00", "0.00")
+        self.assertEqual(set(StockReservation.objects.values_list("status", flat=True)), {"released"})
+
+    def test_expired_reservations_are_released(self):
+        reserve_order_stock(self.order)
+        later = self.order_of(1)
+        reserve_order_stock(later)
+        StockReservation.objects.filter(order=self.order).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(release_expired_reservations(), 2)
+
+        self.assert_held("2.00", "1.00")
+        self.assertEqual(set(later.reservations.values_list("status", flat=True)), {"active"})
+
+    def test_submitting_the_order_consumes_what_it_reserved(self):
+        reserve_order_stock(self.order)
+        # Stock the order holds is still its own to use
+        BranchStock.objects.filter(pk=self.dal_stock.pk).update(quantity=Decimal("2.00"))
+
+        consume_recipe_stock([self.order])
+
+        self.rice_stock.refresh_from_db()
+        self.dal_stock.refresh_from_db()
+        self.assertEqual(
+            [(s.quantity, s.reserved) for s in (self.rice_stock, self.dal_stock)],
+            [(Decimal("6.00"), Decimal("0.00")), (Decimal("0.00"), Decimal("0.00"))],
+        )
+        self.assertEqual(set(self.order.reservations.values_list("status", flat=True)), {"consumed"})
+
+
+class KitchenDispatchTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice = make_item("Rice")
+        self.rice_stock = make_stock(self.branch, self.rice, "10.00")
+        self.dish = make_dish("Pulao", [(self.rice, "1.00")])
+        self.chefs = [
+            make_chef(self.branch, name, phone, is_working=True, is_logged_in=True)
+            for name, phone in (("ravi", "9222222222"), ("meena", "9333333333"))
+        ]
+
+    def order_of(self, plates=1, minutes_ago=0, **fields):
+        order = make_order(self.branch, **fields)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        add_dish(order, self.dish, quantity=plates)
+        return order
+
+    def claimed(self):
+        return dict(Order.objects.filter(status="preparing").values_list("id", "assigned_chef_id"))
+
+    def test_fifo_gives_each_idle_chef_the_oldest_order(self):
+        oldest, older, newest = self.order_of(minutes_ago=30), self.order_of(minutes_ago=20), self.order_of()
+
+        assigned = dispatch_pending_orders("fifo")
+
+        self.assertEqual(len(assigned), 2)
+        self.assertEqual(self.claimed(), {oldest.id: self.chefs[0].id, older.id: self.chefs[1].id})
+        newest.refresh_from_db()
+        self.assertEqual((newest.status, newest.assigned_chef_id), ("pending", None))
+        self.assertEqual(StockReservation.objects.filter(status="active").count(), 2)
+
+    def test_priority_policy_serves_rush_orders_first(self):
+        self.order_of(minutes_ago=30)
+        rush = self.order_of(priority=5)
+        Employees.objects.filter(pk=self.chefs[1].pk).update(is_working=False)
+
+        dispatch_branch_orders(self.branch, "priority")
+
+        self.assertEqual(self.claimed(), {rush.id: self.chefs[0].id})
+
+    def test_busy_chefs_are_skipped(self):
+        self.order_of(status="preparing", assigned_chef=self.chefs[0])
+        waiting = self.order_of()
+
+        dispatch_branch_orders(self.branch)
+
+        self.assertEqual(Order.objects.get(pk=waiting.pk).assigned_chef_id, self.chefs[1].id)
+
+    def test_order_claimed_elsewhere_is_not_taken_again(self):
+        order = self.order_of()
+        # Claimed by hand after the dispatcher picked it from the queue
+        Order.objects.filter(pk=order.pk).update(status="preparing", assigned_chef=self.chefs[1])
+
+        with mock.patch.object(kitchen_dispatcher, "dispatch_queue", return_value=Order.objects.filter(pk=order.pk)):
+            self.assertEqual(dispatch_branch_orders(self.branch), [])
+
+        self.assertEqual(self.claimed(), {order.id: self.chefs[1].id})
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_order_short_of_stock_stays_pending_and_the_chef_takes_the_next(self):
+        Employees.objects.filter(pk=self.chefs[1].pk).update(is_working=False)
+        big = self.order_of(plates=20, minutes_ago=10)
+        small = self.order_of(plates=2)
+        later = self.order_of(plates=1)
+
+        assigned = dispatch_branch_orders(self.branch)
+
+        self.assertEqual([(o.id, chef.id) for o, chef in assigned], [(small.id, self.chefs[0].id)])
+        self.assertEqual(Order.objects.get(pk=big.pk).status, "pending")
+        self.assertEqual(Order.objects.get(pk=later.pk).status, "pending")
+        self.rice_stock.refresh_from_db()
+        self.assertEqual(self.rice_stock.reserved, Decimal("2.00"))
+
+    def test_manual_accept_is_refused_while_the_chef_is_busy(self):
+        first, second = self.order_of(minutes_ago=5), self.order_of()
+        accept = lambda order: self.client.post(
+            "/TFF/chef/orders/accept/", {"order_id": order.id, "Eid": self.chefs[0].Eid},
+            content_type="application/json",
+        )
+
+        self.assertEqual(accept(first).status_code, 200)
+        self.assertEqual(accept(second).status_code, 400)
+        self.assertEqual(self.claimed(), {first.id: self.chefs[0].id})
+
+    def test_manual_accept_short_of_stock_leaves_the_order_pending(self):
+        order = self.order_of(plates=20)
+
+        response = self.client.post(
+            "/TFF/chef/orders/accept/", {"order_id": order.id, "Eid": self.chefs[0].Eid},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["shortfalls"][0]["item_id"], self.rice.id)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.assigned_chef_id), ("pending", None))
+
+
+class PeriodSummaryTests(TestCase):
+    # A Wednesday: the week runs from Monday the 13th
+    TODAY = date(2025, 10, 15)
+
+    def setUp(self):
+        self.main = make_branch("Indiranagar")
+        self.other = make_branch("Koramangala")
+        self.idle = make_branch("Jayanagar")
+        for branch, day, total, status in (
+            (self.main, 15, "100.00", "completed"),
+            (self.main, 15, "50.00", "pending"),
+            (self.main, 13, "200.00", "completed"),
+            (self.main, 14, "70.00", "pending"),
+            (self.main, 3, "300.00", "completed"),
+            (self.other, 15, "10.00", "completed"),
+        ):
+            self.place(branch, date(2025, 10, day), total, status)
+        self.place(self.main, date(2025, 9, 20), "400.00", "completed")
+        for branch, day, gst in ((self.main, 15, "7.50"), (self.main, 3, "15.00"), (self.other, 15, "0.50")):
+            self.gst(branch, date(2025, 10, day), gst)
+
+    def place(self, branch, day, total, status):
+        order = make_order(branch, total=total, status=status)
+        Order.objects.filter(pk=order.pk).update(created_at=day_start(day) + timedelta(hours=13))
+
+    def gst(self, branch, day, amount):
+        row = TiexCollect.objects.create(branch=branch, gst=Decimal(amount))
+        TiexCollect.objects.filter(pk=row.pk).update(created_at=day_start(day) + timedelta(hours=13))
+
+    def figures(self, summary):
+        return {
+            name: (period["total_orders"], period["total_sales"], period["total_gst"])
+            for name, period in summary.items()
+        }
+
+    MAIN = {
+        "today": (2, Decimal("150.00"), Decimal("7.50")),
+        "this_week": (2, Decimal("300.00"), Decimal("7.50")),
+        "this_month": (3, Decimal("600.00"), Decimal("22.50")),
+        "previous_month": (1, Decimal("400.00"), Decimal("0.00")),
+    }
+
+    def test_branch_summary_counts_today_whole_and_other_periods_completed(self):
+        self.assertEqual(self.figures(period_summary(branch=self.main, today=self.TODAY)), self.MAIN)
+
+    def test_all_branches_are_grouped_in_one_summary(self):
+        summaries = period_summary(by_branch=True, today=self.TODAY)
+
+        self.assertEqual(set(summaries), {self.main.id, self.other.id, self.idle.id})
+        self.assertEqual(self.figures(summaries[self.main.id]), self.MAIN)
+        self.assertEqual(self.figures(summaries[self.other.id])["this_month"], (1, Decimal("10.00"), Decimal("0.50")))
+        self.assertEqual(
+            set(self.figures(summaries[self.idle.id]).values()), {(0, Decimal("0.00"), Decimal("0.00"))}
+        )
+        self.assertEqual(
+            self.figures(period_summary(today=self.TODAY))["this_month"],
+            (4, Decimal("610.00"), Decimal("23.00")),
+        )
+
+    def test_rolled_and_live_days_add_up_without_double_counting(self):
+        rollup_daily_analytics()
+        # Closed through the 13th: the week is half rolled, half live
+        RollupWatermark.objects.update(value=day_start(date(2025, 10, 14)) + timedelta(hours=1))
+
+        self.assertEqual(self.figures(period_summary(branch=self.main, today=self.TODAY)), self.MAIN)
+
+
+class RecipeTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice, self.dal, self.ghee = make_item("Rice"), make_item("Dal"), make_item("Ghee", "l")
+        self.khichdi = make_dish("Khichdi", [(self.rice, "0.20"), (self.dal, "0.10")])
+        self.pulao = make_dish("Pulao", [(self.rice, "0.25"), (self.ghee, "0.05")])
+        self.lassi = make_dish("Lassi", [])
+
+    def order_of(self, branch, *dishes):
+        order = make_order(branch)
+        for dish, plates in dishes:
+            add_dish(order, dish, quantity=plates)
+        return order
+
+    def test_demand_adds_up_shared_ingredients_and_skips_dishes_without_recipe(self):
+        order = self.order_of(self.branch, (self.khichdi, 2), (self.pulao, 3), (self.lassi, 1))
+
+        self.assertEqual(order_ingredient_demand([order])[order.id], {
+            self.rice.id: Decimal("1.15"), self.dal.id: Decimal("0.20"), self.ghee.id: Decimal("0.15"),
+        })
+
+    def test_batch_demand_is_one_vector_per_branch_and_item(self):
+        other = make_branch("Koramangala")
+        orders = [
+            self.order_of(self.branch, (self.khichdi, 1)),
+            self.order_of(self.branch, (self.khichdi, 4)),
+            self.order_of(other, (self.pulao, 2)),
+        ]
+
+        self.assertEqual(ingredient_demand_vector(orders), {
+            (self.branch.id, self.rice.id): Decimal("1.00"),
+            (self.branch.id, self.dal.id): Decimal("0.50"),
+            (other.id, self.rice.id): Decimal("0.50"),
+            (other.id, self.ghee.id): Decimal("0.10"),
+        })
+
+    def test_batch_consumption_is_all_or_nothing(self):
+        rice = make_stock(self.branch, self.rice, "5.00")
+        make_stock(self.branch, self.dal, "1.00")
+        make_stock(self.branch, self.ghee, "0.10")
+        orders = [self.order_of(self.branch, (self.khichdi, 5)), self.order_of(self.branch, (self.pulao, 4))]
+
+        with self.assertRaises(InsufficientStock) as raised:
+            consume_recipe_stock(orders)
+
+        self.assertEqual([s["item_id"] for s in raised.exception.shortfalls], [self.ghee.id])
+        rice.refresh_from_db()
+        self.assertEqual(rice.quantity, Decimal("5.00"))
+        self.assertFalse(OrderIngredientUsage.objects.exists())
+
+        BranchStock.objects.filter(item=self.ghee).update(quantity=Decimal("1.00"))
+        consume_recipe_stock(orders)
+        rice.refresh_from_db()
+        self.assertEqual(rice.quantity, Decimal("3.00"))
+        self.assertEqual(OrderIngredientUsage.objects.count(), 4)
+
+    def test_invalid_recipe_names_each_bad_line_and_keeps_the_old_one(self):
+        with self.assertRaises(InvalidRecipe) as raised:
+            set_recipe(self.khichdi, [
+                (self.rice.id, Decimal("0.30")),
+                (self.rice.id, Decimal("0.10")),
+                (self.dal.id, Decimal("0")),
+                (self.ghee.id, Decimal("0.004")),
+            ])
+
+        self.assertEqual(
+            [(e["item_id"], e["error"].split()[0]) for e in raised.exception.errors],
+            [(self.rice.id, "Listed"), (self.dal.id, "Quantity"), (self.ghee.id, "Quantity")],
+        )
+        self.assertEqual(
+            dict(self.khichdi.recipe.values_list("item_id", "quantity")),
+            {self.rice.id: Decimal("0.20"), self.dal.id: Decimal("0.10")},
+        )
+
+    def test_recipe_endpoint_replaces_the_recipe(self):
+        url = f"/TFF/menu/{self.khichdi.id}/recipe/"
+
+        response = self.client.put(url, {"ingredients": [{"item_id": self.rice.id, "quantity": "0.35"}]},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(i["item_id"], i["quantity"]) for i in response.data["ingredients"]],
+            [(self.rice.id, Decimal("0.35"))],
+        )
+
+        response = self.client.put(url, {"ingredients": [{"item_id": 999999, "quantity": "1"}]},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(self.khichdi.recipe.values_list("item_id", flat=True)), [self.rice.id])
+
+
+class DonorSelectionTests(TestCase):
+    def setUp(self):
+        self.requester = make_branch("Indiranagar", "12.971600", "77.640100")
+        self.near = make_branch("Domlur", "12.961000", "77.638800")
+        self.far = make_branch("Whitefield", "12.969800", "77.750000")
+        self.rice = make_item("Rice")
+        make_stock(self.requester, self.rice, "50.00")
+        make_stock(self.near, self.rice, "12.00", min_level="4.00", reserved="2.00")
+        make_stock(self.far, self.rice, "20.00", min_level="4.00")
+
+    def test_largest_surplus_net_of_min_level_and_reservations_wins(self):
+        self.assertEqual(find_excess_branch(self.requester, self.rice, Decimal("5.00")), self.far)
+
+        BranchStock.objects.filter(branch=self.far).update(reserved=Decimal("12.00"))
+        self.assertEqual(find_excess_branch(self.requester, self.rice, Decimal("5.00")), self.near)
+
+    def test_nearest_branch_with_enough_surplus_wins_by_distance(self):
+        self.assertEqual(find_excess_branch(self.requester, self.rice, Decimal("6.00"), by_distance=True), self.near)
+        self.assertEqual(find_excess_branch(self.requester, self.rice, Decimal("7.00"), by_distance=True), self.far)
+
+    def test_no_donor_falls_back_to_the_godown(self):
+        self.assertIsNone(find_excess_branch(self.requester, self.rice, Decimal("17.00")))
+
+        request = create_smart_stock_request(self.requester, self.rice, Decimal("17.00"))
+
+        self.assertTrue(request.from_godown)
+        self.assertIsNone(request.to_branch)
+
+
+class SchedulerTests(TestCase):
+    def test_leader_runs_the_job(self):
+        calls = []
+
+        scheduler.run_job("test_job", lambda: calls.append(1))
+
+        self.assertEqual(calls, [1])
+
+    def test_follower_skips_the_job(self):
+        @contextmanager
+        def not_leader(name):
+            yield False
+
+        calls = []
+        with mock.patch.object(scheduler, "leader_lock", not_leader):
+            scheduler.run_job("test_job", lambda: calls.append(1))
+
+        self.assertEqual(calls, [])
+
+    def test_failing_job_is_logged_not_raised(self):
+        def boom():
+            raise RuntimeError("boom")
+
+        with self.assertLogs("TFF.scheduler", "ERROR") as logs:
+            scheduler.run_job("test_job", boom)
+
+        self.assertIn("test_job", logs.output[0])
+
+    def test_every_job_is_scheduled_once_through_run_job(self):
+        with mock.patch.object(scheduler.BlockingScheduler, "start"):
+            running = scheduler.start()
+        self.addCleanup(setattr, scheduler, "_scheduler", None)
+
+        jobs = running.get_jobs()
+        self.assertEqual(sorted(job.id for job in jobs), sorted(name for name, _, _ in scheduler.scheduled_jobs()))
+        for job in jobs:
+            self.assertIs(job.func, scheduler.run_job)
+            self.assertEqual(job.max_instances, 1)
+            self.assertTrue(job.coalesce)
+
+
+class LowStockAlertTests(TestCase):
+    def setUp(self):
+        self.branch = make_branch()
+        self.rice = make_item("Rice")
+        self.stock = make_stock(self.branch, self.rice, "10.00", min_level="4.00")
+
+    def use(self, quantity):
+        deduct_ingredient_usage([(make_order(self.branch), self.rice.id, Decimal(quantity))])
+
+    def open_alerts(self):
+        return list(LowStockAlert.objects.filter(resolved_at__isnull=True).values_list("item_id", "quantity"))
+
+    def test_dropping_below_min_opens_one_alert_until_restocked(self):
+        self.use("5.00")
+        self.assertEqual(self.open_alerts(), [])
+
+        self.use("2.00")
+        self.use("1.00")
+        # Still the first alert, with the quantity it was raised at
+        self.assertEqual(self.open_alerts(), [(self.rice.id, Decimal("3.00"))])
+
+        BranchStock.objects.filter(pk=self.stock.pk).update(quantity=Decimal("9.00"))
+        check_low_stock([BranchStock.objects.get(pk=self.stock.pk)])
+        self.assertEqual(self.open_alerts(), [])
+
+        self.use("6.00")
+        self.assertEqual(self.open_alerts(), [(self.rice.id, Decimal("3.00"))])
+        self.assertEqual(LowStockAlert.objects.count(), 2)
+
+    def test_reserved_stock_counts_against_min_level(self):
+        BranchStock.objects.filter(pk=self.stock.pk).update(reserved=Decimal("7.00"))
+
+        check_low_stock([BranchStock.objects.get(pk=self.stock.pk)])
+
+        self.assertEqual(self.open_alerts(), [(self.rice.id, Decimal("3.00"))])
+
+    def test_upsert_returns_only_the_alerts_it_inserted(self):
+        dal_stock = make_stock(self.branch, make_item("Dal"), "1.00", min_level="2.00")
+        self.stock.quantity = Decimal("2.00")
+
+        first = _open_alerts([self.stock])
+        again = _open_alerts([self.stock, dal_stock])
+
+        self.assertEqual([a.item_id for a in first], [self.rice.id])
+        self.assertEqual([a.item_id for a in again], [dal_stock.item_id])
+        self.assertEqual(LowStockAlert.objects.count(), 2)
+
+    @override_settings(LOW_STOCK_AUTO_REQUEST=True)
+    def test_new_shortage_raises_a_stock_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.use("7.00")
+
+        alert = LowStockAlert.objects.get()
+        self.assertIsNotNone(alert.stock_request)
+        self.assertEqual(
+            (alert.stock_request.from_branch_id, alert.stock_request.item_id, alert.stock_request.quantity),
+            (self.branch.id, self.rice.id, Decimal("1.00")),
+        )
+
+    def test_feed_lists_open_alerts_or_changes_since_a_cursor(self):
+        url = "/TFF/branch/stock/alerts/"
+        self.use("7.00")
+        cursor = self.client.get(url, {"branch_id": self.branch.branch_code}).data["server_time"]
+
+        response = self.client.get(url, {"branch_id": self.branch.branch_code})
+        self.assertEqual([a["item_id"] for a in response.data["alerts"]], [self.rice.id])
+        self.assertEqual([s["item_id"] for s in response.data["below_min"]], [self.rice.id])
+
+        BranchStock.objects.filter(pk=self.stock.pk).update(quantity=Decimal("8.00"))
+        check_low_stock([BranchStock.objects.get(pk=self.stock.pk)])
+
+        self.assertEqual(self.client.get(url, {"branch_id": self.branch.branch_code}).data["alerts"], [])
+        feed = self.client.get(url, {"branch_id": self.branch.branch_code, "since": cursor.isoformat()}).data
+        self.assertEqual([(a["item_id"], a["resolved_at"] is not None) for a in feed["alerts"]], [(self.rice.id, True)])
+
+
+class ReportingPeriodTests(TestCase):
+    def test_days_are_half_open_ranges_from_local_midnight(self):
+        period = days_period(date(2025, 10, 15), date(2025, 10, 15))
+
+        self.assertEqual(str(period.start), "2025-10-15 00:00:00+05:30")
+        self.assertEqual(period.end - period.start, timedelta(days=1))
+
+        branch = make_branch()
+        for moment in (period.start - timedelta(seconds=1), period.start, period.end - timedelta(seconds=1), period.end):
+            order = make_order(branch)
+            Order.objects.filter(pk=order.pk).update(created_at=moment)
+        self.assertEqual(Order.objects.filter(period.filter()).count(), 2)
+
+    def test_named_periods_run_up_to_and_including_today(self):
+        today = date(2026, 1, 7)    # a Wednesday
+        spans = {
+            name: (reporting_period(name, today).first, reporting_period(name, today).last)
+            for name in ("today", "week", "month", "previous_month")
+        }
+
+        self.assertEqual(spans, {
+            "today": (today, today),
+            "week": (date(2026, 1, 5), today),
+            "month": (date(2026, 1, 1), today),
+            "previous_month": (date(2025, 12, 1), date(2025, 12, 31)),
+        })
+
+    def test_custom_period_needs_both_ends_and_names_are_checked(self):
+        self.assertEqual(
+            reporting_period("custom", first=date(2025, 2, 1), last=date(2025, 2, 28)).end,
+            day_start(date(2025, 3, 1)),
+        )
+        with self.assertRaises(ValueError):
+            reporting_period("custom", first=date(2025, 2, 1))
+        with self.assertRaises(ValueError):
+            reporting_period("fortnight")
+
+    def test_filter_compares_the_raw_timestamp(self):
+        period = reporting_period("today")
+        sql = str(Order.objects.filter(period.filter()).query)
+
+        # No per-row date cast, so the created_at index can serve it
+        self.assertNotIn("cast_date", sql.lower())
+        self.assertIn("created_at", sql)
+        self.assertIn("order_created_at_idx", [index.name for index in Order._meta.indexes])
+
+
+class MenuPopularityTests(TestCase):
+    def setUp(self):
+        self.branch, self.other = make_branch(), make_branch("Koramangala")
+        self.dosa = make_dish("Dosa", [], price="80.00")
+        self.idli = make_dish("Idli", [], price="40.00")
+        self.vada = make_dish("Vada", [], price="30.00")
+        self.today = reporting_period("today")
+
+    def sell(self, branch, *lines):
+        order = make_order(branch)
+        items = [
+            OrderItem.objects.create(order=order, menu_item=dish, quantity=plates, price=dish.price,
+                                     discount=Decimal(discount) if discount else None)
+            for dish, plates, discount in lines
+        ]
+        record_menu_sales(order, items)
+        return order, items
+
+    def ranking(self, branch):
+        return [(row["menu_item__name"], row["quantity"], row["revenue"]) for row in top_sellers(branch, self.today)]
+
+    def test_orders_add_up_per_item_and_day(self):
+        self.sell(self.branch, (self.dosa, 2, None), (self.idli, 1, None))
+        self.sell(self.branch, (self.idli, 4, "10.00"), (self.vada, 1, "50.00"))
+        self.sell(self.other, (self.vada, 9, None))
+
+        self.assertEqual(self.ranking(self.branch), [
+            ("Idli", 5, Decimal("160.00")),
+            ("Dosa", 2, Decimal("160.00")),
+            # A discount larger than the price takes nothing below zero
+            ("Vada", 1, Decimal("0.00")),
+        ])
+        self.assertEqual(MenuItemDailySales.objects.filter(branch=self.branch).count(), 3)
+
+    def test_cancellation_takes_the_sale_back(self):
+        self.sell(self.branch, (self.dosa, 1, None))
+        order, items = self.sell(self.branch, (self.idli, 3, None))
+
+        record_menu_sales(order, items, sign=-1)
+
+        self.assertEqual(self.ranking(self.branch), [("Dosa", 1, Decimal("80.00"))])
+
+    def test_rebuild_matches_the_incremental_counters(self):
+        self.sell(self.branch, (self.dosa, 2, None), (self.idli, 1, "5.00"))
+        self.sell(self.other, (self.dosa, 1, None))
+        counters = lambda: sorted(MenuItemDailySales.objects.values_list(
+            "branch_id", "menu_item_id", "date", "quantity", "revenue"
+        ))
+        incremental = counters()
+
+        self.assertEqual(rebuild_menu_sales(), 3)
+        self.assertEqual(counters(), incremental)
+
+    def test_menu_sorts_by_plates_sold(self):
+        self.sell(self.branch, (self.vada, 3, None), (self.idli, 1, None))
+        self.sell(self.other, (self.idli, 1, None))
+
+        response = self.client.get("/TFF/branch/menu/", {"sort": "popular"})
+
+        self.assertEqual([row["name"] for row in response.data], ["Vada", "Idli", "Dosa"])
@@ -19,8 +19,10 @@ urlpatterns = [
     path("menu/categories/", menu_categories, name="menu-categories"),
     path("admin/menu/", admin_menu_list),
     path("admin/menu/create/", admin_menu_create),
+    path("menu/<int:menu_item_id>/recipe/", menu_item_recipe),
 
     path("branch/menu/", branch_menu_list),
+    path("branch/menu/top-sellers/", branch_top_sellers),
     path("branch/<int:branch_id>/menu-all/", branch_menu_with_status),
     path("branch/<int:branch_id>/menu/<int:menu_item_id>/toggle/",toggle_menu_availability),
 
@@ -44,10 +46,21 @@ urlpatterns = [
 
 
     path("branch/stock/", branch_stock_list),
+    path("branch/stock/at/", branch_stock_at),
+    path("branch/stock/consumption/", branch_stock_consumption),
+    path("branch/stock/reconcile/", branch_stock_reconcile),
+    path("branch/stock/alerts/", branch_stock_alerts),
+    path("branch/stock/reorder-suggestions/", branch_reorder_suggestions),
     path("godown/stock/", godown_stock_list),
     path("godown/create-item/", create_item_and_godown_stock),
+    path("godown/stock/<int:item_id>/lots/", godown_item_lots),
     path("branch/dashboard/", branch_dashboard),
     path("stock/request/", smart_stock_request_view),
+    path("stock/request/multi/", multi_stock_request_view),
+    path("stock/rebalance/", rebalance_stock_view),
+    path("branch/transfers/incoming/", incoming_stock_transfers),
+    path("branch/transfer/respond/<int:transfer_id>/", respond_stock_transfer),
+    path("godown/transfer/approve/<int:transfer_id>/", approve_godown_transfer_view),
     path("branches/stock-summary/", branches_stock_summary),
     path("branch/requests/<str:branch_id>/", incoming_branch_requests),
     path("branch/request/respond/<int:request_id>/", respond_branch_request),
@@ -63,12 +76,15 @@ urlpatterns = [
     # Orders – Customer
     path("order/place/", place_order),
     path("orders/current/", current_orders),
+    path("orders/wait/", wait_order_updates),
     path("orders/history/", order_history),
     path("orders/cancel/", cancel_order),
     
     # Kitchen
     path("kitchen/orders/", kitchen_orders),
     path("chef/orders/accept/", accept_order),
+    path("chef/orders/cancel/", chef_cancel_order),
+    path("kitchen/orders/priority/", set_order_priority),
     path("kitchen/orders/complete/", complete_order),
     
     # Chef
@@ -81,7 +97,13 @@ urlpatterns = [
 
     path("global/summary/", global_summary),
     path("branch/summary/", branch_summary),
+    path("branches/summary/", branches_summary),
+    path("branches/timeseries/", sales_timeseries_view),
     path("branches/leading/", leading_branch, name="leading-branch"),
+    path("branches/leaderboard/", branches_leaderboard),
+    path("branches/profit/", branches_profit),
+    path("expenses/import/", import_expenses_view),
+    path("export/orders/", export_orders),
     path('send-gst-email/', send_gst_email_api, name='send_gst_email_api'),
     path('send-what', send_whatsapp),
 ]
@@ -4,22 +4,44 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from django.utils.timezone import make_aware, datetime, now
+from django.utils.dateparse import parse_date, parse_datetime
 from calendar import monthrange, month_name
 from datetime import date
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import check_password
-from django.db import IntegrityError
-from django.db.models import Sum, Count
+from django.db import IntegrityError, connections
+from django.db.models import Sum, Count, F, Q, Prefetch
 from .utils import haversine
 from decimal import Decimal
 from .serializers import *
 from .models import *
 from .services.stock_service import *
+from .services.order_notifier import notify_order_change, wait_for_order_change
+from .services.eta_service import estimate_ready_times, record_preparation
+from .services.recipe_service import InvalidRecipe, consume_recipe_stock, set_recipe
+from .services.stock_ledger import stock_at, consumption_history, reconcile
+from .services.stock_summary import branches_stock_summary_data
+from .services.rebalance_service import rebalance_stock
+from .services.kitchen_dispatcher import active_orders, dispatch_queue
+from .services.reservation_service import reserve_order_stock, release_order_reservations
+from .services.reporting_periods import reporting_period
+from .services.rollup_service import mark_orders_dirty
+from .services.summary_service import period_summary
+from .services.leaderboard_service import branch_leaderboard, invalidate_leaderboard
+from .services.row_counts import model_counts_data
+from .services.expense_service import ExpenseImportError, branch_profit, import_expenses, parse_expense_csv
+from .services.branch_sales import add_branch_sale, with_sales_total
+from .services.popularity_service import record_menu_sales, sold_quantities, top_sellers
+from .services.timeseries_service import TRUNC, invalidate_timeseries, sales_timeseries
+from .services.export_service import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from django.http import StreamingHttpResponse
 from geopy.geocoders import Nominatim
 import re
 from math import radians, cos, sin, asin, sqrt
 from TFF.tasks import send_monthly_gst_email, send_monthly_gst_whatsapp
 
+LONG_POLL_MAX_SECONDS = 30
+
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371  # Earth radius in km
     dlat = radians(lat2 - lat1)
@@ -412,6 +434,7 @@ def branch_menu_list(request):
     search = request.GET.get("search", "")
     food_type = request.GET.get("type")  
     category = request.GET.get("category", "all") 
+    sort = request.GET.get("sort")
 
     # ✅ BASE QUERY (all active menu items)
     items = MenuItem.objects.filter(is_active=True)
@@ -475,8 +498,46 @@ def branch_menu_list(request):
                 "image": item.image.url if item.image else None,
             })
 
+    # 🔥 Most sold over the last 30 days first
+    if sort == "popular":
+        sold = sold_quantities(branch_id)
+        data.sort(key=lambda row: (-sold.get(row["id"], 0), row["name"]))
+
     return Response(data)
 
+@api_view(["GET"])
+def branch_top_sellers(request):
+    try:
+        branch = Branch.objects.get(id=request.GET.get("branch_id"))
+    except (Branch.DoesNotExist, ValueError):
+        return Response({"error": "Branch not found"}, status=404)
+
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), 100))
+        period = reporting_period(
+            request.GET.get("period", "month"),
+            first=parse_date(request.GET.get("from", "")),
+            last=parse_date(request.GET.get("to", "")),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response({
+        "branch_id": branch.id,
+        "from": period.first,
+        "to": period.last,
+        "items": [
+            {
+                "id": row["menu_item_id"],
+                "name": row["menu_item__name"],
+                "category": row["menu_item__category"],
+                "quantity": row["quantity"],
+                "revenue": row["revenue"],
+            }
+            for row in top_sellers(branch, period, limit)
+        ]
+    })
+
 @api_view(["GET"])
 def branch_menu_with_status(request, branch_id):
     items = MenuItem.objects.filter(is_active=True)
@@ -498,6 +559,51 @@ def branch_menu_with_status(request, branch_id):
 
     return Response(data)
 
+@api_view(["GET", "PUT"])
+def menu_item_recipe(request, menu_item_id):
+    try:
+        menu_item = MenuItem.objects.get(id=menu_item_id)
+    except MenuItem.DoesNotExist:
+        return Response({"error": "Menu item not found"}, status=404)
+
+    if request.method == "PUT":
+        try:
+            ingredients = [
+                (int(ing["item_id"]), Decimal(str(ing["quantity"])))
+                for ing in request.data.get("ingredients", [])
+            ]
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return Response(
+                {"error": "Each ingredient needs item_id and quantity"},
+                status=400
+            )
+
+        unknown = {i for i, _ in ingredients} - set(
+            Item.objects.filter(id__in=[i for i, _ in ingredients]).values_list("id", flat=True)
+        )
+        if unknown:
+            return Response({"error": f"Unknown items: {sorted(unknown)}"}, status=400)
+
+        try:
+            set_recipe(menu_item, ingredients)
+        except InvalidRecipe as e:
+            return Response({"error": "Invalid recipe", "ingredients": e.errors}, status=400)
+
+    recipe = RecipeIngredient.objects.filter(menu_item=menu_item).select_related("item")
+    return Response({
+        "menu_item_id": menu_item.id,
+        "name": menu_item.name,
+        "ingredients": [
+            {
+                "item_id": r.item_id,
+                "name": r.item.item_name,
+                "quantity": r.quantity,
+                "unit": r.item.unit,
+            }
+            for r in recipe
+        ]
+    })
+
 @api_view(["PATCH"])
 def toggle_menu_availability(request, branch_id, menu_item_id):
     try:
@@ -520,26 +626,11 @@ def toggle_menu_availability(request, branch_id, menu_item_id):
 
 @api_view(['GET'])
 def model_counts(request):
-    data = {
-        "branches": Branch.objects.count(),
-        "employees": Employees.objects.count(),
-        "menuitems": MenuItem.objects.count(),
-        "godowns": Godown.objects.count(),
-        "items": Item.objects.count(),
-        "branch_stock": BranchStock.objects.count(),
-        "godown_stock": GodownStock.objects.count(),
-        "stock_requests": StockRequest.objects.count(),
-        "customers": Customer.objects.count(),
-        "orders": Order.objects.count(),
-        "order_items": OrderItem.objects.count(),
-        "billings": Billing.objects.count(),
-        "kitchen_orders": KitchenOrderTicket.objects.count(),
-        "expenses": Expense.objects.count(),
-        "daily_analytics": DailyAnalytics.objects.count(),
-    }
+    data, as_of = model_counts_data()
 
     return Response({
         "status": "success",
+        "as_of": as_of,
         "data": data
     })
 
@@ -672,20 +763,22 @@ def customer_today_offers(request):
 
 @api_view(['GET'])
 def branch_list(request):
-    branches = Branch.objects.all().order_by("branch_name")
+    branches = with_sales_total(Branch.objects.all()).order_by("branch_name")
     serializer = BranchSerializer(branches, many=True)
     return Response(serializer.data)
 
 # Optional: Only active branches
 @api_view(['GET'])
 def active_branch_list(request):
-    branches = Branch.objects.all().order_by("branch_name")
+    branches = with_sales_total(Branch.objects.all()).order_by("branch_name")
     serializer = BranchSerializer(branches, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 def Employee_list(request):
-    employess = Employees.objects.all()
+    employess = Employees.objects.prefetch_related(
+        Prefetch("branch", queryset=with_sales_total(Branch.objects.all()))
+    )
     serializer = EmplayeeSerializer(employess, many=True, context={'request': request})
     return Response(serializer.data)
    
@@ -714,6 +807,200 @@ def branch_stock_list(request):
     return Response(data)
 
 
+def _ledger_branch(branch_code):
+    # "godown" addresses the godown's ledger (rows without a branch)
+    if branch_code == "godown":
+        return None
+    return Branch.objects.get(branch_code=branch_code)
+
+@api_view(["GET"])
+def branch_stock_at(request):
+    try:
+        at = parse_datetime(request.GET["at"]) if request.GET.get("at") else timezone.now()
+    except ValueError:
+        # Well-formed but impossible, e.g. 2024-02-30T10:00
+        at = None
+    if at is None:
+        return Response({"error": "Invalid at (use ISO datetime)"}, status=400)
+    if timezone.is_naive(at):
+        at = make_aware(at)
+
+    try:
+        branch = _ledger_branch(request.GET.get("branch_id"))
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+
+    quantities = stock_at(branch, at)
+    items = Item.objects.in_bulk(quantities.keys())
+
+    return Response({
+        "at": at,
+        "stock": [
+            {
+                "item_id": item_id,
+                "item": items[item_id].item_name if item_id in items else None,
+                "quantity": qty,
+            }
+            for item_id, qty in quantities.items()
+        ]
+    })
+
+@api_view(["POST"])
+def import_expenses_view(request):
+    """
+    Bulk expenses, either a CSV upload ("file", columns branch_id,
+    description, amount, expense_date) or JSON: {"eid", "expenses": [...]}
+    or a bare array with ?eid=. Admins import for any branch, branch
+    managers only for their own.
+    """
+    data = request.data
+    if isinstance(data, list):
+        eid, rows = request.query_params.get("eid"), data
+    else:
+        eid = data.get("eid") or request.query_params.get("eid")
+        rows = data.get("expenses")
+
+    emp = Employees.objects.filter(Eid=eid, role__in=["admin", "branch_manager"]).first()
+    if not emp or (emp.role == "branch_manager" and emp.branch_id is None):
+        return Response({"detail": "Unauthorized"}, status=403)
+
+    try:
+        if request.FILES.get("file"):
+            rows = parse_expense_csv(request.FILES["file"])
+        expenses = import_expenses(rows, branch=emp.branch if emp.role == "branch_manager" else None)
+    except UnicodeDecodeError:
+        return Response({"error": "CSV must be UTF-8 text"}, status=400)
+    except ExpenseImportError as e:
+        return Response({"error": str(e), "errors": e.errors}, status=400)
+
+    return Response({
+        "message": "Expenses imported",
+        "count": len(expenses),
+        "total_amount": sum((e.amount for e in expenses), Decimal("0.00")),
+    }, status=201)
+
+@api_view(["GET"])
+def branch_stock_consumption(request):
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get("from", "")) or today.replace(day=1)
+        end = parse_date(request.GET.get("to", "")) or today
+    except ValueError:
+        return Response({"error": "from and to must be valid dates"}, status=400)
+
+    try:
+        branch = Branch.objects.get(branch_code=request.GET.get("branch_id"))
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+
+    period = reporting_period("custom", first=start, last=end)
+    history = consumption_history(branch, period.start, period.end)
+    return Response(history)
+
+@api_view(["GET"])
+def branch_stock_reconcile(request):
+    try:
+        branch = _ledger_branch(request.GET.get("branch_id"))
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+
+    mismatches = reconcile(branch)
+    return Response({
+        "in_sync": not mismatches,
+        "mismatches": mismatches
+    })
+
+@api_view(["GET"])
+def branch_stock_alerts(request):
+    try:
+        branch = Branch.objects.get(branch_code=request.GET.get("branch_id"))
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+
+    try:
+        since = parse_datetime(request.GET.get("since", "")) if request.GET.get("since") else None
+    except ValueError:
+        return Response({"error": "since must be an ISO 8601 datetime"}, status=400)
+    if since and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    alerts = LowStockAlert.objects.filter(branch=branch).select_related("item")
+    if since:
+        # Feed mode: everything raised or resolved after the client's cursor
+        alerts = alerts.filter(Q(created_at__gt=since) | Q(resolved_at__gt=since))
+    else:
+        alerts = alerts.filter(resolved_at__isnull=True)
+
+    # Served by the partial "below min" index, not a stock table scan
+    shortages = BranchStock.objects.filter(
+        branch=branch, quantity__lt=F("min_level") + F("reserved")
+    ).select_related("item")
+
+    return Response({
+        "server_time": timezone.now(),
+        "alerts": [
+            {
+                "id": a.id,
+                "item_id": a.item_id,
+                "item": a.item.item_name,
+                "quantity": a.quantity,
+                "min_level": a.min_level,
+                "stock_request_id": a.stock_request_id,
+                "created_at": a.created_at,
+                "resolved_at": a.resolved_at,
+            }
+            for a in alerts.order_by("-created_at")[:100]
+        ],
+        "below_min": [
+            {
+                "item_id": s.item_id,
+                "item": s.item.item_name,
+                "quantity": s.quantity,
+                "reserved": s.reserved,
+                "min_level": s.min_level,
+            }
+            for s in shortages
+        ]
+    })
+
+@api_view(["GET"])
+def branch_reorder_suggestions(request):
+    """
+    Precomputed by the nightly forecast job (or `manage.py forecast_reorders`).
+    Pass ?branch_id=<code> for one branch, nothing for all of them.
+    """
+    suggestions = ReorderSuggestion.objects.select_related("branch", "item")
+
+    branch_code = request.GET.get("branch_id")
+    if branch_code:
+        try:
+            branch = Branch.objects.get(branch_code=branch_code)
+        except Branch.DoesNotExist:
+            return Response({"error": "Branch not found"}, status=404)
+        suggestions = suggestions.filter(branch=branch)
+
+    suggestions = list(suggestions.order_by("branch__branch_code", "days_of_cover", "item__item_name"))
+
+    return Response({
+        "generated_at": suggestions[0].generated_at if suggestions else None,
+        "suggestions": [
+            {
+                "branch_id": s.branch.branch_code,
+                "item_id": s.item_id,
+                "item": s.item.item_name,
+                "unit": s.item.unit,
+                "quantity": s.quantity,
+                "min_level": s.min_level,
+                "avg_daily_usage": s.avg_daily_usage,
+                "ema_daily_usage": s.ema_daily_usage,
+                "days_of_cover": s.days_of_cover,
+                "suggested_quantity": s.suggested_quantity,
+                "godown_available": s.godown_available,
+            }
+            for s in suggestions
+        ]
+    })
+
 @api_view(["GET"])
 def godown_stock_list(request):
     stocks = GodownStock.objects.select_related("item")
@@ -742,6 +1029,16 @@ def create_item_and_godown_stock(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    try:
+        expiry = parse_date(expiry_date) if expiry_date else None
+    except ValueError:
+        expiry = None
+    if expiry_date and expiry is None:
+        return Response(
+            {"error": "expiry_date must be a valid date (YYYY-MM-DD)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     try:
         # 1️⃣ Create Item
         item = Item.objects.create(
@@ -757,11 +1054,11 @@ def create_item_and_godown_stock(request):
         item = Item.objects.get(item_name=item_name)
     
     try:
-        # 2️⃣ Create GodownStock
-        godown_stock = GodownStock.objects.create(
-            item=item,
-            quantity=quantity,
-            expiry_date=expiry_date
+        # 2️⃣ Book the delivery as a new godown lot
+        godown_stock, lot = receive_godown_lot(
+            item,
+            quantity,
+            expiry
         )
     except Exception as e:
         return Response(
@@ -772,9 +1069,28 @@ def create_item_and_godown_stock(request):
     return Response({
         "message": "Item and Godown stock created successfully",
         "item_id": item.id,
-        "godown_stock_id": godown_stock.id
+        "godown_stock_id": godown_stock.id,
+        "lot_id": lot.id
     }, status=status.HTTP_201_CREATED)
 
+@api_view(["GET"])
+def godown_item_lots(request, item_id):
+    lots = GodownLot.objects.filter(item_id=item_id, quantity__gt=0).order_by(
+        F("expiry_date").asc(nulls_last=True), "id"
+    )
+    today = timezone.localdate()
+
+    return Response([
+        {
+            "lot_id": lot.id,
+            "quantity": lot.quantity,
+            "expiry_date": lot.expiry_date,
+            "received_at": lot.received_at,
+            "is_expired": bool(lot.expiry_date and lot.expiry_date < today),
+        }
+        for lot in lots
+    ])
+
 @api_view(["POST"])
 def smart_stock_request_view(request):
     branch_id = request.data["branch_id"]
@@ -784,7 +1100,8 @@ def smart_stock_request_view(request):
     req = create_smart_stock_request(
         Branch.objects.get(id=branch_id),
         Item.objects.get(id=item_id),
-        qty
+        qty,
+        by_distance=request.data.get("nearest") in (True, 1, "1", "true")
     )
 
     return Response({
@@ -792,6 +1109,140 @@ def smart_stock_request_view(request):
         "request_type": "branch" if req.to_branch else "godown"
     })
 
+@api_view(["POST"])
+def multi_stock_request_view(request):
+    lines = request.data.get("items", [])
+
+    try:
+        branch = Branch.objects.get(id=request.data.get("branch_id"))
+        wanted = [(int(l["item_id"]), Decimal(str(l["quantity"]))) for l in lines]
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return Response({"error": "Each line needs item_id and quantity"}, status=400)
+
+    if not wanted:
+        return Response({"error": "items required"}, status=400)
+    bad = sorted(item_id for item_id, qty in wanted if not qty.is_finite() or qty <= 0)
+    if bad:
+        return Response({"error": f"Quantity must be positive for items: {bad}"}, status=400)
+
+    items = Item.objects.in_bulk({item_id for item_id, _ in wanted})
+    unknown = sorted({item_id for item_id, _ in wanted} - set(items))
+    if unknown:
+        return Response({"error": f"Unknown items: {unknown}"}, status=400)
+
+    transfers = create_stock_transfers(
+        branch,
+        [(items[item_id], qty) for item_id, qty in wanted],
+        by_distance=request.data.get("nearest") in (True, 1, "1", "true")
+    )
+
+    return Response({
+        "message": "Request created",
+        "transfers": [
+            {
+                "transfer_id": t.id,
+                "request_type": "godown" if t.from_godown else "branch",
+                "donor_branch_id": t.to_branch_id,
+                "expires_at": t.expires_at,
+            }
+            for t in transfers
+        ]
+    }, status=201)
+
+@api_view(["POST"])
+def rebalance_stock_view(request):
+    eid = request.data.get("eid")
+    if not Employees.objects.filter(Eid=eid, role="admin").exists():
+        return Response({"detail": "Unauthorized"}, status=403)
+
+    dry_run = request.data.get("dry_run") in (True, 1, "1", "true")
+    plan, transfers = rebalance_stock(
+        by_distance=request.data.get("nearest") in (True, 1, "1", "true"),
+        dry_run=dry_run,
+    )
+
+    branches = Branch.objects.in_bulk({p[0] for p in plan} | {p[1] for p in plan})
+    items = Item.objects.in_bulk({p[2] for p in plan})
+
+    return Response({
+        "dry_run": dry_run,
+        "transfer_ids": [t.id for t in transfers],
+        "moves": [
+            {
+                "to_branch": branches[receiver_id].branch_code,
+                "from_branch": branches[donor_id].branch_code,
+                "item_id": item_id,
+                "item": items[item_id].item_name,
+                "quantity": qty,
+            }
+            for receiver_id, donor_id, item_id, qty in plan
+        ]
+    })
+
+@api_view(["GET"])
+def incoming_stock_transfers(request):
+    transfers = (
+        StockTransfer.objects
+        .filter(to_branch__branch_code=request.GET.get("branch_id"), status="pending")
+        .select_related("from_branch")
+        .prefetch_related("lines__item")
+        .order_by("created_at")
+    )
+    return Response([{
+        "id": t.id,
+        "from_branch": t.from_branch.branch_name,
+        "expires_at": t.expires_at,
+        "items": [
+            {"item": l.item.item_name, "quantity": l.quantity}
+            for l in t.lines.all()
+        ]
+    } for t in transfers])
+
+@api_view(["POST"])
+def respond_stock_transfer(request, transfer_id):
+    action = request.data.get("action")
+    try:
+        transfer = StockTransfer.objects.select_related("from_branch", "to_branch").get(
+            id=transfer_id, from_godown=False, status="pending"
+        )
+    except StockTransfer.DoesNotExist:
+        return Response({"error": "Transfer not found or already handled"}, status=404)
+
+    if transfer.expires_at and timezone.now() > transfer.expires_at:
+        return Response({"error": "Request expired"}, status=400)
+
+    try:
+        if action == "accept":
+            approve_stock_transfer(transfer)
+        else:
+            reject_stock_transfer(transfer)
+    except InsufficientStock as e:
+        return Response({"error": str(e), "shortfalls": e.shortfalls}, status=400)
+    except TransferAlreadyHandled:
+        return Response({"error": "Transfer not found or already handled"}, status=404)
+
+    return Response({"message": "Updated"})
+
+@api_view(["POST"])
+def approve_godown_transfer_view(request, transfer_id):
+    try:
+        transfer = StockTransfer.objects.select_related("from_branch").get(
+            id=transfer_id, from_godown=True, status="pending"
+        )
+    except StockTransfer.DoesNotExist:
+        return Response({"error": "Transfer not found or already handled"}, status=404)
+
+    try:
+        approve_stock_transfer(transfer)
+    except InsufficientStock as e:
+        return Response({"error": str(e), "shortfalls": e.shortfalls}, status=400)
+    except TransferAlreadyHandled:
+        return Response({"error": "Transfer not found or already handled"}, status=404)
+
+    return Response({"message": "Approved"})
+
 @api_view(["GET"])
 def incoming_branch_requests(request, branch_id):
     requests = StockRequest.objects.filter(to_branch_code=branch_id, status="pending")
@@ -849,7 +1300,7 @@ def branch_dashboard(request):
     except Branch.DoesNotExist:
         return Response({"error": "Branch not found"}, status=404)
 
-    today = timezone.now().date()
+    today = timezone.localdate()
 
     # 👥 Employees working in this branch
     employees_count = Employees.objects.filter(
@@ -860,9 +1311,9 @@ def branch_dashboard(request):
 
     # 🛒 Orders completed today
     completed_orders = Order.objects.filter(
+        reporting_period("today", today).filter(),
         branch=branch,
         status="delivered",
-        created_at__date=today
     ).count()
 
     # 📦 Branch Stock Summary
@@ -898,16 +1349,7 @@ def branch_dashboard(request):
 
 @api_view(["GET"])
 def branches_stock_summary(request):
-    branches = Branch.objects.all()
-    data = []
-    for b in branches:
-        total = BranchStock.objects.filter(branch=b).aggregate(total=models.Sum('quantity'))['total'] or 0
-        data.append({
-            "branch_id": b.branch_code,
-            "branch_name": b.branch_name,
-            "total_items": total
-        })
-    return Response(data)
+    return Response(branches_stock_summary_data())
 
 @api_view(["GET"])
 def branch_employees_list(request):
@@ -1137,23 +1579,27 @@ def place_order(request):
     tixe.save()
 
     # ✅ Create Order Items
-    for item in cart.items.all():
-        OrderItem.objects.create(
+    lines = OrderItem.objects.bulk_create([
+        OrderItem(
             order=order,
             menu_item=item.menu_item,
             quantity=item.quantity,
             price=item.price,
             discount = apply_offer(item.menu_item.id)
         )
+        for item in cart.items.all()
+    ])
+    record_menu_sales(order, lines)
 
     # ✅ Update Branch Sales
-    cart.branch.sales = (Decimal(cart.branch.sales + total).quantize(Decimal("0.01")))
-    cart.branch.save(update_fields=["sales"])
+    add_branch_sale(cart.branch_id, total)
 
     # ✅ Clear Cart
     cart.items.all().delete()
     cart.delete()   
 
+    transaction.on_commit(invalidate_leaderboard)
+
     return Response({
         "message": "Order placed successfully",
         "order_id": order.id,
@@ -1175,13 +1621,62 @@ def current_orders(request):
             status=400
         )
 
-    orders = Order.objects.filter(
-        customer_id=customer_id,
-        status__in=["pending", "accepted", "preparing", "ready"]
-    ).order_by("-created_at")
+    return Response(active_orders_data(customer_id))
+
+def active_orders_data(customer_id):
+    orders = list(
+        Order.objects.filter(
+            customer_id=customer_id,
+            status__in=["pending", "accepted", "preparing", "ready"]
+        )
+        .select_related("customer", "assigned_chef")
+        .prefetch_related("items__menu_item")
+        .order_by("-created_at")
+    )
+    etas = estimate_ready_times(orders)
+
     data = OrderSerializer(orders, many=True).data
+    for row in data:
+        row["eta"] = etas.get(row["id"])
+    return data
 
-    return Response(data)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def wait_order_updates(request):
+    cid = request.GET.get("customer_id")
+
+    if not cid:
+        return Response(
+            {"error": "customer_id is required"},
+            status=400
+        )
+
+    try:
+        customer_id = int(cid.replace("TFC", ""))
+    except ValueError:
+        return Response({"error": "Invalid customer_id"}, status=400)
+
+    try:
+        timeout = float(request.GET.get("timeout", LONG_POLL_MAX_SECONDS))
+        since = int(request.GET.get("version", -1))
+    except ValueError:
+        return Response({"error": "Invalid timeout or version"}, status=400)
+
+    timeout = max(0, min(timeout, LONG_POLL_MAX_SECONDS))
+
+    # 🔌 Hand the DB connection back before parking the request
+    connections.close_all()
+
+    version = wait_for_order_change(customer_id, since, timeout)
+
+    if version <= since:
+        return Response({"changed": False, "version": since})
+
+    return Response({
+        "changed": True,
+        "version": version,
+        "orders": active_orders_data(customer_id)
+    })
 
 @api_view(["GET"])
 def order_history(request):
@@ -1225,9 +1720,21 @@ def cancel_order(request):
             status=400
         )
 
-    order.delete()
+    with transaction.atomic():
+        discard_order(order)
+    notify_order_change(customer_id)
+    invalidate_leaderboard()
     return Response({"message": "Order deleted successfully"})
 
+def discard_order(order):
+    """Delete a cancelled order, returning its held stock and takings."""
+    release_order_reservations(order)
+    record_menu_sales(order, order.items.all(), sign=-1)
+    add_branch_sale(order.branch_id, -order.total_amount)
+    mark_orders_dirty([order])
+    order.delete()
+    transaction.on_commit(invalidate_timeseries)
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def chef_status(request):
@@ -1283,6 +1790,7 @@ def chef_branch_ingredients(request):
             "item_id": s.item.id,
             "name": s.item.item_name,
             "available_qty": s.quantity,
+            "reserved_qty": s.reserved,
             "unit": s.item.unit
         }
         for s in stocks
@@ -1292,8 +1800,6 @@ def chef_branch_ingredients(request):
 @transaction.atomic
 def submit_ingredient_usage(request):
     Eid = request.data.get("Eid")
-    Bid = request.data.get("Bid")
-    total = request.data.get("total")
     order_id = request.data.get("order_id")
     ingredients = request.data.get("ingredients", [])
 
@@ -1304,42 +1810,44 @@ def submit_ingredient_usage(request):
     )
 
     chef = Employees.objects.select_for_update().get(Eid=Eid)
-    branch = Branch.objects.select_for_update().get(branch_code = Bid)
-    for ing in ingredients:
-        item_id = ing["item_id"]
-        qty = Decimal(ing["quantity"])
-
-        stock = BranchStock.objects.select_for_update().get(
-            branch__branch_code=Bid,
-            item_id=item_id
-        )
-
-        if stock.quantity < qty:
-            raise Exception(
-                f"Insufficient stock for {stock.item.item_name}"
-            )
 
-        # 🔻 Deduct stock
-        stock.quantity -= qty
-        stock.save()
+    try:
+        usages = [
+            (order, int(ing["item_id"]), Decimal(str(ing["quantity"])))
+            for ing in ingredients
+        ]
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return Response(
+            {"error": "Each ingredient needs item_id and quantity"},
+            status=400
+        )
 
-        # 📝 Save usage
-        OrderIngredientUsage.objects.create(
-            order=order,
-            item_id=item_id,
-            quantity_used=qty
+    # 🔻 Deduct stock & save usage (one locked batch, all-or-nothing).
+    # Without a hand-entered list, the order's recipes decide the usage.
+    try:
+        if usages:
+            deduct_ingredient_usage(usages)
+        else:
+            consume_recipe_stock([order])
+    except InsufficientStock as e:
+        return Response(
+            {"error": str(e), "shortfalls": e.shortfalls},
+            status=400
         )
 
     # ✅ Mark order ready
     order.status = "completed"
+    order.completed_at = timezone.now()
     order.save()
 
-    branch.sales += Decimal(total)
-    branch.save()
+    # Sales were counted when the order was placed
+    record_preparation(order)
 
     chef.is_working = True
     chef.save()
 
+    transaction.on_commit(lambda: notify_order_change(order.customer_id))
+
     return Response({
         "message": "Ingredients submitted & stock updated"
     })
@@ -1348,10 +1856,13 @@ def submit_ingredient_usage(request):
 def pending_orders(request):
     branch_id = request.GET.get("branch_id")
 
-    orders = Order.objects.filter(
-        branch__branch_code=branch_id,
-        status="pending"
-    ).order_by("created_at")
+    try:
+        branch = Branch.objects.get(branch_code=branch_id)
+    except Branch.DoesNotExist:
+        return Response({"error": "Branch not found"}, status=404)
+
+    # Same order the dispatcher uses (DISPATCH_POLICY)
+    orders = dispatch_queue(branch).select_related("customer")
 
     data = []
     for index, o in enumerate(orders):
@@ -1359,8 +1870,9 @@ def pending_orders(request):
             "order_id": o.id,
             "order_code": o.order_code,
             "time": o.created_at,
+            "priority": o.priority,
             "customer_id": o.customer.Cid,
-            "can_accept": index == 0   # 👈 only first order
+            "can_accept": index == 0   # 👈 only the next order in line
         })
 
     return Response(data)
@@ -1376,48 +1888,116 @@ def accept_order(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # 🔍 Get chef
+    # 🔒 Chef, then order, locked in the same order as the dispatcher,
+    # so the two can't both hand this chef an order.
     try:
-        chef = Employees.objects.get(Eid=employee_id, role="chef")
-    except Employees.DoesNotExist:
+        with transaction.atomic():
+            try:
+                chef = Employees.objects.select_for_update().get(Eid=employee_id, role="chef")
+            except Employees.DoesNotExist:
+                return Response(
+                    {"error": "Chef not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # 🔍 Check if chef already has an active order
+            if active_orders([chef]).exists():
+                return Response(
+                    {
+                        "error": "Chef already has an active order. Please complete or cancel it first."
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # 🔍 Get order
+            try:
+                order = Order.objects.select_for_update().get(
+                    id=order_id, status="pending", assigned_chef__isnull=True
+                )
+            except Order.DoesNotExist:
+                return Response(
+                    {"error": "Order not found or already processed"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # ✅ Claim order and reserve its ingredients; neither sticks
+            # unless both succeed.
+            order.status = "preparing"
+            order.assigned_chef = chef
+            order.accepted_at = timezone.now()
+            order.save(update_fields=["status", "assigned_chef", "accepted_at"])
+            reserve_order_stock(order)
+    except InsufficientStock as e:
         return Response(
-            {"error": "Chef not found"},
-            status=status.HTTP_404_NOT_FOUND
+            {"error": "Not enough stock to accept this order", "shortfalls": e.shortfalls},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-    # 🔍 Check if chef already has an active order
-    active_order_exists = Order.objects.filter(
-        assigned_chef=chef
-    ).exclude(
-        status__in=["completed", "cancelled"]
-    ).exists()
+    notify_order_change(order.customer_id)
+
+    return Response(
+        {"message": "Order accepted and assigned to chef"},
+        status=status.HTTP_200_OK
+    )
 
-    if active_order_exists:
+@api_view(["POST"])
+def chef_cancel_order(request):
+    order_id = request.data.get("order_id")
+    employee_id = request.data.get("Eid")
+
+    if not order_id or not employee_id:
         return Response(
-            {
-                "error": "Chef already has an active order. Please complete or cancel it first."
-            },
+            {"error": "order_id and Eid are required"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # 🔍 Get order
+    # 🔒 An accepted order the kitchen gives up on is dropped like a
+    # customer cancellation, so its held ingredients go back right away
+    # instead of waiting for the reservation to expire.
+    with transaction.atomic():
+        try:
+            order = Order.objects.select_for_update().get(
+                id=order_id, assigned_chef__Eid=employee_id, status="preparing"
+            )
+        except (Order.DoesNotExist, ValueError):
+            return Response(
+                {"error": "Order not found or not being prepared by this chef"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        customer_id = order.customer_id
+        discard_order(order)
+        notify_order_change(customer_id)
+
+    invalidate_leaderboard()
+    return Response({"message": "Order cancelled"})
+
+@api_view(["POST"])
+def set_order_priority(request):
+    eid = request.data.get("eid")
+    emp = Employees.objects.filter(Eid=eid, role__in=["admin", "branch_manager"]).first()
+    if not emp:
+        return Response({"detail": "Unauthorized"}, status=403)
+
     try:
-        order = Order.objects.get(id=order_id, status="pending")
-    except Order.DoesNotExist:
-        return Response(
-            {"error": "Order not found or already processed"},
-            status=status.HTTP_404_NOT_FOUND
-        )
+        priority = int(request.data.get("priority"))
+    except (TypeError, ValueError):
+        return Response({"error": "priority must be a number"}, status=400)
+    if not 0 <= priority <= 100:
+        return Response({"error": "priority must be between 0 and 100"}, status=400)
 
-    # ✅ Assign order
-    order.status = "preparing"
-    order.assigned_chef = chef
-    order.save()
+    try:
+        order_id = int(request.data.get("order_id"))
+    except (TypeError, ValueError):
+        return Response({"error": "order_id is required"}, status=400)
 
-    return Response(
-        {"message": "Order accepted and assigned to chef"},
-        status=status.HTTP_200_OK
-    )
+    orders = Order.objects.filter(id=order_id, status="pending")
+    if emp.role == "branch_manager":
+        orders = orders.filter(branch_id=emp.branch_id)
+
+    if not orders.update(priority=priority):
+        return Response({"error": "Order not found or already processed"}, status=404)
+    return Response({"message": "Priority updated", "priority": priority})
 
 @api_view(['GET'])
 def chef_completed_orders(request):
@@ -1444,8 +2024,12 @@ def complete_order(request):
     order = Order.objects.get(id=order_id, assigned_chef=chef)
 
     order.status = 'ready'
+    order.ready_at = timezone.now()
     order.save()
 
+    record_preparation(order)
+    notify_order_change(order.customer_id)
+
     chef.is_working = True
     chef.save()
 
@@ -1491,114 +2075,7 @@ def clear_cart(request):
 
 @api_view(["GET"])
 def global_summary(request):
-    today = now().date()
-
-    # Today
-    today_orders = Order.objects.filter(
-        created_at__date=today
-    )
-
-    today_sales = today_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
-
-    today_gst = TiexCollect.objects.filter(
-        created_at__date=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
-
-    # THIS WEEK
-    week_start = today - timedelta(days=today.weekday())
-
-    week_orders = Order.objects.filter(
-        status="completed",
-        created_at__date__gte=week_start,
-        created_at__date__lte=today
-    )
-
-    week_sales = week_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
-
-    week_gst = TiexCollect.objects.filter(
-        created_at__date__gte=week_start,
-        created_at__date__lte=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
-
-    #THIS MONTH
-    month_start = today.replace(day=1)
-
-    month_orders = Order.objects.filter(
-        status="completed",
-        created_at__date__gte=month_start,
-        created_at__date__lte=today
-    )
-
-    month_sales = month_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
-
-    month_gst = TiexCollect.objects.filter(
-        created_at__date__gte=month_start,
-        created_at__date__lte=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
-
-    # PREVIOUS MONTH
-    first_day_this_month = month_start
-    last_day_prev_month = first_day_this_month - timedelta(days=1)
-    first_day_prev_month = last_day_prev_month.replace(day=1)
-
-    prev_month_orders = Order.objects.filter(
-        status="completed",
-        created_at__date__gte=first_day_prev_month,
-        created_at__date__lte=last_day_prev_month
-    )
-
-    prev_month_sales = prev_month_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
-
-    prev_month_gst = TiexCollect.objects.filter(
-        created_at__date__gte=first_day_prev_month,
-        created_at__date__lte=last_day_prev_month
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
-
-    return Response({
-        "today": {
-            "date": today,
-            "total_orders": today_orders.count(),
-            "total_sales": today_sales,
-            "total_gst": today_gst,
-        },
-        "this_week": {
-            "from": week_start,
-            "to": today,
-            "total_orders": week_orders.count(),
-            "total_sales": week_sales,
-            "total_gst": week_gst,
-        },
-        "this_month": {
-            "from": month_start,
-            "to": today,
-            "total_orders": month_orders.count(),
-            "total_sales": month_sales,
-            "total_gst": month_gst,
-        },
-        "previous_month": {
-            "from": first_day_prev_month,
-            "to": last_day_prev_month,
-            "total_orders": prev_month_orders.count(),
-            "total_sales": prev_month_sales,
-            "total_gst": prev_month_gst,
-        }
-    })
+    return Response(period_summary())
 
 @api_view(["GET"])
 def branch_summary(request):
@@ -1612,174 +2089,180 @@ def branch_summary(request):
     except Branch.DoesNotExist:
         return Response({"error": "Branch not found"}, status=404)
 
-    today = now().date()
+    return Response({
+        "branch": {
+            "id": branch.id,
+            "code": branch.branch_code,
+            "name": branch.branch_name,
+        },
+        **period_summary(branch=branch),
+    })
 
-    # TODAY
-    today_orders = Order.objects.filter(
-        branch=branch,
-        created_at__date=today
-    )
+@api_view(["GET"])
+def branches_summary(request):
+    summaries = period_summary(by_branch=True)
 
-    today_sales = today_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
+    return Response([
+        {
+            "branch": {
+                "id": branch.id,
+                "code": branch.branch_code,
+                "name": branch.branch_name,
+            },
+            **summaries[branch.id],
+        }
+        for branch in Branch.objects.order_by("branch_code")
+    ])
 
-    today_gst = TiexCollect.objects.filter(
-        branch=branch,
-        created_at__date=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
+# Longest range each bucket size may span, to keep responses bounded
+TIMESERIES_MAX_DAYS = {"hour": 31, "day": 366, "week": 3 * 366}
 
-    # THIS WEEK
-    week_start = today - timedelta(days=today.weekday())
+@api_view(["GET"])
+def sales_timeseries_view(request):
+    bucket = request.GET.get("bucket", "hour")
+    if bucket not in TRUNC:
+        return Response({"error": f"bucket must be one of {', '.join(TRUNC)}"}, status=400)
 
-    week_orders = Order.objects.filter(
-        branch=branch,
-        status="completed",
-        created_at__date__gte=week_start,
-        created_at__date__lte=today
-    )
+    today = timezone.localdate()
+    try:
+        first = parse_date(request.GET.get("from", "")) or today
+        last = parse_date(request.GET.get("to", "")) or today
+    except ValueError:
+        return Response({"error": "from and to must be valid dates"}, status=400)
+    if first > last:
+        return Response({"error": "from must not be after to"}, status=400)
+    if (last - first).days >= TIMESERIES_MAX_DAYS[bucket]:
+        return Response({"error": f"{bucket} buckets span at most {TIMESERIES_MAX_DAYS[bucket]} days"}, status=400)
+
+    branch = None
+    if request.GET.get("branch_id"):
+        try:
+            branch = Branch.objects.get(branch_code=request.GET["branch_id"])
+        except Branch.DoesNotExist:
+            return Response({"error": "Branch not found"}, status=404)
 
-    week_sales = week_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
+    series = sales_timeseries(reporting_period("custom", first=first, last=last), bucket, branch)
+    branches = Branch.objects.in_bulk(series.keys())
 
-    week_gst = TiexCollect.objects.filter(
-        branch=branch,
-        created_at__date__gte=week_start,
-        created_at__date__lte=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
+    return Response({
+        "bucket": bucket,
+        "from": first,
+        "to": last,
+        "series": [
+            {
+                "branch": {
+                    "id": branch_id,
+                    "code": branches[branch_id].branch_code,
+                    "name": branches[branch_id].branch_name,
+                },
+                "points": [
+                    {
+                        "start": timezone.localtime(start),
+                        "orders": orders,
+                        "revenue": revenue,
+                        "gst": gst,
+                    }
+                    for start, orders, revenue, gst in points
+                ],
+            }
+            for branch_id, points in sorted(series.items(), key=lambda s: branches[s[0]].branch_code)
+        ]
+    })
 
-    # THIS MONTH
-    month_start = today.replace(day=1)
+@api_view(["GET"])
+def branches_profit(request):
+    try:
+        period = reporting_period(
+            request.GET.get("period", "month"),
+            first=parse_date(request.GET.get("from", "")),
+            last=parse_date(request.GET.get("to", "")),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-    month_orders = Order.objects.filter(
-        branch=branch,
-        status="completed",
-        created_at__date__gte=month_start,
-        created_at__date__lte=today
-    )
+    branch = None
+    if request.GET.get("branch_id"):
+        try:
+            branch = Branch.objects.get(branch_code=request.GET["branch_id"])
+        except Branch.DoesNotExist:
+            return Response({"error": "Branch not found"}, status=404)
 
-    month_sales = month_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
+    return Response({
+        "from": period.first,
+        "to": period.last,
+        "branches": [
+            {
+                "branch": {
+                    "id": row["id"],
+                    "code": row["branch_code"],
+                    "name": row["branch_name"],
+                },
+                "completed_sales": row["completed_sales"],
+                "gst": row["completed_gst"],
+                "expense": row["expense_total"],
+                "profit": row["profit"],
+            }
+            for row in branch_profit(period, branch)
+        ]
+    })
 
-    month_gst = TiexCollect.objects.filter(
-        branch=branch,
-        created_at__date__gte=month_start,
-        created_at__date__lte=today
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
-
-    # PREVIOUS MONTH
-    first_day_this_month = month_start
-    last_day_prev_month = first_day_this_month - timedelta(days=1)
-    first_day_prev_month = last_day_prev_month.replace(day=1)
-
-    prev_month_orders = Order.objects.filter(
-        branch=branch,
-        status="completed",
-        created_at__date__gte=first_day_prev_month,
-        created_at__date__lte=last_day_prev_month
-    )
+@api_view(["GET"])
+def leading_branch(request):
+    leaderboard = branch_leaderboard()
 
-    prev_month_sales = prev_month_orders.aggregate(
-        total=Sum("total_amount")
-    )["total"] or Decimal("0.00")
+    if leaderboard:
+        return Response(leaderboard[0])
+    return Response({"error": "No branches found"}, status=404)
 
-    prev_month_gst = TiexCollect.objects.filter(
-        branch=branch,
-        created_at__date__gte=first_day_prev_month,
-        created_at__date__lte=last_day_prev_month
-    ).aggregate(
-        total=Sum("gst")
-    )["total"] or Decimal("0.00")
+@api_view(["GET"])
+def branches_leaderboard(request):
+    leaderboard = branch_leaderboard()
 
-    return Response({
-        "branch": {
-            "id": branch.id,
-            "code": branch.branch_code,
-            "name": branch.branch_name,
-        },
-        "today": {
-            "date": today,
-            "total_orders": today_orders.count(),
-            "total_sales": today_sales,
-            "total_gst": today_gst,
-        },
-        "this_week": {
-            "from": week_start,
-            "to": today,
-            "total_orders": week_orders.count(),
-            "total_sales": week_sales,
-            "total_gst": week_gst,
-        },
-        "this_month": {
-            "from": month_start,
-            "to": today,
-            "total_orders": month_orders.count(),
-            "total_sales": month_sales,
-            "total_gst": month_gst,
-        },
-        "previous_month": {
-            "from": first_day_prev_month,
-            "to": last_day_prev_month,
-            "total_orders": prev_month_orders.count(),
-            "total_sales": prev_month_sales,
-            "total_gst": prev_month_gst,
-        }
-    })
+    top = request.GET.get("top")
+    if top:
+        try:
+            leaderboard = leaderboard[:max(0, int(top))]
+        except ValueError:
+            return Response({"error": "top must be a number"}, status=400)
+
+    return Response(leaderboard)
 
 @api_view(["GET"])
-def leading_branch(request):
-    branches = Branch.objects.all()
-
-    branch_sales = []
-    today = date.today()
-
-    # Current month range
-    current_month_start = make_aware(datetime(today.year, today.month, 1))
-    current_month_end = make_aware(datetime(today.year, today.month, monthrange(today.year, today.month)[1], 23, 59, 59))
-    current_month_name = month_name[today.month]
-
-    # Previous month range
-    prev_month = today.month - 1 or 12
-    prev_year = today.year if today.month > 1 else today.year - 1
-    prev_month_start = make_aware(datetime(prev_year, prev_month, 1))
-    prev_month_end = make_aware(datetime(prev_year, prev_month, monthrange(prev_year, prev_month)[1], 23, 59, 59))
-    prev_month_name = month_name[prev_month]
-
-    for b in branches:
-        manager = Employees.objects.filter(branch__branch_code=b.branch_code, role="branch_manager").first()
-
-        prev_sales = b.order_set.filter(
-            created_at__range=(prev_month_start, prev_month_end)
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-        current_sales = b.order_set.filter(
-            created_at__range=(current_month_start, current_month_end)
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-        branch_sales.append({
-            "branch_name": b.branch_name,
-            "branch_code": b.branch_code,
-            "branch_manager": manager.username if manager else None,
-            "previous_month_name": prev_month_name,
-            "previous_month_sales": float(prev_sales),
-            "current_month_name": current_month_name,
-            "current_month_sales": float(current_sales)
-        })
+def export_orders(request):
+    eid = request.GET.get("eid")
+    if not Employees.objects.filter(Eid=eid, role="admin").exists():
+        return Response({"detail": "Unauthorized"}, status=403)
 
-    # Sort descending by current month sales
-    leading = sorted(branch_sales, key=lambda x: x["current_month_sales"], reverse=True)
+    dataset = request.GET.get("dataset", "orders")
+    fmt = request.GET.get("file_format", "csv")
+    if dataset not in EXPORT_DATASETS:
+        return Response({"error": f"dataset must be one of {', '.join(EXPORT_DATASETS)}"}, status=400)
+    if fmt not in EXPORT_FORMATS:
+        return Response({"error": f"file_format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
 
-    if leading:
-        return Response(leading[0])
-    return Response({"error": "No branches found"}, status=404)
+    today = timezone.localdate()
+    try:
+        first = parse_date(request.GET.get("from", "")) or today.replace(day=1)
+        last = parse_date(request.GET.get("to", "")) or today
+    except ValueError:
+        return Response({"error": "from and to must be valid dates"}, status=400)
+    if first > last:
+        return Response({"error": "from must not be after to"}, status=400)
+
+    branch = None
+    if request.GET.get("branch_id"):
+        try:
+            branch = Branch.objects.get(branch_code=request.GET["branch_id"])
+        except Branch.DoesNotExist:
+            return Response({"error": "Branch not found"}, status=404)
+
+    period = reporting_period("custom", first=first, last=last)
+    response = StreamingHttpResponse(
+        stream_export(dataset, period, fmt, branch),
+        content_type=EXPORT_FORMATS[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{dataset}_{first}_{last}.{fmt}"'
+    return response
 
 
 @api_view(['GET'])
@@ -110,6 +110,20 @@ DATABASES = {
 }
 
 
+# --------------------------------------------------
+# CACHE (shared by web workers and the scheduler)
+# --------------------------------------------------
+# Invalidations have to reach every process, so the cache lives in the
+# database rather than in each worker's memory. build.sh creates the
+# table (manage.py createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'tff_cache',
+    }
+}
+
+
 # --------------------------------------------------
 # PASSWORD VALIDATION
 # --------------------------------------------------
@@ -191,6 +205,42 @@ OWNER_WHATSAPP = os.getenv("OWNER_WHATSAPP")
 ADMIN_PHONE = os.getenv("ADMIN_PHONE")
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 
+# --------------------------------------------------
+# LOGGING
+# --------------------------------------------------
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "TFF": {"handlers": ["console"], "level": os.getenv("TFF_LOG_LEVEL", "INFO")},
+    },
+}
+
+# --------------------------------------------------
+# BACKGROUND JOBS (APScheduler, run by `manage.py run_scheduler`)
+# --------------------------------------------------
+STOCK_TIMEOUT_INTERVAL_SECONDS = int(os.getenv("STOCK_TIMEOUT_INTERVAL_SECONDS", "60"))
+STOCK_SNAPSHOT_HOUR = int(os.getenv("STOCK_SNAPSHOT_HOUR", "3"))  # daily, local time
+REORDER_FORECAST_HOUR = int(os.getenv("REORDER_FORECAST_HOUR", "4"))  # daily, local time
+ANALYTICS_ROLLUP_MINUTES = int(os.getenv("ANALYTICS_ROLLUP_MINUTES", "10"))
+ROW_COUNT_REFRESH_MINUTES = int(os.getenv("ROW_COUNT_REFRESH_MINUTES", "15"))
+BRANCH_SALES_RECONCILE_MINUTES = int(os.getenv("BRANCH_SALES_RECONCILE_MINUTES", "60"))
+
+# Fill the dashboard row counts from Postgres planner statistics instead of COUNT(*)
+ROW_COUNT_ESTIMATES = os.getenv("ROW_COUNT_ESTIMATES") == "True"
+
+# Order the kitchen cooks pending orders in: "fifo" or "priority"
+DISPATCH_POLICY = os.getenv("DISPATCH_POLICY", "fifo")
+
+# Ingredients reserved when an order is accepted are freed if it isn't cooked by then
+ORDER_RESERVATION_MINUTES = int(os.getenv("ORDER_RESERVATION_MINUTES", "120"))
+
+# Raise a smart stock request automatically when stock drops below min level
+LOW_STOCK_AUTO_REQUEST = os.getenv("LOW_STOCK_AUTO_REQUEST") == "True"
+
 # --------------------------------------------------
 # SECURITY SETTINGS (Recommended for Production)
 # # --------------------------------------------------
@@ -1,3 +1,4 @@
 #!/usr/bin/env bash
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
+python manage.py createcachetable
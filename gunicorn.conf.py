@@ -0,0 +1,13 @@
+import os
+
+# Cooperative workers: a long-polling request (orders/wait/) parks a
+# greenlet, not one of a handful of threads, so waiting customers don't
+# starve the rest of the API.
+worker_class = "gevent"
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", "500"))
+
+
+def post_fork(server, worker):
+    # psycopg2 would block the whole worker on every query without this
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()